@@ -1,8 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import cv
+from app.services import http_client, llm_router, optimization_jobs, posting_store, tracing, worker_pool
 
-app = FastAPI(title="CV Optimizer API")
+# Lifespan körs en gång när servern startar och en gång när den stängs.
+# Här öppnas den delade HTTP-klienten så att alla anrop till LM Studio och
+# skrapade webbplatser återanvänder samma connection pool, och den stängs
+# ordentligt vid avstängning så att inga sockets lämnas öppna.
+# Optimeringsjobb som avbröts av en omstart plockas upp igen från SQLite.
+# Annonsarkivets inverterade index laddas i bakgrunden så att servern
+# startar direkt men första matchningen ändå går snabbt; om servern stängs
+# innan laddningen är klar avbryts den. Processpoolen för
+# dokumenttolkning stängs vid avstängning. Med flera LLM-backends kontrolleras
+# deras hälsa i bakgrunden så att routern slutar skicka anrop till en död server,
+# och LLM-kön får släppa in lika många anrop som alla backends klarar tillsammans.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.open_client()
+    await optimization_jobs.resume_pending()
+    app.state.posting_index_warm_up = asyncio.ensure_future(posting_store.warm_up())
+    llm_router.router.apply_scheduler_capacity()
+    llm_router.router.start_health_checks()
+    yield
+    app.state.posting_index_warm_up.cancel()
+    await asyncio.gather(app.state.posting_index_warm_up, return_exceptions=True)
+    await llm_router.router.stop_health_checks()
+    await http_client.close_client()
+    worker_pool.shutdown()
+
+app = FastAPI(title="CV Optimizer API", lifespan=lifespan)
 
 # CORS-konfiguration för att frontend ska kunna prata med backend
 app.add_middleware(
@@ -13,12 +42,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Spårning av varje anrop: tid per route och steg till /metrics, och en
+# Server-Timing-header så att webbläsarens devtools visar var tiden gick.
+# TRACE_SAMPLE_RATE styr hur stor andel av anropen som spåras per steg.
+app.add_middleware(tracing.TracingMiddleware)
+
 app.include_router(cv.router)
 
 @app.get("/")
 async def root():
     return {"message": "CV Optimizer API is running!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
\ No newline at end of file
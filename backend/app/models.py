@@ -1,16 +1,37 @@
-from typing import Optional  # Används för att markera valfria fält i modeller
+from typing import List, Literal, Optional  # Används för listor, valfria fält och fasta värden i modeller
 from pydantic import BaseModel  # Bas-klass för validering av JSON-kroppar
 
 class JobPostingInput(BaseModel):  # Modell för jobbannons-input via API
     text: Optional[str] = None  # Jobbannons som ren text (valfri)
     url: Optional[str] = None  # Jobbannons-URL som ska hämtas (valfri)
 
+class CrawlRequest(BaseModel):  # Modell för att hämta många jobbannonser på en gång
+    urls: List[str]  # Jobbannons-URL:er som ska hämtas
+    max_parallel: int = 20  # Max antal samtidiga hämtningar
+    save: bool = True  # Lägger till hämtade annonser i annonsarkivet
+
 class KeywordRequest(BaseModel):  # Modell för keyword-analys input
     job_text: Optional[str] = None  # Jobbannonsens text om den skickas direkt
     cv_text: Optional[str] = None  # CV-text om den skickas direkt
     top_n: int = 30  # Antal keywords som ska extraheras
+    mode: Literal["compat", "weighted"] = "compat"  # "weighted" lägger till n-gram och TF-IDF/BM25-vikter
+    method: Literal["bm25", "tfidf"] = "bm25"  # Viktning i weighted-läge
+
+class KeywordRankRequest(BaseModel):  # Modell för att ranka många jobbannonser mot ett CV
+    cv_text: Optional[str] = None  # CV-text om den skickas direkt (annars används master CV)
+    job_texts: List[str]  # Jobbannonserna som ska rankas
+    top_k: int = 10  # Antal bästa träffar som returneras
+    method: Literal["bm25", "tfidf"] = "bm25"  # Viktning
 
 class OptimizeRequest(BaseModel):  # Modell för CV-optimering med AI
     job_text: Optional[str] = None  # Jobbannonsens text om den skickas direkt
     cv_text: Optional[str] = None  # CV-text om den skickas direkt
+    priority: Literal["interactive", "batch"] = "interactive"  # Prioritet i LLM-kön
+    mode: Literal["full", "sections", "languages"] = "full"  # "sections" optimerar varje CV-sektion för sig, "languages" varje språk för sig
+    language: Literal["both", "sv", "en"] = "both"  # Vilka språkversioner som ska genereras
 
+class BatchOptimizeRequest(BaseModel):  # Modell för att optimera ett CV mot många jobbannonser
+    cv_text: Optional[str] = None  # CV-text om den skickas direkt (annars används master CV)
+    jobs: List[JobPostingInput]  # Jobbannonser som text eller URL
+    max_parallel: int = 2  # Antal samtidiga genereringar för batchen
+    priority: Literal["interactive", "batch"] = "batch"  # Prioritet i LLM-kön
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body  # FastAPI-komponenter för routes och fel
-from fastapi.responses import JSONResponse, FileResponse  # JSON- och fil-respons
-from typing import Optional  # Typ för valfria strängar
-import tempfile  # Skapar temporära filer
+from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Query, Header, Depends  # FastAPI-komponenter för routes, headers och fel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse  # JSON-, text-, fil- och ström-respons
+from typing import Literal, Optional, Tuple  # Typer för valfria strängar, fasta värden och tupler
 import os  # Filhantering på OS-nivå
+import json  # Serialiserar SSE-händelser
+import asyncio  # Kör CPU-tungt arbete utanför event loop
+import time  # Mäter tid för hämtningar
+import httpx  # Feltyper från anrop till LM Studio
+from datetime import datetime  # Datumfilter för sparade jobbannonser
 from pathlib import Path  # Path-verktyg för sökvägar
-from docx import Document  # Skapar DOCX-filer från text
-from app.services import pdf_exporter  # Skapar PDF-filer från text
 
-from app.services import cv_reader, cv_storage  # Importerar CV-läsare och lagring
-from app.models import JobPostingInput, KeywordRequest, OptimizeRequest  # Importerar request-modeller
-from app.services import job_scraper, keyword_extractor, lm_studio_client  # Importerar webbskrapare, keywords och AI-klient
+from app.services import cv_reader, cv_storage, document_ingest  # Importerar CV-läsare, lagring och uppladdning
+from app.models import BatchOptimizeRequest, CrawlRequest, JobPostingInput, KeywordRankRequest, KeywordRequest, OptimizeRequest  # Importerar request-modeller
+from app.services import crawler, job_scraper, keyword_extractor, keyword_scoring, lm_studio_client  # Importerar webbskrapare, keywords och AI-klient
+from app.services import batch_optimizer, cv_sections, document_renderer, llm_router, llm_scheduler, optimization_jobs, posting_store, prompt_budget, result_cache, tracing  # Batch, sektioner, LLM-backends, LLM-kö, jobb, annonsarkiv, cache och spårning
 
 router = APIRouter(prefix="/api/cv", tags=["CV"])
 
@@ -23,12 +26,52 @@ def _normalize_input_text(value: Optional[str]) -> Optional[str]:  # Normalisera
         return None  # Returnerar None för att undvika felaktig prompt
     return stripped  # Returnerar normaliserad text
 
+def _namespace(x_session_id: Optional[str] = Header(None)) -> str:  # Användarens/sessionens namnrymd från X-Session-Id
+    try:  # Validerar sessions-id
+        return cv_storage.normalize_namespace(x_session_id)  # Default-namnrymd om headern saknas
+    except cv_storage.InvalidNamespaceError as e:  # Otillåtna tecken
+        raise HTTPException(status_code=400, detail=str(e))  # Returnerar 400
+
 def _is_cookie_banner(text: str) -> bool:  # Enkel kontroll för cookie-banner-text
-    lowered = text.lower()  # Gör texten gemener för enkel matchning
-    return "kakor" in lowered or "cookies" in lowered  # Returnerar True om texten ser ut som cookie-banner
+    return job_scraper.is_cookie_banner(text)  # Samma kontroll som batch-optimeringen använder
+
+async def _resolve_optimize_texts(input_data: OptimizeRequest, namespace: str) -> Tuple[str, str]:  # Gemensam input-hantering för optimize-endpoints
+    job_text = _normalize_input_text(input_data.job_text) or await cv_storage.get_job_posting(namespace)  # Hämtar jobbannons om den saknas i request
+    cv_text = _normalize_input_text(input_data.cv_text) or await cv_storage.get_master_cv(namespace)  # Hämtar CV om den saknas i request
+    if not job_text or not cv_text:  # Validerar att båda texterna finns
+        raise HTTPException(status_code=400, detail="Saknar jobbannons eller CV")  # Returnerar fel vid saknad data
+    if _is_cookie_banner(job_text):  # Stoppar om jobbannonsen är cookie-banner
+        raise HTTPException(status_code=400, detail="Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt felmeddelande
+    return cv_text, job_text  # Returnerar texterna i samma ordning som optimize_cv tar dem
+
+def _admission_http_error(error: llm_scheduler.AdmissionError) -> HTTPException:  # Översätter köavslag till HTTP-fel
+    status_code = 429 if isinstance(error, llm_scheduler.QueueFullError) else 503  # Full kö = 429, överbelastning = 503
+    return HTTPException(  # Snabbt avslag med tips om när klienten kan försöka igen
+        status_code=status_code,  # HTTP-status
+        detail=str(error),  # Felmeddelande på svenska
+        headers={"Retry-After": str(error.retry_after)},  # Sekunder till nytt försök
+    )  # Slut på fel
+
+def _llm_http_error(error: Exception) -> HTTPException:  # Översätter fel från LM Studio till HTTP-fel
+    if isinstance(error, llm_scheduler.AdmissionError):  # Kön är full, överbelastad eller ingen backend tillgänglig
+        return _admission_http_error(error)  # 429/503 med Retry-After
+    if isinstance(error, (httpx.HTTPError, llm_router.BackendFailure, lm_studio_client.IncompleteStreamError)):  # LM Studio svarade fel eller inte alls
+        return HTTPException(status_code=502, detail=f"LM Studio svarade inte korrekt: {str(error)}")  # Felet ligger uppströms
+    return HTTPException(status_code=500, detail=f"Ett fel uppstod: {str(error)}")  # Övriga fel som i resten av API:t
+
+def _validate_optimize_mode(input_data: OptimizeRequest) -> None:  # Kontrollerar att läge och språkval går ihop
+    if input_data.mode == "sections" and input_data.language != "both":  # Sektionerna behåller CV:ts egna språk
+        raise HTTPException(status_code=400, detail="Språkval stöds inte i sektionsläget, använd mode 'full' eller 'languages'")  # Tydligt fel
+
+async def _run_optimize(input_data: OptimizeRequest, cv_text: str, job_text: str) -> str:  # Kör optimering genom kön
+    _validate_optimize_mode(input_data)  # Läge och språkval
+    try:  # Fångar köavslag
+        return await optimization_jobs.optimize(cv_text, job_text, input_data.mode, input_data.language, input_data.priority)  # Samma val som bakgrundsjobben
+    except llm_scheduler.AdmissionError as e:  # Kön är full eller väntetiden för lång
+        raise _admission_http_error(e)  # Returnerar 429/503 med Retry-After
 
 @router.post("/upload")
-async def upload_cv(file: UploadFile = File()):
+async def upload_cv(file: UploadFile = File(), namespace: str = Depends(_namespace)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Ingen fil vald")
     
@@ -48,27 +91,27 @@ async def upload_cv(file: UploadFile = File()):
     temp_file_path = None
     
     try:
-        content = await file.read()
+        temp_file_path, content_hash = await document_ingest.save_upload(file, file_suffix)  # Strömmar till disk i bitar
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        cv_text = await cv_reader.read_cv_from_file(temp_file_path, content_hash)  # Samma fil som förut hoppar över tolkningen
         
-        cv_text = await cv_reader.read_cv_from_file(temp_file_path)
-        
-        saved_path = await cv_storage.save_master_cv(cv_text)
+        saved = await cv_storage.save_master_cv(cv_text, namespace)
         
         return JSONResponse(content={
             "success": True,
             "filename": file.filename,
             "text": cv_text,
             "length": len(cv_text),
-            "saved_to": saved_path
+            "saved_to": saved["saved_to"],
+            "version": saved["version"]
         })
         
     except cv_reader.CVReadError as e:
         raise HTTPException(status_code=400, detail=str(e))
         
+    except document_ingest.UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ett fel uppstod: {str(e)}")
         
@@ -79,8 +122,26 @@ async def upload_cv(file: UploadFile = File()):
             except PermissionError:
                 pass
 
+@router.post("/upload-zip")  # Tar emot ett zip-arkiv med många CV:n och tolkar dem parallellt
+async def upload_cv_zip(file: UploadFile = File()):  # Zip-arkivet som ska tolkas
+    if not file.filename or Path(file.filename).suffix.lower() != ".zip":  # Bara zip-filer
+        raise HTTPException(status_code=400, detail="Ladda upp en .zip-fil med PDF- eller DOCX-filer")  # Tydligt fel
+    temp_file_path = None  # Sökväg till uppladdat arkiv
+    try:  # Tar alltid bort arkivet efteråt
+        temp_file_path, _ = await document_ingest.save_upload(file, ".zip")  # Strömmar arkivet till disk
+        result = await document_ingest.ingest_zip(temp_file_path)  # Packar upp och tolkar alla CV:n
+    except document_ingest.UploadTooLargeError as e:  # För stor uppladdning
+        raise HTTPException(status_code=413, detail=str(e))  # Returnerar 413
+    except document_ingest.ZipContentError as e:  # Trasigt eller för stort arkiv
+        raise HTTPException(status_code=400, detail=str(e))  # Returnerar 400
+    finally:  # Körs alltid
+        if temp_file_path and os.path.exists(temp_file_path):  # Om arkivet sparades
+            os.unlink(temp_file_path)  # Tar bort det
+    result["filename"] = file.filename  # Arkivets namn
+    return JSONResponse(content=result)  # Resultat per CV och sammanfattning
+
 @router.post("/job-posting")
-async def submit_job_posting(input_data: JobPostingInput):
+async def submit_job_posting(input_data: JobPostingInput, namespace: str = Depends(_namespace)):
     if not input_data.text and not input_data.url:
         raise HTTPException(status_code=400, detail="Antingen text eller url måste anges")
     
@@ -93,46 +154,60 @@ async def submit_job_posting(input_data: JobPostingInput):
         else:
             job_text = input_data.text
         
-        saved_path = await cv_storage.save_job_posting(job_text)
+        saved = await cv_storage.save_job_posting(job_text, namespace)
+        posting = await posting_store.add_posting(job_text, input_data.url)
         
         return JSONResponse(content={
             "success": True,
             "text": job_text,
             "length": len(job_text),
-            "saved_to": saved_path
+            "saved_to": saved["saved_to"],
+            "version": saved["version"],
+            "posting_id": posting["id"]
         })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/job-posting-raw")  # Tar emot raw text för jobbannons
-async def submit_job_posting_raw(raw_text: str = Body(..., media_type="text/plain")):
+async def submit_job_posting_raw(raw_text: str = Body(..., media_type="text/plain"), namespace: str = Depends(_namespace)):
     cleaned = raw_text.strip()  # Tar bort onödiga blanksteg
     if not cleaned:  # Säkerställer att texten inte är tom
         raise HTTPException(status_code=400, detail="Jobbannonsen är tom")  # Returnerar fel om tom
     if _is_cookie_banner(cleaned):  # Stoppar cookie-text
         raise HTTPException(status_code=400, detail="Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt fel
-    saved_path = await cv_storage.save_job_posting(cleaned)  # Sparar jobbannonsen
+    saved = await cv_storage.save_job_posting(cleaned, namespace)  # Sparar jobbannonsen som ny version
+    posting = await posting_store.add_posting(cleaned)  # Lägger till annonsen i det sökbara arkivet
     return JSONResponse(content={  # Returnerar resultat
         "success": True,  # Indikerar att sparning lyckades
         "length": len(cleaned),  # Längden på texten
-        "saved_to": saved_path,  # Var filen sparades
+        "saved_to": saved["saved_to"],  # Var filen sparades
+        "version": saved["version"],  # Versions-id (hash av innehållet)
+        "posting_id": posting["id"],  # Annonsens id i arkivet
     })  # Slut på svar
 
 @router.post("/master-cv-raw")  # Tar emot raw text för CV
-async def submit_master_cv_raw(raw_text: str = Body(..., media_type="text/plain")):
+async def submit_master_cv_raw(raw_text: str = Body(..., media_type="text/plain"), namespace: str = Depends(_namespace)):
     cleaned = raw_text.strip()  # Tar bort onödiga blanksteg
     if not cleaned:  # Säkerställer att texten inte är tom
         raise HTTPException(status_code=400, detail="CV-texten är tom")  # Returnerar fel om tom
-    saved_path = await cv_storage.save_master_cv(cleaned)  # Sparar CV-texten
+    saved = await cv_storage.save_master_cv(cleaned, namespace)  # Sparar CV-texten som ny version
     return JSONResponse(content={  # Returnerar resultat
         "success": True,  # Indikerar att sparning lyckades
         "length": len(cleaned),  # Längden på texten
-        "saved_to": saved_path,  # Var filen sparades
+        "saved_to": saved["saved_to"],  # Var filen sparades
+        "version": saved["version"],  # Versions-id (hash av innehållet)
     })  # Slut på svar
 
+async def _stored_text(kind: str, namespace: str, version: Optional[str]) -> str:  # Aktuell eller specifik version av ett sparat dokument
+    if version:  # Klienten vill ha en äldre version
+        return await cv_storage.get_version(kind, version, namespace) or ""  # Tom text om versionen saknas
+    if kind == cv_storage.KIND_MASTER_CV:  # Master-CV
+        return await cv_storage.get_master_cv(namespace)  # Aktuell version från cache eller disk
+    return await cv_storage.get_job_posting(namespace)  # Aktuell jobbannons från cache eller disk
+
 @router.get("/master-cv")
-async def get_master_cv():
-    cv_text = cv_storage.get_master_cv()
+async def get_master_cv(version: Optional[str] = None, namespace: str = Depends(_namespace)):
+    cv_text = await _stored_text(cv_storage.KIND_MASTER_CV, namespace, version)
     if not cv_text:
         raise HTTPException(status_code=404, detail="Inget master CV hittades")
     return JSONResponse(content={
@@ -140,9 +215,13 @@ async def get_master_cv():
         "length": len(cv_text)
     })
 
+@router.get("/master-cv/versions")  # Versionshistorik för master-CV:t i sessionen
+async def list_master_cv_versions(namespace: str = Depends(_namespace)):  # Namnrymd från X-Session-Id
+    return JSONResponse(content={"versions": await cv_storage.list_versions(cv_storage.KIND_MASTER_CV, namespace)})  # Nyaste först
+
 @router.get("/job-posting")
-async def get_job_posting():
-    job_text = cv_storage.get_job_posting()
+async def get_job_posting(version: Optional[str] = None, namespace: str = Depends(_namespace)):
+    job_text = await _stored_text(cv_storage.KIND_JOB_POSTING, namespace, version)
     if not job_text:
         raise HTTPException(status_code=404, detail="Ingen jobbannons hittades")
     return JSONResponse(content={
@@ -150,77 +229,260 @@ async def get_job_posting():
         "length": len(job_text)
     })
 
+@router.get("/job-posting/versions")  # Versionshistorik för jobbannonsen i sessionen
+async def list_job_posting_versions(namespace: str = Depends(_namespace)):  # Namnrymd från X-Session-Id
+    return JSONResponse(content={"versions": await cv_storage.list_versions(cv_storage.KIND_JOB_POSTING, namespace)})  # Nyaste först
+
+@router.get("/job-postings")  # Listar sparade jobbannonser, nyaste först
+async def list_job_postings(limit: int = Query(20, ge=1, le=200), offset: int = Query(0, ge=0)):  # Paginering
+    return JSONResponse(content=await posting_store.list_postings(limit, offset))  # Returnerar sidan som JSON
+
+@router.get("/job-postings/matches")  # Bästa jobbannonserna för master CV:t
+async def match_job_postings(  # Paginering och datumfilter via query-parametrar
+    limit: int = Query(10, ge=1, le=200),  # Antal träffar per sida
+    offset: int = Query(0, ge=0),  # Hur många träffar som hoppas över
+    added_after: Optional[datetime] = None,  # Bara annonser tillagda efter detta datum
+    added_before: Optional[datetime] = None,  # Bara annonser tillagda före detta datum
+    namespace: str = Depends(_namespace),  # Sessionens master-CV används som fråga
+):  # Slut på parametrar
+    cv_text = await cv_storage.get_master_cv(namespace)  # Söker med master CV:t
+    if not cv_text:  # Validerar att CV finns
+        raise HTTPException(status_code=404, detail="Inget master CV hittades")  # Returnerar fel vid saknad data
+    result = await posting_store.search(  # BM25-sökning i det inverterade indexet
+        cv_text,  # Frågetext
+        limit,  # Sidstorlek
+        offset,  # Startposition
+        added_after.timestamp() if added_after else None,  # Undre datumgräns
+        added_before.timestamp() if added_before else None,  # Övre datumgräns
+    )  # Slut på sökning
+    result.update({"limit": limit, "offset": offset})  # Lägger till pagineringsinfo
+    return JSONResponse(content=result)  # Returnerar träffarna som JSON
+
+@router.post("/job-postings/crawl")  # Hämtar många jobbannonser samtidigt och lägger dem i arkivet
+async def crawl_job_postings(input_data: CrawlRequest):  # Tar emot URL:er
+    if not input_data.urls:  # Validerar att det finns URL:er
+        raise HTTPException(status_code=400, detail="Listan med URL:er är tom")  # Returnerar fel vid tom lista
+    started = time.perf_counter()  # Starttid för hela hämtningen
+    results = await crawler.crawl(input_data.urls, input_data.max_parallel)  # Samtidiga hämtningar med HTTP-cache
+    items = []  # Resultat per URL utan hela texten
+    for result in results:  # Går igenom i URL-ordning
+        text = result.pop("text", None)  # Annonstexten (saknas vid fel)
+        if text is not None and _is_cookie_banner(text):  # Extraktionen gav bara cookie-text
+            result.update({"success": False, "error": "Sidan ser ut att bara innehålla cookie-text"})  # Markerar som fel
+        elif text is not None:  # Lyckad hämtning
+            result["length"] = len(text)  # Antal tecken
+            if input_data.save:  # Lägger till i arkivet
+                result["posting_id"] = (await posting_store.add_posting(text, result["url"]))["id"]  # Id i annonsarkivet
+        items.append(result)  # Sparar resultatet
+    succeeded = sum(1 for item in items if item["success"])  # Antal lyckade
+    return JSONResponse(content={  # Sammanfattning och resultat per URL
+        "items": items,  # Resultat i samma ordning som URL:erna
+        "total": len(items),  # Antal URL:er
+        "succeeded": succeeded,  # Antal lyckade
+        "failed": len(items) - succeeded,  # Antal misslyckade
+        "elapsed_seconds": round(time.perf_counter() - started, 3),  # Total tid
+        "crawler": crawler.stats(),  # Cache-räknare sedan start
+    })  # Slut på svar
+
+@router.get("/job-postings/{posting_id}")  # Hämtar en sparad jobbannons
+async def get_stored_job_posting(posting_id: int):  # Tar emot annonsens id
+    posting = await posting_store.get_posting(posting_id)  # Läser annonsen
+    if posting is None:  # Okänt id
+        raise HTTPException(status_code=404, detail="Jobbannonsen hittades inte")  # Returnerar 404
+    return JSONResponse(content=posting)  # Returnerar annonsen som JSON
+
 @router.post("/keywords")  # Endpoint för att jämföra keywords
-async def extract_keywords(input_data: KeywordRequest):  # Tar emot job_text/cv_text/top_n
-    job_text = input_data.job_text or cv_storage.get_job_posting()  # Använder sparad jobbannons om ingen text skickas
-    cv_text = input_data.cv_text or cv_storage.get_master_cv()  # Använder sparat CV om ingen text skickas
+async def extract_keywords(input_data: KeywordRequest, namespace: str = Depends(_namespace)):  # Tar emot job_text/cv_text/top_n
+    job_text = input_data.job_text or await cv_storage.get_job_posting(namespace)  # Använder sparad jobbannons om ingen text skickas
+    cv_text = input_data.cv_text or await cv_storage.get_master_cv(namespace)  # Använder sparat CV om ingen text skickas
     if not job_text or not cv_text:  # Validerar att båda texterna finns
         raise HTTPException(status_code=400, detail="Saknar jobbannons eller CV")  # Returnerar fel vid saknad data
-    result = keyword_extractor.compare_keywords(job_text, cv_text, input_data.top_n)  # Kör keyword-jämförelse
+    with tracing.span("keywords"):  # Tid för keyword-analysen
+        if input_data.mode == "weighted":  # Viktad jämförelse med n-gram
+            result = keyword_scoring.compare_keywords_weighted(job_text, cv_text, input_data.top_n, input_data.method)  # Samma fält plus vikter
+        else:  # Kompatibilitetsläge: samma svar som tidigare
+            result = keyword_extractor.compare_keywords(job_text, cv_text, input_data.top_n)  # Kör keyword-jämförelse
     return JSONResponse(content=result)  # Returnerar resultatet som JSON
 
+def _build_and_rank(input_data: KeywordRankRequest, cv_text: str):  # Synkron rankning som körs i trådpool
+    engine = keyword_scoring.KeywordScoringEngine(input_data.job_texts)  # Bygger term-dokument-matrisen
+    return engine, engine.rank(cv_text, input_data.top_k, input_data.method)  # Rankar alla jobbannonser på en gång
+
+@router.post("/keywords/rank")  # Rankar många jobbannonser mot ett CV i ett vektoriserat svep
+async def rank_job_postings(input_data: KeywordRankRequest, namespace: str = Depends(_namespace)):  # Tar emot CV och jobbannonser
+    cv_text = _normalize_input_text(input_data.cv_text) or await cv_storage.get_master_cv(namespace)  # Använder master CV om inget skickas
+    if not cv_text:  # Validerar att CV finns
+        raise HTTPException(status_code=400, detail="Saknar CV")  # Returnerar fel vid saknad data
+    if not input_data.job_texts:  # Validerar att det finns jobbannonser
+        raise HTTPException(status_code=400, detail="Listan med jobbannonser är tom")  # Returnerar fel vid tom lista
+    loop = asyncio.get_event_loop()  # Hämtar event loop för att inte blockera andra anrop
+    with tracing.span("keywords"):  # Tid för matris och rankning
+        engine, matches = await loop.run_in_executor(None, lambda: _build_and_rank(input_data, cv_text))  # Matris och scipy-rankning i trådpool
+    return JSONResponse(content={  # Returnerar rankade träffar
+        "method": input_data.method,  # Använd viktning
+        "documents": len(input_data.job_texts),  # Antal rankade jobbannonser
+        "vocabulary": len(engine.vocabulary),  # Antal unika termer i korpusen
+        "matches": matches,  # Bästa träffarna med viktade saknade keywords
+    })  # Slut på svar
+
 @router.post("/optimize")  # Endpoint för AI-optimering av CV
-async def optimize_cv(input_data: OptimizeRequest):  # Tar emot input för optimering
-    job_text = _normalize_input_text(input_data.job_text) or cv_storage.get_job_posting()  # Hämtar jobbannons om den saknas i request
-    cv_text = _normalize_input_text(input_data.cv_text) or cv_storage.get_master_cv()  # Hämtar CV om den saknas i request
-    if not job_text or not cv_text:  # Validerar att båda texterna finns
-        raise HTTPException(status_code=400, detail="Saknar jobbannons eller CV")  # Returnerar fel vid saknad data
-    if _is_cookie_banner(job_text):  # Stoppar om jobbannonsen är cookie-banner
-        raise HTTPException(status_code=400, detail="Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt felmeddelande
-    optimized_text = await lm_studio_client.optimize_cv(cv_text, job_text)  # Anropar LM Studio för optimering
+async def optimize_cv(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot input för optimering
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Hämtar och validerar CV och jobbannons
+    optimized_text = await _run_optimize(input_data, cv_text, job_text)  # Delad (cachad, köad) generering för alla format
     return JSONResponse(content={  # Returnerar optimerat CV
         "optimized_cv": optimized_text,  # Den optimerade CV-texten
         "length": len(optimized_text),  # Antal tecken i svaret
+        "prompt_budget": lm_studio_client.prompt_report(cv_text, job_text),  # Tokens före och efter komprimering
     })  # Slut på JSON-svar
 
+@router.post("/prompt-budget")  # Visar hur prompten komprimeras utan att anropa modellen
+async def preview_prompt_budget(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Samma input som /optimize
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Hämtar och validerar CV och jobbannons
+    report = lm_studio_client.prompt_report(cv_text, job_text)  # Tokenrapport
+    report["compressed_job_text"] = lm_studio_client.CVContext(cv_text).fit_job(job_text).text  # Texten som modellen faktiskt får
+    return JSONResponse(content=report)  # Returnerar rapporten som JSON
+
+def _format_sse(event: str, data: dict) -> str:  # Formaterar en Server-Sent Event
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"  # SSE-format: event-rad, data-rad, tom rad
+
+@router.post("/optimize-sections")  # Endpoint som optimerar CV:t sektion för sektion
+async def optimize_cv_sections(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot input för optimering
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Hämtar och validerar CV och jobbannons
+    try:  # Fångar köavslag
+        result = await cv_sections.optimize_sections(cv_text, job_text, input_data.priority)  # Bara ändrade sektioner genereras
+    except llm_scheduler.AdmissionError as e:  # Kön är full eller väntetiden för lång
+        raise _admission_http_error(e)  # Returnerar 429/503 med Retry-After
+    result["length"] = len(result["optimized_cv"])  # Antal tecken i svaret, som i /optimize
+    return JSONResponse(content=result)  # Returnerar text och statistik per sektion
+
+@router.post("/optimize-stream")  # Endpoint som strömmar optimerat CV som Server-Sent Events
+async def optimize_cv_stream(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot input för optimering
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Validerar innan strömmen öppnas så att fel blir vanliga HTTP-fel
+    events = lm_studio_client.stream_optimize_cv(cv_text, job_text, input_data.priority, input_data.language)  # Händelser från LM Studio
+    try:  # Hämtar första händelsen innan svaret startar
+        first_event = await events.__anext__()  # Köavslag och fel från LM Studio kastas här, innan statuskoden skickats
+    except HTTPException:  # Redan ett HTTP-fel
+        raise  # Skickas vidare oförändrat
+    except Exception as e:  # Köavslag, nätverksfel, felstatus eller ofullständig ström
+        await events.aclose()  # Generatorn är redan avslutad, men stängs uttryckligen
+        raise _llm_http_error(e)  # Vanligt HTTP-fel med detail
+
+    async def event_stream():  # Generator som skickar händelser till klienten
+        try:  # Fångar fel mitt i strömmen
+            yield _format_sse(first_event.pop("type"), first_event)  # Skickar den redan hämtade händelsen
+            async for event in events:  # Resterande köstatus, tokens och slut-händelse
+                yield _format_sse(event.pop("type"), event)  # Skickar händelsen
+        except Exception as e:  # Statuskoden är redan skickad, så fel rapporteras som händelse
+            yield _format_sse("error", {"detail": f"Ett fel uppstod: {str(e)}"})  # Felhändelse till klienten
+        finally:  # Även när klienten kopplar ner
+            await events.aclose()  # Lämnar köplatsen och single-flight direkt i stället för vid skräpsamling
+
+    return StreamingResponse(  # Returnerar strömmande svar
+        event_stream(),  # Händelsegeneratorn
+        media_type="text/event-stream",  # MIME-typ för SSE
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Stänger av buffring i proxies
+    )  # Slut på ström-respons
+
+@router.post("/optimize-batch")  # Optimerar ett CV mot många jobbannonser och strömmar resultat per jobb
+async def optimize_cv_batch(input_data: BatchOptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot CV och lista med jobbannonser
+    cv_text = _normalize_input_text(input_data.cv_text) or await cv_storage.get_master_cv(namespace)  # Hämtar master CV om inget skickas
+    if not cv_text:  # Validerar att CV finns
+        raise HTTPException(status_code=400, detail="Saknar CV")  # Returnerar fel vid saknad data
+    if not input_data.jobs:  # Validerar att det finns jobb
+        raise HTTPException(status_code=400, detail="Listan med jobbannonser är tom")  # Returnerar fel vid tom lista
+    items = []  # Batch-element i klientens ordning
+    for index, job in enumerate(input_data.jobs):  # Validerar varje jobbannons innan strömmen öppnas
+        text = _normalize_input_text(job.text)  # Normaliserar eventuell text
+        if bool(text) == bool(job.url):  # Exakt en av text och url krävs
+            raise HTTPException(status_code=400, detail=f"Jobb {index}: ange antingen text eller url")  # Tydligt fel per jobb
+        items.append(batch_optimizer.BatchItem(index, text=text, url=job.url))  # Lägger till elementet
+
+    async def event_stream():  # Generator som skickar händelser till klienten
+        try:  # Fångar oväntade fel mitt i strömmen
+            async for event in batch_optimizer.optimize_batch(cv_text, items, input_data.max_parallel, input_data.priority):  # Resultat per jobb
+                yield _format_sse(event.pop("type"), event)  # Skickar job- eller summary-händelse
+        except Exception as e:  # Statuskoden är redan skickad, så fel rapporteras som händelse
+            yield _format_sse("error", {"detail": f"Ett fel uppstod: {str(e)}"})  # Felhändelse till klienten
+
+    return StreamingResponse(  # Returnerar strömmande svar
+        event_stream(),  # Händelsegeneratorn
+        media_type="text/event-stream",  # MIME-typ för SSE
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Stänger av buffring i proxies
+    )  # Slut på ström-respons
+
+@router.get("/queue")  # Endpoint som visar status för LLM-kön
+async def get_queue_status():  # Returnerar aktiva, köade och beräknad väntetid
+    stats = llm_scheduler.scheduler.stats()  # Köstatus
+    stats["prompt_budget"] = prompt_budget.stats()  # Sparade prompt-tokens sedan start
+    return JSONResponse(content=stats)  # Returnerar köstatus som JSON
+
+@router.get("/llm-backends")  # Endpoint som visar status för alla LLM-backends
+async def get_llm_backends():  # Returnerar hälsa, circuit breaker-läge, belastning och latens per backend
+    return JSONResponse(content=llm_router.router.stats())  # Returnerar statusen som JSON
+
+@router.get("/optimize-cache")  # Endpoint som visar statistik för optimeringscachen
+async def get_optimize_cache_stats():  # Returnerar träffar, missar och storlek
+    stats = await result_cache.stats()  # Hämtar cache-statistik
+    stats["in_flight"] = lm_studio_client.inflight_stats()  # Lägger till pågående delade genereringar
+    stats["rendered_documents"] = document_renderer.stats()  # Lägger till cachen för DOCX/PDF
+    stats["keyword_sets"] = keyword_extractor.stats()  # Lägger till keyword-analyser per innehållshash
+    return JSONResponse(content=stats)  # Returnerar statistiken som JSON
+
+async def _document_response(optimized_text: str, fmt: str) -> Response:  # Renderar i arbetarprocess och returnerar filen som download
+    content = await document_renderer.render(optimized_text, fmt)  # Cachad rendering i minnet, inga temporära filer
+    return Response(  # Returnerar filen direkt från minnet
+        content=content,  # Filens bytes
+        media_type=document_renderer.MEDIA_TYPES[fmt],  # MIME-typ för formatet
+        headers={"Content-Disposition": f'attachment; filename="optimized_cv.{fmt}"'},  # Filnamn för nedladdning
+    )  # Slut på respons
+
 @router.post("/optimize-docx")  # Endpoint som returnerar optimerat CV som DOCX
-async def optimize_cv_docx(input_data: OptimizeRequest):  # Tar emot input för optimering
-    job_text = _normalize_input_text(input_data.job_text) or cv_storage.get_job_posting()  # Hämtar jobbannons om den saknas i request
-    cv_text = _normalize_input_text(input_data.cv_text) or cv_storage.get_master_cv()  # Hämtar CV om den saknas i request
-    if not job_text or not cv_text:  # Validerar att båda texterna finns
-        raise HTTPException(status_code=400, detail="Saknar jobbannons eller CV")  # Returnerar fel vid saknad data
-    if _is_cookie_banner(job_text):  # Stoppar om jobbannonsen är cookie-banner
-        raise HTTPException(status_code=400, detail="Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt felmeddelande
-    optimized_text = await lm_studio_client.optimize_cv(cv_text, job_text)  # Anropar LM Studio för optimering
-    doc = Document()  # Skapar ett nytt DOCX-dokument
-    lines = [line.strip() for line in optimized_text.splitlines()]  # Delar upp texten rad för rad
-    for line in lines:  # Loopar igenom varje rad
-        if not line:  # Hoppar över tomma rader
-            continue  # Går vidare till nästa rad
-        if line.startswith("=== ") and line.endswith(" ==="):  # Identifierar språk-sektioner
-            doc.add_paragraph(line.replace("=", "").strip(), style="Heading 1")  # Lägger till huvudrubrik
-        elif line.startswith("- ") or line.startswith("* "):  # Identifierar punktlistor
-            doc.add_paragraph(line[2:], style="List Bullet")  # Lägger till bullet-paragraf
-        elif line.isupper() or line.endswith(":"):  # Enkel heuristik för rubriker
-            doc.add_paragraph(line, style="Heading 2")  # Lägger till rubrik
-        else:  # Standardrad
-            doc.add_paragraph(line)  # Lägger till vanlig paragraf
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")  # Skapar temporär fil
-    temp_path = temp_file.name  # Sparar sökvägen till temp-filen
-    temp_file.close()  # Stänger filen innan vi skriver DOCX (Windows-lås)
-    doc.save(temp_path)  # Sparar DOCX till temp-filen
-    return FileResponse(  # Returnerar DOCX-filen som download
-        temp_path,  # Sökväg till filen
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # MIME-typ för DOCX
-        filename="optimized_cv.docx",  # Filnamn för nedladdning
-    )  # Slut på fil-respons
+async def optimize_cv_docx(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot input för optimering
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Hämtar och validerar CV och jobbannons
+    optimized_text = await _run_optimize(input_data, cv_text, job_text)  # Delad (cachad, köad) generering för alla format
+    return await _document_response(optimized_text, document_renderer.FORMAT_DOCX)  # Returnerar DOCX-filen som download
 
 @router.post("/optimize-pdf")  # Endpoint som returnerar optimerat CV som PDF
-async def optimize_cv_pdf(input_data: OptimizeRequest):  # Tar emot input för optimering
-    job_text = _normalize_input_text(input_data.job_text) or cv_storage.get_job_posting()  # Hämtar jobbannons om den saknas i request
-    cv_text = _normalize_input_text(input_data.cv_text) or cv_storage.get_master_cv()  # Hämtar CV om den saknas i request
-    if not job_text or not cv_text:  # Validerar att båda texterna finns
-        raise HTTPException(status_code=400, detail="Saknar jobbannons eller CV")  # Returnerar fel vid saknad data
-    if _is_cookie_banner(job_text):  # Stoppar om jobbannonsen är cookie-banner
-        raise HTTPException(status_code=400, detail="Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt felmeddelande
-    optimized_text = await lm_studio_client.optimize_cv(cv_text, job_text)  # Anropar LM Studio för optimering
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")  # Skapar temporär PDF-fil
-    temp_path = temp_file.name  # Hämtar temp-sökväg
-    temp_file.close()  # Stänger filen innan vi skriver (Windows-lås)
-    pdf_exporter.create_pdf_from_text(optimized_text, temp_path)  # Skapar PDF från text
-    return FileResponse(  # Returnerar PDF-filen som download
-        temp_path,  # Sökväg till filen
-        media_type="application/pdf",  # MIME-typ för PDF
-        filename="optimized_cv.pdf",  # Filnamn för nedladdning
-    )  # Slut på fil-respons
+async def optimize_cv_pdf(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot input för optimering
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Hämtar och validerar CV och jobbannons
+    optimized_text = await _run_optimize(input_data, cv_text, job_text)  # Delad (cachad, köad) generering för alla format
+    return await _document_response(optimized_text, document_renderer.FORMAT_PDF)  # Returnerar PDF-filen som download
+
+@router.post("/jobs")  # Lägger en optimering i bakgrunden och svarar direkt
+async def create_optimization_job(input_data: OptimizeRequest, namespace: str = Depends(_namespace)):  # Tar emot samma input som /optimize
+    _validate_optimize_mode(input_data)  # Samma regler som /optimize
+    cv_text, job_text = await _resolve_optimize_texts(input_data, namespace)  # Validerar input innan jobbet skapas
+    job = await optimization_jobs.submit(cv_text, job_text, input_data.priority, input_data.mode, input_data.language)  # Sparar och startar jobbet
+    return JSONResponse(status_code=202, content=job)  # 202 Accepted: arbetet pågår, hämta status via GET
+
+@router.post("/jobs/{job_id}/cancel")  # Avbryter ett jobb som inte är klart
+async def cancel_optimization_job(job_id: str):  # Tar emot jobbets id
+    job = await optimization_jobs.cancel(job_id)  # Avbryter och läser ny status
+    if job is None:  # Okänt id
+        raise HTTPException(status_code=404, detail="Jobbet hittades inte")  # Returnerar 404
+    if job["status"] != optimization_jobs.STATUS_CANCELLED:  # Jobbet hann bli klart eller misslyckas
+        raise HTTPException(status_code=409, detail=f"Jobbet kan inte avbrytas (status: {job['status']})")  # Returnerar 409 Conflict
+    return JSONResponse(content=job)  # Returnerar jobbet som JSON
+
+@router.get("/jobs/{job_id}")  # Läser status, tider och resultat för ett jobb
+async def get_optimization_job(job_id: str):  # Tar emot jobbets id
+    job = await optimization_jobs.get(job_id)  # Hämtar jobbet från databasen
+    if job is None:  # Okänt id
+        raise HTTPException(status_code=404, detail="Jobbet hittades inte")  # Returnerar 404
+    return JSONResponse(content=job)  # Returnerar jobbet som JSON
 
+@router.get("/jobs/{job_id}/download")  # Laddar ner ett färdigt resultat utan nytt LLM-anrop
+async def download_optimization_job(job_id: str, format: Literal["text", "docx", "pdf"] = "text"):  # Format väljs med query-parameter
+    job = await optimization_jobs.get(job_id)  # Hämtar jobbet från databasen
+    if job is None:  # Okänt id
+        raise HTTPException(status_code=404, detail="Jobbet hittades inte")  # Returnerar 404
+    if job["status"] != optimization_jobs.STATUS_DONE:  # Resultatet finns inte än
+        raise HTTPException(status_code=409, detail=f"Jobbet är inte klart (status: {job['status']})")  # Returnerar 409 Conflict
+    if format == "docx":  # Word-format
+        return await _document_response(job["result"], document_renderer.FORMAT_DOCX)  # Returnerar DOCX
+    if format == "pdf":  # PDF-format
+        return await _document_response(job["result"], document_renderer.FORMAT_PDF)  # Returnerar PDF
+    return PlainTextResponse(  # Ren text som fil
+        job["result"],  # Den optimerade texten
+        headers={"Content-Disposition": 'attachment; filename="optimized_cv.txt"'},  # Filnamn för nedladdning
+    )  # Slut på text-respons
@@ -0,0 +1,104 @@
+import asyncio  # Kör skrapning och genereringar parallellt
+import os  # Läser konfiguration från miljövariabler
+import time  # Mäter tider per jobb och för hela batchen
+from typing import AsyncIterator, Dict, List, Optional  # Typangivelser för tydlighet
+
+from app.services import job_scraper  # Hämtar jobbannonser från URL:er
+from app.services import llm_scheduler  # Köavslag hanteras genom att vänta och försöka igen
+from app.services import lm_studio_client  # Optimering med cache, single-flight och kö
+
+BATCH_MAX_PARALLEL = 4  # Övre gräns för samtidiga genereringar per batch
+BATCH_MAX_ADMISSION_ATTEMPTS = int(os.getenv("BATCH_MAX_ADMISSION_ATTEMPTS", "5"))  # Köavslag per jobbannons innan den rapporteras som misslyckad
+
+class BatchItem:  # En jobbannons i batchen (text eller URL)
+    def __init__(self, index: int, text: Optional[str] = None, url: Optional[str] = None):  # Skapar ett batch-element
+        self.index = index  # Plats i klientens lista
+        self.text = text  # Jobbannonsens text om den skickades direkt
+        self.url = url  # URL som ska skrapas om texten saknas
+
+async def _generate(  # Kör en generering genom LLM-kön och försöker igen ett begränsat antal gånger om kön är full
+    context: lm_studio_client.CVContext,  # Förberedd CV-kontext som delas av alla jobb
+    job_text: str,  # Jobbannonsens text
+    priority: str,  # Prioritetsklass i LLM-kön
+    generation_slots: asyncio.Semaphore,  # Batchens genereringsplatser
+) -> str:  # Returnerar optimerad text
+    for attempt in range(1, BATCH_MAX_ADMISSION_ATTEMPTS + 1):  # Begränsat antal försök
+        async with generation_slots:  # Platsen hålls bara under själva försöket
+            try:  # Kör optimeringen
+                return await lm_studio_client.optimize_cv(context.cv_text, job_text, priority, context=context)  # Cachad, köad generering
+            except llm_scheduler.AdmissionError as e:  # Kön är full just nu
+                if attempt == BATCH_MAX_ADMISSION_ATTEMPTS:  # Sista försöket
+                    raise llm_scheduler.AdmissionError(f"LLM-kön tog inte emot jobbet efter {attempt} försök: {e}", e.retry_after) from e  # Rapporteras som misslyckat element
+                retry_after = e.retry_after  # Väntetid enligt kön
+        await asyncio.sleep(retry_after)  # Väntar utan att hålla batchens plats
+
+async def _process_item(  # Skrapar (vid behov) och optimerar ett batch-element
+    item: BatchItem,  # Elementet som ska behandlas
+    context: lm_studio_client.CVContext,  # Delad CV-kontext
+    generation_slots: asyncio.Semaphore,  # Begränsar batchens samtidiga genereringar
+    priority: str,  # Prioritetsklass i LLM-kön
+) -> Dict[str, object]:  # Returnerar resultat-händelse för elementet
+    started = time.perf_counter()  # Starttid för elementet
+    result: Dict[str, object] = {"index": item.index, "url": item.url}  # Grundinformation i svaret
+    try:  # Fångar fel per jobb så att resten av batchen fortsätter
+        job_text = item.text  # Texten om den skickades direkt
+        scrape_seconds = 0.0  # Tid för skrapning
+        if item.url:  # Skrapning behövs
+            job_text = await job_scraper.scrape_job_posting(item.url)  # Skrapningar körs samtidigt (begränsat per värd)
+            scrape_seconds = time.perf_counter() - started  # Sparar skrapningstid
+        if not job_text or not job_text.strip():  # Tom jobbannons
+            raise ValueError("Jobbannonsen är tom")  # Tydligt fel
+        if job_scraper.is_cookie_banner(job_text):  # Stoppar cookie-text
+            raise ValueError("Jobbannonsen ser ut att vara cookie-text. Klistra in annonsen som text.")  # Tydligt fel
+        generation_started = time.perf_counter()  # Starttid för generering
+        optimized_text = await _generate(context, job_text.strip(), priority, generation_slots)  # Genererar optimerat CV
+        result.update({  # Lägger till lyckat resultat
+            "status": "done",  # Elementet lyckades
+            "optimized_cv": optimized_text,  # Optimerad CV-text
+            "length": len(optimized_text),  # Antal tecken i svaret
+            "scrape_seconds": round(scrape_seconds, 3),  # Tid för skrapning
+            "generation_seconds": round(time.perf_counter() - generation_started, 3),  # Tid för generering (inkl. kö)
+        })  # Slut på uppdatering
+    except Exception as e:  # Skrapning eller generering misslyckades
+        result.update({"status": "failed", "error": str(e)})  # Sparar felet för elementet
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 3)  # Total tid för elementet
+    return result  # Returnerar resultatet
+
+async def optimize_batch(  # Optimerar ett CV mot många jobbannonser och strömmar resultat allteftersom de blir klara
+    cv_text: str,  # Master-CV:t
+    items: List[BatchItem],  # Jobbannonser som text eller URL
+    max_parallel: int = 2,  # Antal samtidiga genereringar för batchen
+    priority: str = llm_scheduler.PRIORITY_BATCH,  # Prioritetsklass i LLM-kön
+) -> AsyncIterator[Dict[str, object]]:  # Händelser: job per element och summary sist
+    started = time.perf_counter()  # Starttid för batchen
+    context = lm_studio_client.CVContext(cv_text)  # CV-sidans förbehandling görs en gång för alla jobb
+    parallel = max(1, min(max_parallel, BATCH_MAX_PARALLEL))  # Begränsad parallellism
+    generation_slots = asyncio.Semaphore(parallel)  # Semafor som håller gränsen
+    tasks = [  # Startar alla element direkt så att skrapningar sker samtidigt
+        asyncio.ensure_future(_process_item(item, context, generation_slots, priority))  # En task per jobbannons
+        for item in items  # Går igenom alla element
+    ]  # Slut på tasks
+    succeeded = 0  # Antal lyckade element
+    output_chars = 0  # Totalt antal genererade tecken
+    try:  # Avbryter kvarvarande tasks om klienten kopplar ner
+        for next_done in asyncio.as_completed(tasks):  # Tar resultaten i den ordning de blir klara
+            result = await next_done  # Väntar på nästa färdiga element
+            if result["status"] == "done":  # Lyckat element
+                succeeded += 1  # Räknar lyckade
+                output_chars += result["length"]  # Summerar genererad text
+            yield {"type": "job", **result}  # Skickar elementets resultat direkt
+    finally:  # Körs även när strömmen avbryts
+        for task in tasks:  # Går igenom alla tasks
+            if not task.done():  # Om tasken fortfarande pågår
+                task.cancel()  # Avbryter den
+    wall_seconds = time.perf_counter() - started  # Total tid för batchen
+    yield {  # Sammanfattning med genomströmning
+        "type": "summary",  # Markerar sista händelsen
+        "jobs": len(items),  # Antal jobbannonser
+        "succeeded": succeeded,  # Antal lyckade
+        "failed": len(items) - succeeded,  # Antal misslyckade
+        "max_parallel": parallel,  # Använd parallellism
+        "wall_seconds": round(wall_seconds, 3),  # Total tid
+        "jobs_per_minute": round(succeeded / wall_seconds * 60, 2) if wall_seconds > 0 else None,  # Genomströmning i jobb
+        "output_chars_per_second": round(output_chars / wall_seconds, 1) if wall_seconds > 0 else None,  # Genomströmning i tecken
+    }  # Slut på sammanfattning
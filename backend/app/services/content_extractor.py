@@ -0,0 +1,104 @@
+import json  # Läser strukturerad data (JSON-LD) i sidan
+import re  # Matchar klass- och id-namn för brus
+from typing import Iterable, List, Optional  # Typangivelser för tydlighet
+
+from bs4 import BeautifulSoup, Tag  # HTML-tolkning
+
+try:  # lxml är valfritt men mycket snabbare än Pythons html.parser
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"  # C-baserad parser
+except ImportError:  # lxml saknas i miljön
+    HTML_PARSER = "html.parser"  # Faller tillbaka på inbyggd parser
+
+EXTRACTOR_VERSION = "1"  # Höjs när extraktionen ändras så att cachade texter extraheras om
+NOISE_TAGS = ["script", "style", "noscript", "svg", "iframe", "nav", "footer", "aside", "button"]  # Element som aldrig är annonstext
+NOISE_PATTERN = re.compile(  # Klass- och id-namn för cookie-banners, menyer och liknande
+    r"cookie|consent|gdpr|kakor|banner|modal|popup|newsletter|share|social|breadcrumb|menu|navbar|sidebar|related|footer",
+    re.IGNORECASE,
+)  # Slut på mönster
+MAIN_SELECTORS = ["[itemprop=description]", "article", "main", "[role=main]"]  # Vanliga behållare för huvudinnehåll
+BLOCK_TAGS = ["div", "section", "article", "main", "td"]  # Element som kan vara huvudblocket
+LINE_BREAK_TAGS = ["p", "li", "br", "h1", "h2", "h3", "h4", "h5", "h6", "div", "section", "tr", "dt", "dd"]  # Element som avslutar en rad
+MIN_MAIN_CHARS = 200  # Kortare kandidater räknas inte som huvudinnehåll
+MAX_NOISE_SHARE = 0.5  # Element med brusnamn som innehåller mer än halva sidan är omslag, inte brus
+
+def _clean_lines(text: str) -> str:  # Samma radrensning som skrapan alltid har gjort
+    lines = (line.strip() for line in text.splitlines())  # Tar bort blanksteg per rad
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))  # Delar på dubbla mellanslag
+    return "\n".join(chunk for chunk in chunks if chunk)  # Icke-tomma rader
+
+def _text_with_breaks(tag: Tag) -> str:  # Text där block-element blir egna rader men inline-element (<b>, <a>) inte bryter raden
+    for element in tag.find_all(LINE_BREAK_TAGS):  # Block-element och radbrytningar
+        element.append("\n")  # Radbrytning efter elementet
+    return _clean_lines(tag.get_text())  # Text utan extra separatorer
+
+def _iter_json_ld(soup: BeautifulSoup) -> Iterable[dict]:  # Alla JSON-LD-objekt i sidan
+    for script in soup.find_all("script", type="application/ld+json"):  # Strukturerad data
+        try:  # Trasig JSON förekommer
+            data = json.loads(script.string or "")  # Tolkar innehållet
+        except ValueError:  # Ogiltig JSON
+            continue  # Hoppar över
+        stack = data if isinstance(data, list) else [data]  # Kan vara lista eller objekt
+        while stack:  # Går igenom nästlade objekt (@graph)
+            item = stack.pop()  # Nästa objekt
+            if isinstance(item, dict):  # Bara objekt är intressanta
+                yield item  # Returnerar objektet
+                stack.extend(item.get("@graph", []) if isinstance(item.get("@graph"), list) else [])  # Nästlade objekt
+            elif isinstance(item, list):  # Lista av objekt
+                stack.extend(item)  # Lägger till elementen
+
+def _json_ld_description(soup: BeautifulSoup) -> Optional[str]:  # Annonstexten från schema.org/JobPosting om den finns
+    for item in _iter_json_ld(soup):  # Går igenom strukturerad data
+        types = item.get("@type")  # Objektets typ
+        types = types if isinstance(types, list) else [types]  # Kan vara lista
+        description = item.get("description")  # Annonstexten (ofta HTML)
+        if "JobPosting" in types and isinstance(description, str) and description.strip():  # En jobbannons med text
+            title = item.get("title")  # Annonsens titel
+            body = _text_with_breaks(BeautifulSoup(description, HTML_PARSER))  # HTML i beskrivningen blir text
+            return f"{title}\n{body}" if isinstance(title, str) and title.strip() else body  # Titel först om den finns
+    return None  # Ingen JobPosting i sidan
+
+def _is_noise(tag: Tag) -> bool:  # Om ett element ser ut som cookie-banner, meny eller liknande
+    marker = " ".join([tag.get("id") or ""] + list(tag.get("class") or []))  # Id och klasser
+    return bool(marker) and bool(NOISE_PATTERN.search(marker))  # Matchar brusmönstret
+
+def _link_density(tag: Tag, text_length: int) -> float:  # Andel av texten som är länkar (menyer har hög andel)
+    link_chars = sum(len(a.get_text(" ", strip=True)) for a in tag.find_all("a"))  # Tecken i länkar
+    return link_chars / text_length if text_length else 1.0  # Andel 0-1
+
+def _best_block(soup: BeautifulSoup) -> Optional[Tag]:  # Väljer elementet som mest liknar huvudinnehållet
+    for selector in MAIN_SELECTORS:  # Semantiska behållare först
+        candidates: List[Tag] = soup.select(selector)  # Matchande element
+        candidates = [c for c in candidates if len(c.get_text(" ", strip=True)) >= MIN_MAIN_CHARS]  # Bara med riktigt innehåll
+        if candidates:  # Hittade huvudinnehåll
+            return max(candidates, key=lambda c: len(c.get_text(" ", strip=True)))  # Det största
+    best, best_score = None, 0.0  # Bästa blocket hittills
+    for tag in soup.find_all(BLOCK_TAGS):  # Alla block-element
+        paragraphs = tag.find_all(["p", "li"], recursive=False)  # Direkta stycken och punkter
+        direct_text = sum(len(p.get_text(" ", strip=True)) for p in paragraphs)  # Text i direkta stycken
+        if direct_text < MIN_MAIN_CHARS:  # För lite egen text
+            continue  # Hoppar över
+        score = direct_text * (1.0 - _link_density(tag, len(tag.get_text(" ", strip=True))))  # Mycket text, få länkar
+        if score > best_score:  # Bättre än tidigare
+            best, best_score = tag, score  # Sparar
+    return best  # None om inget block hittades
+
+def extract_main_text(html: str) -> str:  # Plockar ut annonstexten ur en HTML-sida (CPU-tungt, körs i arbetarprocess)
+    soup = BeautifulSoup(html, HTML_PARSER)  # Tolkar sidan
+    structured = _json_ld_description(soup)  # Strukturerad annonstext om sidan har det
+    if structured:  # Den mest pålitliga källan
+        return structured  # Returnerar direkt
+    for tag in soup(NOISE_TAGS):  # Skript, menyer, sidhuvud och liknande
+        tag.decompose()  # Tar bort elementet
+    page_chars = len(soup.get_text(" ", strip=True)) or 1  # Sidans textmängd
+    for tag in soup.find_all(_is_noise):  # Cookie-banners, popups och menyer via klassnamn
+        if tag.decomposed or tag.name in ("html", "body"):  # Redan borttaget eller sidans rot
+            continue  # Hoppar över
+        if len(tag.get_text(" ", strip=True)) < page_chars * MAX_NOISE_SHARE:  # Omslag runt hela sidan (t.ex. "page-with-header") behålls
+            tag.decompose()  # Tar bort elementet
+    main = _best_block(soup)  # Huvudblocket
+    text = _text_with_breaks(main or soup)  # Hela sidan om inget block hittades
+    title = soup.title.get_text(strip=True) if soup.title else ""  # Sidans titel
+    if title and main is not None and title not in text:  # Titeln ligger ofta utanför huvudblocket
+        text = f"{title}\n{text}"  # Lägger titeln först
+    return text  # Returnerar annonstexten
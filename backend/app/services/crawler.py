@@ -0,0 +1,117 @@
+import asyncio  # Samtidiga hämtningar, väntan och trådpool för cachefiler
+import hashlib  # Cachefilens namn är hash av URL:en
+import json  # Cacheposter sparas som JSON
+import os  # Läser konfiguration från miljövariabler
+import time  # Tidsstämplar för cache och hastighetsbegränsning
+from typing import Dict, List, Optional  # Typangivelser för tydlighet
+from urllib.parse import urlsplit  # Plockar ut domän ur en URL
+
+from app.services import content_extractor  # Plockar ut annonstexten ur HTML
+from app.services import cv_storage  # Återanvänder DATA_DIR och atomisk skrivning
+from app.services import http_client  # Delad klient och per-värd-gräns
+from app.services import tracing  # Tid per steg i spårade anrop
+from app.services import worker_pool  # HTML-tolkning körs i arbetarprocesser
+
+HTTP_CACHE_DIR = cv_storage.DATA_DIR / "http_cache"  # En JSON-fil per URL
+CRAWL_MAX_PARALLEL = int(os.getenv("CRAWL_MAX_PARALLEL", "20"))  # Max antal samtidiga hämtningar i en crawl
+CRAWL_DOMAIN_INTERVAL = float(os.getenv("CRAWL_DOMAIN_INTERVAL", "0.1"))  # Minsta tid mellan anrop mot samma domän (sekunder)
+CRAWL_FRESH_SECONDS = int(os.getenv("CRAWL_FRESH_SECONDS", "600"))  # Så länge används cachen utan att fråga servern
+CRAWL_TIMEOUT = 10.0  # Timeout per hämtning (samma som skrapan alltid haft)
+DOMAIN_PRUNE_THRESHOLD = 1024  # Antal domäner innan utgångna tider rensas bort
+
+_next_allowed: Dict[str, float] = {}  # Domän -> tidigaste tid för nästa anrop
+_stats = {"fetched": 0, "not_modified": 0, "fresh_hits": 0, "errors": 0}  # Räknare för crawlern
+
+class CrawlError(Exception):  # Hämtningen misslyckades
+    pass
+
+def _cache_path(url: str):  # Cachefil för en URL
+    return HTTP_CACHE_DIR / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"  # Hash undviker ogiltiga filnamn
+
+def _cache_get_sync(url: str) -> Optional[Dict[str, object]]:  # Läser cacheposten (körs i trådpool)
+    path = _cache_path(url)  # Cachefilen
+    if not path.exists():  # URL:en har inte hämtats förut
+        return None  # Ingen post
+    try:  # Trasig fil behandlas som saknad
+        entry = json.loads(path.read_text(encoding="utf-8"))  # Tolkar posten
+    except ValueError:  # Ogiltig JSON
+        return None  # Ingen post
+    if entry.get("extractor_version") != content_extractor.EXTRACTOR_VERSION:  # Texten extraherades med äldre regler
+        return None  # Hämtas och extraheras om
+    return entry  # Returnerar posten
+
+def _cache_put_sync(url: str, entry: Dict[str, object]) -> None:  # Sparar cacheposten atomiskt
+    HTTP_CACHE_DIR.mkdir(parents=True, exist_ok=True)  # Skapar cachemappen vid behov
+    cv_storage.atomic_write_text(_cache_path(url), json.dumps(entry, ensure_ascii=False))  # Läsare ser aldrig en halv fil
+
+def _prune_domains(now: float) -> None:  # Tar bort domäner som inte längre behöver vänta
+    for domain in [d for d, allowed in _next_allowed.items() if allowed <= now]:  # Senaste anropet är äldre än CRAWL_DOMAIN_INTERVAL
+        del _next_allowed[domain]  # Saknad domän betyder "får anropas direkt", samma sak
+
+async def _polite_wait(url: str) -> None:  # Håller minsta avstånd mellan anrop mot samma domän
+    domain = urlsplit(url).hostname or ""  # Domänen utan port
+    now = time.monotonic()  # Aktuell tid
+    if len(_next_allowed) >= DOMAIN_PRUNE_THRESHOLD:  # Många domäner har samlats
+        _prune_domains(now)  # Glömmer domäner vars intervall redan har passerat
+    slot = max(now, _next_allowed.get(domain, 0.0))  # Tidigaste lediga tid för domänen
+    _next_allowed[domain] = slot + CRAWL_DOMAIN_INTERVAL  # Reserverar tiden (ingen await emellan, så ingen kapplöpning)
+    if slot > now:  # Måste vänta på sin tur
+        await asyncio.sleep(slot - now)  # Väntar
+
+async def fetch_text(url: str) -> Dict[str, object]:  # Hämtar en jobbannons med HTTP-cache och returnerar annonstexten
+    loop = asyncio.get_event_loop()  # Hämtar event loop för fil-I/O i trådpool
+    entry = await loop.run_in_executor(None, _cache_get_sync, url)  # Tidigare hämtning av samma URL
+    if entry and time.time() - entry["checked_at"] < CRAWL_FRESH_SECONDS:  # Nyligen kontrollerad
+        _stats["fresh_hits"] += 1  # Räknar träff utan nätverksanrop
+        return {"url": url, "text": entry["text"], "cache": "fresh"}  # Direkt från cachen
+    headers = {}  # Villkorliga headers
+    if entry and entry.get("etag"):  # Servern gav en ETag förra gången
+        headers["If-None-Match"] = entry["etag"]  # Ber om 304 om sidan inte ändrats
+    if entry and entry.get("last_modified"):  # Servern gav Last-Modified förra gången
+        headers["If-Modified-Since"] = entry["last_modified"]  # Ber om 304 om sidan inte ändrats
+    client = http_client.get_client()  # Delad klient med connection pool
+    try:  # Nätverksfel blir CrawlError
+        with tracing.span("scrape_fetch"):  # Tid för nätverksanropet, inklusive väntan per domän
+            async with http_client.host_slot(url):  # Begränsar samtidiga anrop per värd
+                await _polite_wait(url)  # Hastighetsbegränsning per domän
+                response = await client.get(url, headers=headers, timeout=CRAWL_TIMEOUT)  # Hämtar sidan
+        if response.status_code == 304 and entry:  # Sidan har inte ändrats
+            _stats["not_modified"] += 1  # Räknar revalidering
+            entry["checked_at"] = time.time()  # Förnyar färskheten
+            await loop.run_in_executor(None, _cache_put_sync, url, entry)  # Sparar ny kontrolltid
+            return {"url": url, "text": entry["text"], "cache": "revalidated"}  # Ingen ny tolkning behövs
+        response.raise_for_status()  # Felstatus blir undantag
+    except Exception as e:  # Timeout, DNS, 4xx/5xx osv.
+        _stats["errors"] += 1  # Räknar fel
+        raise CrawlError(str(e))  # Gemensam feltyp
+    try:  # Tolkningsfel blir CrawlError
+        with tracing.span("scrape_extract"):  # Tid för HTML-tolkningen
+            text = await worker_pool.run(content_extractor.extract_main_text, response.text)  # Tolkar HTML i arbetarprocess
+    except Exception as e:  # Sidan gick inte att tolka
+        _stats["errors"] += 1  # Räknar fel
+        raise CrawlError(f"Kunde inte tolka sidan: {e}")  # Gemensam feltyp
+    _stats["fetched"] += 1  # Räknar full hämtning
+    await loop.run_in_executor(None, _cache_put_sync, url, {  # Sparar texten och valideringsheaders
+        "url": url,  # URL:en (för felsökning)
+        "etag": response.headers.get("ETag"),  # För If-None-Match
+        "last_modified": response.headers.get("Last-Modified"),  # För If-Modified-Since
+        "checked_at": time.time(),  # När sidan senast kontrollerades
+        "extractor_version": content_extractor.EXTRACTOR_VERSION,  # Vilka regler texten extraherades med
+        "text": text,  # Extraherad annonstext
+    })  # Slut på cachepost
+    return {"url": url, "text": text, "cache": "miss"}  # Nyhämtad text
+
+async def crawl(urls: List[str], max_parallel: int = CRAWL_MAX_PARALLEL) -> List[Dict[str, object]]:  # Hämtar många URL:er samtidigt
+    slots = asyncio.Semaphore(max(1, min(max_parallel, CRAWL_MAX_PARALLEL)))  # Total gräns; per domän gäller host_slot och intervall
+
+    async def fetch_one(url: str) -> Dict[str, object]:  # Hämtar en URL och fångar fel per URL
+        async with slots:  # Väntar på ledig plats
+            try:  # Fel för en URL stoppar inte resten
+                return {**await fetch_text(url), "success": True}  # Lyckad hämtning
+            except CrawlError as e:  # Hämtningen misslyckades
+                return {"url": url, "success": False, "error": str(e)}  # Felet för URL:en
+
+    return await asyncio.gather(*[fetch_one(url) for url in urls])  # Resultat i samma ordning som URL:erna
+
+def stats() -> Dict[str, int]:  # Returnerar räknare för crawlern
+    return dict(_stats)  # Kopia så att anroparen inte ändrar räknarna
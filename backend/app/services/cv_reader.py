@@ -1,44 +1,115 @@
 from pathlib import Path
+import asyncio
+import hashlib  # Innehållshash för cachen med tolkad text
+import math  # Fördelar PDF-sidor jämnt över arbetarprocesserna
+import os  # Läser konfiguration från miljövariabler
+from typing import List, Optional, Tuple  # Typangivelser för tydlighet
 import PyPDF2
 from docx import Document
 
+from app.services import cv_storage  # Återanvänder DATA_DIR och atomisk skrivning
+from app.services import tracing  # Tid per steg i spårade anrop
+from app.services import worker_pool  # Tolkning körs i separata processer
+from app.services.single_flight import SingleFlight  # Samma fil som laddas upp samtidigt tolkas bara en gång
+
+PARSER_VERSION = "1"  # Höjs när extraktionen ändras så att gamla cachade texter inte används
+PARSED_CACHE_DIR = cv_storage.DATA_DIR / "parsed_text"  # Tolkad text per filhash
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))  # PDF:er med färre sidor tolkas i en process
+PDF_MIN_PAGES_PER_CHUNK = 2  # Minsta antal sidor per arbetarprocess (annars kostar uppstarten mer än den sparar)
+HASH_CHUNK_SIZE = 1024 * 1024  # Läser filen i bitar när hashen räknas
+
+_parse_flight = SingleFlight()  # Slår ihop samtidiga tolkningar av samma fil
+
 class CVReadError(Exception):
     pass
 
-async def read_cv_from_file(file_path: str) -> str:
+def file_sha256(file_path: str) -> str:  # Hash av filens innehåll (körs i trådpool)
+    digest = hashlib.sha256()  # Inkrementell hash
+    with open(file_path, "rb") as f:  # Läser filen binärt
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):  # En bit i taget, så att stora filer inte läses in helt
+            digest.update(chunk)  # Uppdaterar hashen
+    return digest.hexdigest()  # Returnerar hex-hash
+
+def _cache_path(content_hash: str) -> Path:  # Cachefil för en filhash
+    return PARSED_CACHE_DIR / f"{content_hash}-v{PARSER_VERSION}.txt"  # Parser-versionen ingår i namnet
+
+def _cache_get_sync(content_hash: str) -> Optional[str]:  # Läser cachad text om den finns
+    path = _cache_path(content_hash)  # Cachefilen
+    if not path.exists():  # Filen har inte tolkats förut
+        return None  # Ingen träff
+    return path.read_text(encoding="utf-8")  # Cachad text
+
+def _cache_put_sync(content_hash: str, text: str) -> None:  # Sparar tolkad text
+    PARSED_CACHE_DIR.mkdir(parents=True, exist_ok=True)  # Skapar cachemappen vid behov
+    cv_storage.atomic_write_text(_cache_path(content_hash), text)  # Atomisk skrivning så att en halv fil aldrig läses
+
+def _count_pdf_pages(file_path: str) -> int:  # Antal sidor (körs i arbetarprocess)
+    with open(file_path, "rb") as file:  # Öppnar PDF:en
+        return len(PyPDF2.PdfReader(file).pages)  # Läser bara sidträdet, ingen textextraktion
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:  # Text från sidorna start..end-1 (körs i arbetarprocess)
+    text_content = []  # Samlar text per sida
+    with open(file_path, "rb") as file:  # Varje process öppnar filen själv
+        pdf_reader = PyPDF2.PdfReader(file)  # Läser PDF-strukturen
+        for page in pdf_reader.pages[start:end]:  # Bara processens sidor
+            text = page.extract_text()  # Extraherar text
+            if text:  # Hoppar över tomma sidor
+                text_content.append(text)  # Sparar texten
+    return text_content  # Returnerar sidornas text i ordning
+
+def _read_docx_sync(file_path: str) -> str:  # Text från DOCX (körs i arbetarprocess)
+    doc = Document(file_path)  # Läser dokumentet
+    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())  # Icke-tomma stycken
+
+def _page_ranges(page_count: int) -> List[Tuple[int, int]]:  # Delar upp sidorna i ett intervall per arbetarprocess
+    if page_count < PDF_PARALLEL_MIN_PAGES:  # Liten PDF
+        return [(0, page_count)]  # Allt i en process
+    chunk = max(PDF_MIN_PAGES_PER_CHUNK, math.ceil(page_count / worker_pool.WORKER_PROCESSES))  # Sidor per process
+    return [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]  # Intervall i sidordning
+
+async def read_cv_from_file(file_path: str, content_hash: Optional[str] = None) -> str:
 
     path = Path(file_path)
-    
+
     if not path.exists():
         raise CVReadError(f"Filen {file_path} finns inte")
-    
-    if path.suffix.lower() == ".pdf":
-        return await _read_pdf(file_path)
-    elif path.suffix.lower() in [".docx", ".doc"]:
-        return await _read_docx(file_path)
+
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        parse = _read_pdf
+    elif suffix in [".docx", ".doc"]:
+        parse = _read_docx
     else:
         raise CVReadError(f"Filtypen {path.suffix} stöds inte. Använd PDF eller DOCX")
 
+    loop = asyncio.get_event_loop()  # Hämtar event loop för fil-I/O i trådpool
+    if content_hash is None:  # Anroparen har inte redan räknat hashen under uppladdningen
+        content_hash = await loop.run_in_executor(None, file_sha256, file_path)  # Hashar filen i trådpool
+
+    async def parse_and_cache() -> str:  # Tolkar filen och sparar texten under hashen
+        cached = await loop.run_in_executor(None, _cache_get_sync, content_hash)  # Samma fil tolkad förut?
+        if cached is not None:  # Cacheträff
+            return cached  # Hoppar över tolkningen
+        text = await parse(file_path)  # Tolkar i processpoolen
+        await loop.run_in_executor(None, _cache_put_sync, content_hash, text)  # Sparar till nästa uppladdning
+        return text  # Returnerar texten
+
+    with tracing.span("cv_parse"):  # Tid för tolkning (eller cacheträff)
+        return await _parse_flight.run(content_hash, parse_and_cache)  # Samtidiga uppladdningar av samma fil delar tolkningen
+
 async def _read_pdf(file_path: str) -> str:
     try:
-        text_content = []
-        with open(file_path, "rb") as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
-        return "\n".join(text_content)
+        page_count = await worker_pool.run(_count_pdf_pages, file_path)  # Sidantal avgör hur arbetet delas upp
+        parts = await asyncio.gather(*[  # Sidintervallen tolkas parallellt i olika processer
+            worker_pool.run(_extract_pdf_pages, file_path, start, end)  # Ett intervall per process
+            for start, end in _page_ranges(page_count)  # Går igenom intervallen
+        ])  # Slut på gather (resultaten kommer i sidordning)
+        return "\n".join(text for part in parts for text in part)
     except Exception as e:
         raise CVReadError(f"Kunde inte läsa PDF: {str(e)}")
 
 async def _read_docx(file_path: str) -> str:
     try:
-        doc = Document(file_path)
-        text_content = []
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_content.append(paragraph.text)
-        return "\n".join(text_content)
+        return await worker_pool.run(_read_docx_sync, file_path)  # Tolkar i processpoolen
     except Exception as e:
-        raise CVReadError(f"Kunde inte läsa Word-dokument: {str(e)}")
\ No newline at end of file
+        raise CVReadError(f"Kunde inte läsa Word-dokument: {str(e)}")
@@ -0,0 +1,77 @@
+import asyncio  # Optimerar oberoende sektioner parallellt
+import time  # Mäter total tid för sektionsoptimeringen
+from typing import Dict, List, Tuple  # Typangivelser för tydlighet
+
+from app.services import llm_scheduler  # Prioritetsklasser för LLM-kön
+from app.services import lm_studio_client  # Sektionsoptimering med cache, single-flight och kö
+
+def is_bullet(line: str) -> bool:  # Samma bullet-regel som DOCX-byggaren använder
+    return line.startswith("- ") or line.startswith("* ")  # Returnerar True för punktlisterader
+
+def is_heading(line: str) -> bool:  # Samma rubrik-heuristik som DOCX-byggaren använder
+    if not line or is_bullet(line):  # Tomma rader och bullets är aldrig rubriker
+        return False  # Inte en rubrik
+    return line.isupper() or line.endswith(":")  # Versaler eller kolon i slutet betyder rubrik
+
+class CVSection:  # En sektion i CV:t: rubrik och raderna under den
+    def __init__(self, heading: str, lines: List[str]):  # Skapar en sektion
+        self.heading = heading  # Rubrikraden ("" för texten före första rubriken)
+        self.lines = lines  # Alla rader i sektionen, inklusive rubriken
+
+    @property
+    def has_body(self) -> bool:  # Om sektionen har innehåll utöver rubriken
+        return any(line for line in self.lines[1 if self.heading else 0:])  # Minst en icke-tom rad efter rubriken
+
+    @property
+    def text(self) -> str:  # Sektionens text som den skickas till modellen
+        return "\n".join(self.lines).strip()  # Rader ihopsatta utan tomma kanter
+
+def split_sections(cv_text: str) -> List[CVSection]:  # Delar upp CV:t vid rubrikrader
+    sections: List[CVSection] = []  # Samlar sektioner i ordning
+    current = CVSection("", [])  # Texten före första rubriken (namn, kontaktuppgifter)
+    for raw_line in cv_text.splitlines():  # Går igenom CV:t rad för rad
+        line = raw_line.strip()  # Tar bort blanksteg runt raden
+        if is_heading(line) and (current.has_body or not current.heading):  # Rubrik direkt efter rubrik (t.ex. "KTH") räknas som innehåll
+            if current.text:  # Sparar föregående sektion om den har innehåll
+                sections.append(current)  # Lägger till sektionen
+            current = CVSection(line, [line])  # Startar ny sektion med rubriken
+        else:  # Vanlig rad
+            current.lines.append(line)  # Lägger till raden i aktuell sektion
+    if current.text:  # Sista sektionen
+        sections.append(current)  # Lägger till sektionen
+    return sections  # Returnerar alla sektioner
+
+async def optimize_sections(  # Optimerar varje sektion för sig; oförändrade sektioner kommer från cachen
+    cv_text: str,  # CV-texten som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+) -> Dict[str, object]:  # Returnerar sammanfogad text och statistik per sektion
+    started = time.perf_counter()  # Starttid för mätning
+    sections = split_sections(cv_text)  # Delar upp CV:t
+    context = lm_studio_client.CVContext(cv_text)  # Tillåtna keywords räknas ut en gång för hela CV:t
+    semaphore = asyncio.Semaphore(llm_scheduler.scheduler.max_concurrency)  # Högst lika många sektioner i LLM-kön som det finns platser
+
+    async def optimize(section: CVSection) -> Tuple[str, bool]:  # En sektion i taget per plats
+        async with semaphore:  # Annars skulle alla sektioner köa samtidigt och de sista avvisas som överbelastade
+            return await lm_studio_client.optimize_section(context, section.text, job_text, priority)  # En generering per sektion
+
+    tasks = [asyncio.ensure_future(optimize(section)) for section in sections]  # Startar alla sektioner
+    try:  # Ett fel ska inte lämna kvar genereringar som ingen väntar på
+        results = await asyncio.gather(*tasks)  # Resultat i ursprunglig ordning
+    except BaseException:  # Fel eller avbrott
+        for task in tasks:  # Går igenom syskonen
+            task.cancel()  # Avbryter de som inte är klara
+        raise  # Skickar vidare felet
+    optimized_parts = [text.strip() for text, _ in results]  # Optimerad text per sektion
+    from_cache = sum(1 for _, cached in results if cached)  # Antal sektioner som inte behövde genereras
+    return {  # Strukturerat resultat
+        "optimized_cv": "\n\n".join(optimized_parts),  # Sektionerna ihopsatta i ursprunglig ordning
+        "sections": [  # Information per sektion
+            {"heading": section.heading, "cached": cached, "length": len(text)}  # Rubrik, cache-träff och längd
+            for section, (text, cached) in zip(sections, results)  # Parar ihop sektion och resultat
+        ],  # Slut på sektionslista
+        "sections_total": len(sections),  # Antal sektioner
+        "sections_from_cache": from_cache,  # Sektioner hämtade från cache
+        "sections_regenerated": len(sections) - from_cache,  # Sektioner som genererades nu
+        "elapsed_seconds": round(time.perf_counter() - started, 3),  # Total tid
+    }  # Slut på resultat
@@ -1,35 +1,169 @@
 from pathlib import Path
 import os
 import asyncio
+import hashlib  # Innehållsbaserade versions-id:n
+import re  # Validerar namnrymder
+import tempfile  # Temporära filer för atomiska skrivningar
+import threading  # Lås så att samtidiga skrivningar inte krockar
+from collections import OrderedDict  # LRU-ordning för läscachen
+from typing import Dict, List, Optional, Tuple  # Typangivelser för tydlighet
 
-DATA_DIR = Path(__file__).parent.parent.parent / "data"
-MASTER_CV_FILE = DATA_DIR / "master_cv.txt"
-JOB_POSTING_FILE = DATA_DIR / "job_posting.txt"
+from app.services import tracing  # Tid per steg i spårade anrop
+
+DATA_DIR = Path(os.getenv("CV_DATA_DIR", str(Path(__file__).parent.parent.parent / "data")))  # Kan pekas om, t.ex. till en temporär mapp i benchmarks
+MASTER_CV_FILE = DATA_DIR / "master_cv.txt"  # Äldre global fil, läses fortfarande för default-namnrymden
+JOB_POSTING_FILE = DATA_DIR / "job_posting.txt"  # Äldre global fil, läses fortfarande för default-namnrymden
+NAMESPACES_DIR = DATA_DIR / "namespaces"  # En mapp per användare/session
+
+DEFAULT_NAMESPACE = "default"  # Används när klienten inte skickar någon session
+KIND_MASTER_CV = "master_cv"  # Dokumenttyp för master-CV
+KIND_JOB_POSTING = "job_posting"  # Dokumenttyp för jobbannons
+STORAGE_CACHE_MAX_ENTRIES = int(os.getenv("CV_STORAGE_CACHE_MAX_ENTRIES", "256"))  # Max antal dokument i läscachen
+
+_NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # Tillåtna namnrymder (inga sökvägstecken)
+_VERSION_PATTERN = re.compile(r"^[0-9a-f]{64}$")  # Versions-id är en SHA-256 i hex
+_CURRENT_FILE = "current"  # Pekare till aktuell version i varje dokumentmapp
+_LEGACY_FILES = {KIND_MASTER_CV: MASTER_CV_FILE, KIND_JOB_POSTING: JOB_POSTING_FILE}  # Äldre filer per dokumenttyp
+
+_lock = threading.Lock()  # Serialiserar skrivningar och cachefyllning mellan trådar
+_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()  # (namnrymd, dokumenttyp) -> aktuell text
+
+class InvalidNamespaceError(ValueError):  # Namnrymden innehåller otillåtna tecken
+    pass
 
 def ensure_data_dir():
     DATA_DIR.mkdir(exist_ok=True)
 
-async def save_master_cv(cv_text: str) -> str:
-    ensure_data_dir()
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, lambda: MASTER_CV_FILE.write_text(cv_text, encoding="utf-8"))
-    return str(MASTER_CV_FILE)
-
-def get_master_cv() -> str:
-    if not MASTER_CV_FILE.exists():
-        return ""
-    with open(MASTER_CV_FILE, "r", encoding="utf-8") as f:
-        return f.read()
-
-async def save_job_posting(job_text: str) -> str:
-    ensure_data_dir()
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, lambda: JOB_POSTING_FILE.write_text(job_text, encoding="utf-8"))
-    return str(JOB_POSTING_FILE)
-
-def get_job_posting() -> str:
-    if not JOB_POSTING_FILE.exists():
-        return ""
-    with open(JOB_POSTING_FILE, "r", encoding="utf-8") as f:
-        return f.read()
+def normalize_namespace(namespace: Optional[str]) -> str:  # Validerar namnrymd så att den kan användas som mappnamn
+    if not namespace:  # Ingen session angiven
+        return DEFAULT_NAMESPACE  # Faller tillbaka på delad namnrymd
+    if not _NAMESPACE_PATTERN.match(namespace):  # Skyddar mot t.ex. "../"
+        raise InvalidNamespaceError("Ogiltigt sessions-id (tillåtet: A-Z, a-z, 0-9, _ och -, max 64 tecken)")  # Tydligt fel
+    return namespace  # Returnerar giltig namnrymd
+
+def content_version(text: str) -> str:  # Versions-id är hash av innehållet
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()  # Samma text ger alltid samma version
+
+def _kind_dir(namespace: str, kind: str) -> Path:  # Mapp för en dokumenttyp i en namnrymd
+    return NAMESPACES_DIR / namespace / kind  # t.ex. data/namespaces/default/master_cv
+
+def atomic_write_text(path: Path, text: str) -> None:  # Skriver till temporär fil och byter namn, så att läsare aldrig ser en halv fil
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")  # Temporär fil i samma mapp (samma filsystem)
+    try:  # Tar bort temp-filen om något går fel
+        with os.fdopen(fd, "w", encoding="utf-8") as f:  # Öppnar temp-filen för skrivning
+            f.write(text)  # Skriver innehållet
+            f.flush()  # Tömmer Python-bufferten
+            os.fsync(f.fileno())  # Säkerställer att datan ligger på disk innan namnbytet
+        os.replace(temp_path, path)  # Atomiskt namnbyte (även på Windows)
+    except BaseException:  # Skrivningen misslyckades
+        if os.path.exists(temp_path):  # Temp-filen finns kvar
+            os.unlink(temp_path)  # Städar bort den
+        raise  # Skickar vidare felet
+
+def _cache_get(key: Tuple[str, str]) -> Optional[str]:  # Läser ur läscachen och markerar som senast använd (anropas med _lock)
+    text = _cache.get(key)  # Cachad text
+    if text is not None:  # Träff
+        _cache.move_to_end(key)  # LRU: senast använda tas bort sist
+    return text  # Returnerar texten eller None
+
+def _cache_put(key: Tuple[str, str], text: str) -> None:  # Lägger in text i läscachen (anropas med _lock)
+    _cache[key] = text  # Sparar texten
+    _cache.move_to_end(key)  # Markerar som senast använd
+    while len(_cache) > STORAGE_CACHE_MAX_ENTRIES:  # För många dokument i minnet
+        _cache.popitem(last=False)  # Tar bort det äldsta
+
+def _read_current_sync(namespace: str, kind: str) -> str:  # Läser aktuell version från disk (körs i trådpool)
+    kind_dir = _kind_dir(namespace, kind)  # Dokumentmappen
+    pointer = kind_dir / _CURRENT_FILE  # Pekarfilen
+    if pointer.exists():  # Det finns en sparad version
+        version = pointer.read_text(encoding="utf-8").strip()  # Aktuellt versions-id
+        return (kind_dir / f"{version}.txt").read_text(encoding="utf-8")  # Versionens text
+    legacy = _LEGACY_FILES[kind]  # Äldre global fil
+    if namespace == DEFAULT_NAMESPACE and legacy.exists():  # Data sparad innan namnrymder fanns
+        return legacy.read_text(encoding="utf-8")  # Läser den gamla filen
+    return ""  # Inget sparat
+
+def _load_sync(namespace: str, kind: str) -> str:  # Read-through: läser från disk och fyller cachen
+    with _lock:  # Samma lås som skrivningar, så att en gammal läsning inte skriver över en ny version i cachen
+        key = (namespace, kind)  # Cachenyckel
+        cached = _cache_get(key)  # En annan tråd kan ha hunnit fylla cachen
+        if cached is not None:  # Träff
+            return cached  # Returnerar cachad text
+        text = _read_current_sync(namespace, kind)  # Läser från disk
+        _cache_put(key, text)  # Fyller cachen (även tom text, så att saknade filer inte läses om varje gång)
+        return text  # Returnerar texten
+
+def _save_sync(namespace: str, kind: str, text: str) -> Dict[str, str]:  # Sparar en ny version och flyttar pekaren
+    version = content_version(text)  # Innehållsbaserat versions-id
+    with _lock:  # Serialiserar skrivningar
+        kind_dir = _kind_dir(namespace, kind)  # Dokumentmappen
+        kind_dir.mkdir(parents=True, exist_ok=True)  # Skapar mappen vid behov
+        version_path = kind_dir / f"{version}.txt"  # Versionens fil
+        if version_path.exists():  # Samma innehåll har sparats förut
+            os.utime(version_path)  # Uppdaterar tiden så att versionen hamnar först i historiken
+        else:  # Ny version
+            atomic_write_text(version_path, text)  # Skriver versionen atomiskt
+        atomic_write_text(kind_dir / _CURRENT_FILE, version)  # Flyttar pekaren atomiskt
+        _cache_put((namespace, kind), text)  # Ersätter cachad text direkt efter skrivningen
+    return {"saved_to": str(version_path), "version": version}  # Sökväg och versions-id
+
+def _list_versions_sync(namespace: str, kind: str) -> List[Dict[str, object]]:  # Listar sparade versioner, nyaste först
+    kind_dir = _kind_dir(namespace, kind)  # Dokumentmappen
+    if not kind_dir.exists():  # Inget sparat i namnrymden
+        return []  # Tom lista
+    pointer = kind_dir / _CURRENT_FILE  # Pekarfilen
+    current = pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None  # Aktuell version
+    versions = []  # Samlar versioner
+    for path in kind_dir.glob("*.txt"):  # Alla versionsfiler
+        stat = path.stat()  # Storlek och tid
+        versions.append({  # Information om versionen
+            "version": path.stem,  # Versions-id
+            "bytes": stat.st_size,  # Filstorlek
+            "saved_at": stat.st_mtime,  # När versionen senast sparades
+            "current": path.stem == current,  # Om det är aktuell version
+        })  # Slut på version
+    return sorted(versions, key=lambda v: v["saved_at"], reverse=True)  # Nyaste först
+
+def _get_version_sync(namespace: str, kind: str, version: str) -> Optional[str]:  # Läser en specifik version
+    if not _VERSION_PATTERN.match(version):  # Bara giltiga hashar (skyddar mot sökvägstecken)
+        return None  # Okänd version
+    path = _kind_dir(namespace, kind) / f"{version}.txt"  # Versionens fil
+    if not path.exists():  # Versionen finns inte
+        return None  # Okänd version
+    return path.read_text(encoding="utf-8")  # Versionens text
+
+async def _get_current(namespace: str, kind: str) -> str:  # Aktuell text: cachen först, annars disk i trådpool
+    with _lock:  # Samma lås som skrivningar och LRU-ordningen
+        text = _cache_get((namespace, kind))  # Snabb väg utan I/O
+    if text is not None:  # Cacheträff
+        return text  # Returnerar direkt utan att lämna event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("storage_read"):  # Tid för diskläsning
+        return await loop.run_in_executor(None, lambda: _load_sync(namespace, kind))  # Läser från disk i trådpool
+
+async def _save(namespace: str, kind: str, text: str) -> Dict[str, str]:  # Sparar utan att blockera event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("storage_write"):  # Tid för diskskrivning
+        return await loop.run_in_executor(None, lambda: _save_sync(namespace, kind, text))  # Kör i trådpool
+
+async def save_master_cv(cv_text: str, namespace: str = DEFAULT_NAMESPACE) -> Dict[str, str]:
+    return await _save(namespace, KIND_MASTER_CV, cv_text)
+
+async def get_master_cv(namespace: str = DEFAULT_NAMESPACE) -> str:
+    return await _get_current(namespace, KIND_MASTER_CV)
+
+async def save_job_posting(job_text: str, namespace: str = DEFAULT_NAMESPACE) -> Dict[str, str]:
+    return await _save(namespace, KIND_JOB_POSTING, job_text)
+
+async def get_job_posting(namespace: str = DEFAULT_NAMESPACE) -> str:
+    return await _get_current(namespace, KIND_JOB_POSTING)
+
+async def list_versions(kind: str, namespace: str = DEFAULT_NAMESPACE) -> List[Dict[str, object]]:  # Versionshistorik för en dokumenttyp
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("storage_read"):  # Tid för diskläsning
+        return await loop.run_in_executor(None, lambda: _list_versions_sync(namespace, kind))  # Kör i trådpool
 
+async def get_version(kind: str, version: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[str]:  # Text för en specifik version
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("storage_read"):  # Tid för diskläsning
+        return await loop.run_in_executor(None, lambda: _get_version_sync(namespace, kind, version))  # Kör i trådpool
@@ -0,0 +1,101 @@
+import asyncio  # Parallell tolkning och fil-I/O i trådpool
+import hashlib  # Innehållshash räknas medan filen strömmas till disk
+import os  # Filhantering och konfiguration från miljövariabler
+import shutil  # Tar bort temporära mappar
+import tempfile  # Temporära filer och mappar för uppladdningar
+import time  # Mäter tid för bulk-uppladdningen
+import zipfile  # Läser zip-arkiv med CV:n
+from pathlib import Path  # Path-verktyg för filändelser
+from typing import Dict, List, Tuple  # Typangivelser för tydlighet
+
+from fastapi import UploadFile  # Uppladdad fil från FastAPI
+
+from app.services import cv_reader  # Tolkning med processpool och cache
+from app.services import tracing  # Tid per steg i spårade anrop
+from app.services import worker_pool  # Antal arbetarprocesser styr parallelliteten
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Uppladdningar läses och skrivs i bitar om 1 MiB
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))  # Största tillåtna uppladdning
+ZIP_MAX_FILES = int(os.getenv("ZIP_MAX_FILES", "100"))  # Max antal CV:n i ett zip-arkiv
+ZIP_MAX_UNCOMPRESSED_BYTES = int(os.getenv("ZIP_MAX_UNCOMPRESSED_BYTES", str(200 * 1024 * 1024)))  # Skydd mot zip-bomber
+SUPPORTED_SUFFIXES = (".pdf", ".docx", ".doc")  # Filtyper som cv_reader kan tolka
+
+class UploadTooLargeError(Exception):  # Uppladdningen överskrider UPLOAD_MAX_BYTES
+    pass
+
+class ZipContentError(Exception):  # Zip-arkivet är ogiltigt eller för stort
+    pass
+
+async def save_upload(file: UploadFile, suffix: str) -> Tuple[str, str]:  # Strömmar uppladdningen till disk och räknar hash under tiden
+    loop = asyncio.get_event_loop()  # Hämtar event loop för fil-I/O i trådpool
+    digest = hashlib.sha256()  # Inkrementell hash av innehållet
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)  # Temporär fil med rätt ändelse
+    size = 0  # Antal skrivna bytes
+    try:  # Tar bort filen om något går fel
+        with tracing.span("upload_write"):  # Tid för att ta emot och skriva filen
+            while True:  # Läser en bit i taget så att hela filen aldrig ligger i minnet
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)  # Nästa bit av uppladdningen
+                if not chunk:  # Slut på filen
+                    break  # Klar
+                size += len(chunk)  # Räknar storlek
+                if size > UPLOAD_MAX_BYTES:  # För stor fil
+                    raise UploadTooLargeError(f"Filen är större än {UPLOAD_MAX_BYTES // (1024 * 1024)} MB")  # Tydligt fel
+                digest.update(chunk)  # Uppdaterar hashen
+                await loop.run_in_executor(None, temp_file.write, chunk)  # Skriver biten i trådpool
+            await loop.run_in_executor(None, temp_file.close)  # Stänger filen (tömmer buffert)
+    except BaseException:  # Avbrott eller fel
+        temp_file.close()  # Stänger filen
+        os.unlink(temp_file.name)  # Tar bort den halvfärdiga filen
+        raise  # Skickar vidare felet
+    return temp_file.name, digest.hexdigest()  # Sökväg och innehållshash
+
+def _extract_zip_sync(zip_path: str, target_dir: str) -> List[Tuple[str, str]]:  # Packar upp CV-filer (körs i trådpool)
+    with zipfile.ZipFile(zip_path) as archive:  # Öppnar arkivet (BadZipFile om det är trasigt)
+        members = [  # Filer som går att tolka
+            info for info in archive.infolist()  # Alla poster i arkivet
+            if not info.is_dir()  # Hoppar över mappar
+            and not Path(info.filename).name.startswith(".")  # Hoppar över dolda filer
+            and "__MACOSX" not in info.filename  # Hoppar över macOS-metadata
+            and Path(info.filename).suffix.lower() in SUPPORTED_SUFFIXES  # Bara PDF och Word
+        ]  # Slut på filtrering
+        if len(members) > ZIP_MAX_FILES:  # För många filer
+            raise ZipContentError(f"Arkivet innehåller fler än {ZIP_MAX_FILES} CV:n")  # Tydligt fel
+        if sum(info.file_size for info in members) > ZIP_MAX_UNCOMPRESSED_BYTES:  # För mycket data uppackat
+            raise ZipContentError("Arkivet är för stort uppackat")  # Tydligt fel
+        extracted = []  # (namn i arkivet, sökväg på disk)
+        for index, info in enumerate(members):  # Packar upp filerna en i taget
+            target = Path(target_dir) / f"{index}{Path(info.filename).suffix.lower()}"  # Egna filnamn, så att "../" i arkivet aldrig används
+            with archive.open(info) as source, open(target, "wb") as dest:  # Strömmar från arkivet till disk
+                shutil.copyfileobj(source, dest, UPLOAD_CHUNK_SIZE)  # Kopierar i bitar
+            extracted.append((info.filename, str(target)))  # Sparar namn och sökväg
+        return extracted  # Returnerar uppackade filer
+
+async def _ingest_one(filename: str, path: str, slots: asyncio.Semaphore) -> Dict[str, object]:  # Tolkar ett CV ur arkivet
+    async with slots:  # Begränsar antal samtidiga tolkningar
+        try:  # Fel per fil stoppar inte resten av arkivet
+            text = await cv_reader.read_cv_from_file(path)  # Tolkning med cache och processpool
+        except cv_reader.CVReadError as e:  # Filen gick inte att läsa
+            return {"filename": filename, "success": False, "error": str(e)}  # Felet för filen
+    return {"filename": filename, "success": True, "text": text, "length": len(text)}  # Tolkad text
+
+async def ingest_zip(zip_path: str) -> Dict[str, object]:  # Packar upp ett zip-arkiv och tolkar alla CV:n parallellt
+    started = time.perf_counter()  # Starttid
+    loop = asyncio.get_event_loop()  # Hämtar event loop för fil-I/O i trådpool
+    target_dir = tempfile.mkdtemp(prefix="cv-zip-")  # Temporär mapp för uppackade filer
+    try:  # Tar alltid bort den temporära mappen
+        try:  # Översätter zip-fel till ett gemensamt feltyp
+            extracted = await loop.run_in_executor(None, _extract_zip_sync, zip_path, target_dir)  # Packar upp i trådpool
+        except zipfile.BadZipFile:  # Inte ett giltigt zip-arkiv
+            raise ZipContentError("Filen är inte ett giltigt zip-arkiv")  # Tydligt fel
+        slots = asyncio.Semaphore(worker_pool.WORKER_PROCESSES)  # En tolkning per arbetarprocess åt gången
+        files = await asyncio.gather(*[_ingest_one(name, path, slots) for name, path in extracted])  # Tolkar alla filer samtidigt
+    finally:  # Körs alltid
+        await loop.run_in_executor(None, lambda: shutil.rmtree(target_dir, ignore_errors=True))  # Städar bort uppackade filer
+    succeeded = sum(1 for f in files if f["success"])  # Antal lyckade filer
+    return {  # Sammanfattning och resultat per fil
+        "files": files,  # Resultat i arkivets ordning
+        "total": len(files),  # Antal CV:n i arkivet
+        "succeeded": succeeded,  # Antal tolkade
+        "failed": len(files) - succeeded,  # Antal misslyckade
+        "elapsed_seconds": round(time.perf_counter() - started, 3),  # Total tid
+    }  # Slut på sammanfattning
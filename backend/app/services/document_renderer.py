@@ -0,0 +1,89 @@
+import os  # Läser konfiguration från miljövariabler
+from collections import OrderedDict  # LRU-ordning för renderade filer
+from io import BytesIO  # Dokumenten byggs i minnet
+from typing import Dict, Optional  # Typangivelser för tydlighet
+
+from docx import Document  # Skapar DOCX-filer från text
+
+from app.services import cv_sections  # Samma rubrik- och bullet-regler som sektionsuppdelningen
+from app.services import pdf_exporter  # PDF-rendering
+from app.services import result_cache  # Innehållsbaserade nycklar
+from app.services import tracing  # Tid per steg i spårade anrop
+from app.services import worker_pool  # Renderingen körs i arbetarprocesser
+from app.services.single_flight import SingleFlight  # Samma dokument renderas bara en gång åt gången
+
+FORMAT_DOCX = "docx"  # Word-format
+FORMAT_PDF = "pdf"  # PDF-format
+RENDER_VERSION = "1"  # Höjs när layouten ändras så att gamla cachade filer inte används
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # Max minne för renderade filer
+
+MEDIA_TYPES = {  # MIME-typ per format
+    FORMAT_DOCX: "application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # MIME-typ för DOCX
+    FORMAT_PDF: "application/pdf",  # MIME-typ för PDF
+}  # Slut på MIME-typer
+
+_docx_template: Optional[bytes] = None  # Tom DOCX-mall per process, byggs en gång
+_output_cache: "OrderedDict[str, bytes]" = OrderedDict()  # Nyckel -> renderad fil
+_output_cache_bytes = 0  # Totalt antal bytes i cachen
+_render_flight = SingleFlight()  # Slår ihop samtidiga renderingar av samma dokument
+_stats = {"hits": 0, "misses": 0, "evictions": 0}  # Räknare för cachen
+
+def _template_bytes() -> bytes:  # Tom mall med stilar, byggd en gång per arbetarprocess
+    global _docx_template  # Processens mall
+    if _docx_template is None:  # Första renderingen i processen
+        buffer = BytesIO()  # Minnesbuffert
+        Document().save(buffer)  # Standardmallen med alla stilar
+        _docx_template = buffer.getvalue()  # Sparar mallen
+    return _docx_template  # Returnerar mallen
+
+def render_docx_bytes(text: str) -> bytes:  # Bygger DOCX av optimerad text i minnet (körs i arbetarprocess)
+    doc = Document(BytesIO(_template_bytes()))  # Nytt dokument från cachad mall
+    styles = {name: doc.styles[name] for name in ("Heading 1", "Heading 2", "List Bullet")}  # Stilar slås upp en gång per dokument
+    for raw_line in text.splitlines():  # Delar upp texten rad för rad
+        line = raw_line.strip()  # Tar bort blanksteg
+        if not line:  # Hoppar över tomma rader
+            continue  # Går vidare till nästa rad
+        if line.startswith("=== ") and line.endswith(" ==="):  # Identifierar språk-sektioner
+            doc.add_paragraph(line.replace("=", "").strip(), style=styles["Heading 1"])  # Lägger till huvudrubrik
+        elif cv_sections.is_bullet(line):  # Identifierar punktlistor
+            doc.add_paragraph(line[2:], style=styles["List Bullet"])  # Lägger till bullet-paragraf
+        elif cv_sections.is_heading(line):  # Enkel heuristik för rubriker (samma som sektionsuppdelningen)
+            doc.add_paragraph(line, style=styles["Heading 2"])  # Lägger till rubrik
+        else:  # Standardrad
+            doc.add_paragraph(line)  # Lägger till vanlig paragraf
+    buffer = BytesIO()  # Minnesbuffert i stället för temporär fil
+    doc.save(buffer)  # Sparar DOCX i bufferten
+    return buffer.getvalue()  # Returnerar DOCX-bytes
+
+_RENDERERS = {FORMAT_DOCX: render_docx_bytes, FORMAT_PDF: pdf_exporter.render_pdf_bytes}  # Renderare per format
+
+def _cache_put(key: str, data: bytes) -> None:  # Sparar renderad fil och tar bort äldsta vid behov
+    global _output_cache_bytes  # Modulens räknare
+    if len(data) > RENDER_CACHE_MAX_BYTES:  # Filen ryms inte alls
+        return  # Cachas inte
+    _output_cache[key] = data  # Sparar filen
+    _output_cache_bytes += len(data)  # Räknar storlek
+    while _output_cache_bytes > RENDER_CACHE_MAX_BYTES:  # Över minnesgränsen
+        _, evicted = _output_cache.popitem(last=False)  # Tar bort minst nyligen använda
+        _output_cache_bytes -= len(evicted)  # Räknar ner storlek
+        _stats["evictions"] += 1  # Räknar borttagning
+
+async def render(text: str, fmt: str) -> bytes:  # Renderar text till DOCX eller PDF, cachat per innehållshash
+    key = result_cache.make_key("render", fmt, RENDER_VERSION, text)  # Samma text och format ger samma fil
+    cached = _output_cache.get(key)  # Slår upp i minnescachen
+    if cached is not None:  # Cacheträff
+        _output_cache.move_to_end(key)  # Markerar som senast använd
+        _stats["hits"] += 1  # Räknar träff
+        return cached  # Returnerar utan ny rendering
+    _stats["misses"] += 1  # Räknar miss
+
+    async def render_and_cache() -> bytes:  # Renderar i arbetarprocess och sparar resultatet
+        data = await worker_pool.run(_RENDERERS[fmt], text)  # CPU-tungt arbete utanför event loop
+        _cache_put(key, data)  # Sparar till nästa nedladdning
+        return data  # Returnerar filen
+
+    with tracing.span(f"render_{fmt}"):  # Tid för renderingen
+        return await _render_flight.run(key, render_and_cache)  # Samtidiga nedladdningar av samma dokument delar renderingen
+
+def stats() -> Dict[str, object]:  # Returnerar statistik för renderingscachen
+    return {**_stats, "entries": len(_output_cache), "bytes": _output_cache_bytes, "max_bytes": RENDER_CACHE_MAX_BYTES}  # Strukturerad statistik
@@ -0,0 +1,54 @@
+import asyncio  # Semaforer för att begränsa samtidiga anrop per värd
+import os  # Används för att läsa konfiguration från miljövariabler
+from contextlib import asynccontextmanager  # Gör host_slot användbar med "async with"
+from typing import AsyncIterator, Dict, Optional  # Typangivelser för tydlighet
+from urllib.parse import urlsplit  # Plockar ut värdnamn ur en URL
+
+import httpx  # Async HTTP-klient med connection pooling och keep-alive
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))  # Max antal öppna sockets totalt
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))  # Max antal vilande keep-alive-anslutningar
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "6"))  # Max antal samtidiga anrop mot samma värd
+HTTP_USER_AGENT = "CV-Optimizer/1.0 (+http://localhost:3000)"  # Identifierar oss mot webbplatser som skrapas
+
+_client: Optional[httpx.AsyncClient] = None  # Den delade klienten som lever lika länge som appen
+_host_slots: Dict[str, asyncio.Semaphore] = {}  # Värdnamn -> semafor som begränsar samtidiga anrop
+
+def _create_client() -> httpx.AsyncClient:  # Skapar en klient med pool-gränser
+    return httpx.AsyncClient(  # En klient återanvänder TCP-anslutningar mellan anrop
+        limits=httpx.Limits(  # Gränser för connection pool
+            max_connections=HTTP_MAX_CONNECTIONS,  # Totalt antal sockets
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,  # Vilande anslutningar som hålls öppna
+        ),  # Slut på gränser
+        timeout=httpx.Timeout(30.0, connect=10.0),  # Standard-timeout, anropare kan sätta egen
+        follow_redirects=True,  # Samma beteende som requests hade för jobbannons-URL:er
+        headers={"User-Agent": HTTP_USER_AGENT},  # Standardheader för alla anrop
+    )  # Slut på klient
+
+async def open_client() -> None:  # Öppnar den delade klienten (anropas i FastAPI lifespan)
+    global _client  # Uppdaterar modulens klient
+    if _client is None:  # Öppnar bara en gång
+        _client = _create_client()  # Skapar klienten
+
+async def close_client() -> None:  # Stänger den delade klienten och alla sockets
+    global _client  # Uppdaterar modulens klient
+    if _client is not None:  # Om klienten finns
+        await _client.aclose()  # Stänger pool och anslutningar
+        _client = None  # Markerar att klienten är stängd
+    _host_slots.clear()  # Semaforer hör till event loopen som stängs
+
+def get_client() -> httpx.AsyncClient:  # Returnerar den delade klienten
+    global _client  # Uppdaterar modulens klient vid behov
+    if _client is None:  # Om lifespan inte körts (t.ex. i skript)
+        _client = _create_client()  # Skapar klienten lat vid första användning
+    return _client  # Returnerar klienten
+
+@asynccontextmanager
+async def host_slot(url: str) -> AsyncIterator[None]:  # Begränsar antal samtidiga anrop mot en värd
+    host = urlsplit(url).netloc.lower()  # Värd (inkl. port) som nyckel
+    slot = _host_slots.get(host)  # Hämtar värdens semafor
+    if slot is None:  # Första anropet mot värden
+        slot = asyncio.Semaphore(HTTP_MAX_PER_HOST)  # Skapar semafor med per-värd-gräns
+        _host_slots[host] = slot  # Sparar semaforen
+    async with slot:  # Väntar på ledig plats mot värden
+        yield  # Kör anropet
@@ -1,37 +1,191 @@
-import re  # Regex för att rensa text från specialtecken
-from collections import Counter  # Räknar förekomster av ord
-from typing import List, Dict  # Typangivelser för tydlighet
+import hashlib  # Innehållshash som cachenyckel
+import os  # Läser konfiguration från miljövariabler
+import re  # Förkompilerade mönster för tokenisering och stamning
+import threading  # Lås runt cachen (anropas både från event loop och trådpool)
+from collections import Counter, OrderedDict, deque  # Räknare, LRU-ordning och bredden-först-bygge av automaten
+from functools import lru_cache  # Samma ord stammas bara en gång
+from typing import Dict, Iterator, List, Sequence, Tuple  # Typangivelser för tydlighet
+
+KEYWORD_CACHE_MAX_ENTRIES = int(os.getenv("KEYWORD_CACHE_MAX_ENTRIES", "256"))  # Max antal analyserade texter i minnet
+SKILL_WEIGHT = 2.0  # Flerordskompetenser ur ordlistan väger tyngre än enskilda ord vid rangordning
+MIN_STEM_LENGTH = 4  # Böjningsändelser tas bara bort om minst så många tecken blir kvar
 
 STOPWORDS = {  # Vanliga ord som inte säger något om kompetenser
     "och", "att", "det", "som", "för", "med", "på", "är", "av", "en", "ett", "i", "till", "vi",  # Svenska stoppord
     "the", "and", "or", "to", "of", "in", "for", "with", "a", "an", "is", "are", "as", "on", "by",  # Engelska stoppord
 }  # Slut på stopwords
 
+SKILL_PHRASES = (  # Tekniska termer på flera ord som ska räknas som en keyword
+    "machine learning", "deep learning", "artificial intelligence", "natural language processing", "computer vision",
+    "data science", "data engineering", "data warehouse", "business intelligence", "power bi",
+    "ci/cd", "continuous integration", "continuous delivery", "continuous deployment", "github actions", "gitlab ci",
+    "azure devops", "infrastructure as code", "google cloud", "google cloud platform", "amazon web services",
+    "spring boot", "react native", "node.js", "next.js", "vue.js", "asp.net", "asp.net core", ".net core",
+    "sql server", "unit testing", "test driven development", "domain driven design", "event driven",
+    "rest api", "restful api", "object oriented", "full stack", "site reliability engineering", "visual studio",
+    "agila metoder", "scaled agile", "product owner", "scrum master", "clean code",
+)  # Slut på flerordskompetenser
+
+PROTECTED_WORDS = {  # Tekniska ord som ser böjda ut men inte är det (annars blir t.ex. docker -> dock)
+    "docker", "jenkins", "kubernetes", "redis", "pandas", "rails", "postgres", "kafka", "ansible", "kotlin",
+    "linux", "windows", "express", "jest", "nodejs", "numpy", "scipy", "hibernate", "jira", "figma", "tableau",
+    "elasticsearch", "rabbitmq", "grafana", "pytest", "selenium", "cypress", "kibana", "sales", "devops", "business",
+}  # Slut på skyddade ord
+
+ROLE_SUFFIXES = tuple(sorted((  # Sammansättningar där förleden är kompetensen ("pythonutvecklare" -> "python")
+    "utvecklare", "utvecklaren", "utvecklarna", "utveckling", "utvecklingen", "developer", "developers", "development",
+    "ingenjör", "ingenjören", "ingenjörer", "engineer", "engineers", "engineering", "arkitekt", "arkitekten", "arkitekter",
+    "konsult", "konsulten", "konsulter", "specialist", "specialisten", "specialister", "expert", "experten", "experter",
+    "kunskap", "kunskaper", "kompetens", "erfarenhet", "programmering", "programmerare",
+), key=len, reverse=True))  # Längsta först så att "utvecklaren" inte blir "utvecklare" + "n"
+
+INFLECTION_RULES = (  # (ändelse, ersättning), längsta först; högst en regel används per ord
+    ("heterna", "het"), ("heten", "het"), ("heter", "het"),  # erfarenheter -> erfarenhet
+    ("ningarna", "ning"), ("ningar", "ning"), ("ningen", "ning"),  # lösningar -> lösning
+    ("erna", ""), ("arna", ""), ("orna", ""),  # kunderna -> kund
+    ("ies", "y"),  # technologies -> technology
+    ("s", ""),  # services -> service
+)  # Slut på böjningsregler
+S_KEEP_ENDINGS = ("ss", "us", "is")  # Ord där slut-s hör till stammen (process, status, analysis)
+
+_TOKEN = re.compile(r"[a-zåäö0-9]+")  # Ett ord: bokstäver och siffror (samma tecken som tidigare rensning)
+_VERSIONED = re.compile(r"^([a-zåäö]{3,})\d+$")  # Ord med versionsnummer, t.ex. "python3" och "html5"
+
+def tokenize(text: str) -> List[str]:  # Delar upp text i gemena ord utan specialtecken
+    return _TOKEN.findall(text.lower())  # Förkompilerat mönster, inget uppslag i re-modulens cache
+
+def is_keyword(word: str) -> bool:  # Om ett ord räknas som keyword
+    return len(word) >= 3 and word not in STOPWORDS  # Filtrerar bort korta/stoppord
+
 def normalize_text(text: str) -> List[str]:  # Normaliserar text till en lista med relevanta ord
-    cleaned = text.lower()  # Gör texten gemener för jämförelse
-    cleaned = re.sub(r"[^a-zåäö0-9]+", " ", cleaned)  # Tar bort specialtecken och behåller ord
-    words = cleaned.split()  # Delar upp texten i ord
-    words = [word for word in words if len(word) >= 3 and word not in STOPWORDS]  # Filtrerar bort korta/stoppord
-    return words  # Returnerar listan med normaliserade ord
-
-def extract_keywords(text: str, top_n: int = 30) -> List[str]:  # Extraherar de vanligaste orden
-    words = normalize_text(text)  # Rensar texten till ord
-    counts = Counter(words)  # Räknar hur ofta varje ord förekommer
-    most_common = counts.most_common(top_n)  # Tar ut de vanligaste orden
-    keywords = [word for word, _ in most_common]  # Plockar ut endast orden
-    return keywords  # Returnerar listan med keywords
+    return [word for word in tokenize(text) if is_keyword(word)]  # Samma ord som tidigare, används även för BM25 och promptbudget
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:  # Lätt svensk/engelsk stamning, memoiserad per ord; tar bort högst en ändelse
+    versioned = _VERSIONED.match(word)  # "python3" -> "python"
+    if versioned:  # Versionsnummer på slutet
+        word = versioned.group(1)  # Tar bort siffrorna
+    if word in PROTECTED_WORDS:  # Tekniskt namn som inte ska stammas
+        return word  # Oförändrat
+    for suffix in ROLE_SUFFIXES:  # Yrkes- och kompetenssammansättningar
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:  # Förleden är ett eget ord
+            return word[:-len(suffix)]  # "javautvecklare" -> "java"
+    for suffix, replacement in INFLECTION_RULES:  # Böjningsändelser
+        if not word.endswith(suffix) or len(word) - len(suffix) + len(replacement) < MIN_STEM_LENGTH:  # Ändelsen saknas eller stammen blir för kort
+            continue  # Nästa regel
+        if suffix == "s" and word.endswith(S_KEEP_ENDINGS):  # Slut-s som inte är plural
+            return word  # Oförändrat
+        return word[:-len(suffix)] + replacement  # En ändelse bort, stammen stammas inte vidare
+    return word  # Ingen ändelse att ta bort
+
+class SkillMatcher:  # Aho-Corasick-automat över ordsekvenser: alla flerordskompetenser hittas i ett svep
+    def __init__(self, phrases: Sequence[str]):  # Bygger trie och fail-länkar en gång
+        self._goto: List[Dict[str, int]] = [{}]  # Nod -> (stam -> nästa nod), nod 0 är roten
+        self._fail: List[int] = [0]  # Nod -> längsta suffix som också är ett prefix i trien
+        self._output: List[List[str]] = [[]]  # Nod -> kompetenser som slutar här
+        for phrase in phrases:  # Lägger in varje kompetens i trien
+            node = 0  # Börjar i roten
+            for token in [stem(t) for t in tokenize(phrase)]:  # Samma stamning som texten som matchas
+                if token not in self._goto[node]:  # Ny gren
+                    self._goto.append({})  # Ny nod
+                    self._fail.append(0)  # Fail-länk sätts nedan
+                    self._output.append([])  # Inga träffar än
+                    self._goto[node][token] = len(self._goto) - 1  # Kopplar in noden
+                node = self._goto[node][token]  # Går vidare
+            self._output[node].append(phrase)  # Kompetensen slutar i noden
+        queue = deque(self._goto[0].values())  # Rotens barn har fail-länk till roten
+        while queue:  # Bredden först så att kortare suffix alltid är klara
+            node = queue.popleft()  # Nästa nod
+            for token, child in self._goto[node].items():  # Nodens barn
+                queue.append(child)  # Barnens barn behandlas senare
+                fail = self._fail[node]  # Följer fail-länkar tills stammen kan fortsätta
+                while fail and token not in self._goto[fail]:  # Ingen fortsättning här
+                    fail = self._fail[fail]  # Kortare suffix
+                self._fail[child] = self._goto[fail].get(token, 0)  # Längsta matchande suffix
+                self._output[child] = self._output[child] + self._output[self._fail[child]]  # Ärver kortare kompetenser
+
+    def find(self, stems: Sequence[str]) -> Iterator[Tuple[int, str]]:  # (index för sista ordet, kompetens) för varje träff
+        goto, fail, output = self._goto, self._fail, self._output  # Lokala namn i den heta loopen
+        node = 0  # Börjar i roten
+        for index, token in enumerate(stems):  # Ett ord i taget
+            while node and token not in goto[node]:  # Ingen fortsättning
+                node = fail[node]  # Faller tillbaka
+            node = goto[node].get(token, 0)  # Nästa tillstånd
+            for phrase in output[node]:  # Alla kompetenser som slutar här
+                yield index, phrase  # Träff
+
+class KeywordSet:  # Färdig analys av en text: rangordnade keywords och stammar för matchning
+    def __init__(self, ranked: List[Tuple[str, str]]):  # (nyckel, visningsform) i rangordning
+        self.keywords = [display for _, display in ranked]  # Visningsformer, viktigast först
+        self.keys = {key for key, _ in ranked}  # Alla nycklar i texten
+        self._key_of = {display: key for key, display in ranked}  # Visningsform -> nyckel
+
+    def top(self, top_n: int) -> List[str]:  # De viktigaste keywords
+        return self.keywords[:top_n]  # Ny lista, cachen ändras inte
+
+    def key(self, keyword: str) -> str:  # Nyckel för en keyword ur top()
+        return self._key_of[keyword]  # Stam eller kompetens
+
+class KeywordPipeline:  # Tokenisering, stamning och kompetensordlista, byggs en gång vid start
+    def __init__(self, skill_phrases: Sequence[str] = SKILL_PHRASES, skill_weight: float = SKILL_WEIGHT):  # Förbereder automaten
+        self.skills = SkillMatcher(skill_phrases)  # Flerordskompetenser
+        self.skill_weight = skill_weight  # Vikt för kompetensträffar
+
+    def analyze(self, text: str) -> KeywordSet:  # Rangordnar keywords, böjningar och versioner räknas som samma ord
+        tokens = tokenize(text)  # Alla ord, även korta (behövs för t.ex. "ci/cd")
+        stems = [stem(token) for token in tokens]  # Memoiserad stamning
+        counts = Counter((key, token) for token, key in zip(tokens, stems) if len(token) >= 3 and token not in STOPWORDS)  # (stam, ordform) -> antal, samma filter som normalize_text
+        phrases = Counter(phrase for _, phrase in self.skills.find(stems))  # Alla kompetenser i ett svep
+        scores: Counter = Counter()  # Nyckel -> poäng, i ordning efter första förekomst
+        display: Dict[str, Tuple[str, int]] = {}  # Nyckel -> (vanligaste ordform, antal)
+        for (key, token), count in counts.items():  # Slår ihop böjningar och versioner
+            scores[key] += count  # Räknar stammen
+            if count > display.get(key, ("", 0))[1]:  # Vanligare ordform
+                display[key] = (token, count)  # Visas i resultatet
+        for phrase, count in phrases.items():  # Kompetenser ur ordlistan
+            scores[phrase] += count * self.skill_weight  # Väger tyngre än enskilda ord
+            display[phrase] = (phrase, count)  # Visas som i ordlistan
+        ranked = [(key, display[key][0]) for key, _ in scores.most_common()]  # Poäng först, sedan första förekomst
+        return KeywordSet(ranked)  # Färdig analys
+
+pipeline = KeywordPipeline()  # Byggs en gång när modulen laddas
+
+_lock = threading.Lock()  # Skyddar cachen
+_cache: "OrderedDict[str, KeywordSet]" = OrderedDict()  # Innehållshash -> analys
+_stats = {"hits": 0, "misses": 0, "evictions": 0}  # Räknare för cachen
+
+def analyze(text: str) -> KeywordSet:  # Analys per innehållshash, samma CV analyseras bara en gång
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()  # Samma hash som sparade CV-versioner
+    with _lock:  # Läser cachen
+        cached = _cache.get(key)  # Tidigare analys
+        if cached is not None:  # Träff
+            _cache.move_to_end(key)  # Senast använd
+            _stats["hits"] += 1  # Räknar träff
+            return cached  # Återanvänder analysen
+        _stats["misses"] += 1  # Räknar miss
+    keyword_set = pipeline.analyze(text)  # Analyserar utanför låset
+    with _lock:  # Sparar analysen
+        _cache[key] = keyword_set  # Lägger in
+        while len(_cache) > KEYWORD_CACHE_MAX_ENTRIES:  # För många texter
+            _cache.popitem(last=False)  # Tar bort äldsta
+            _stats["evictions"] += 1  # Räknar borttagning
+    return keyword_set  # Returnerar analysen
+
+def stats() -> Dict[str, object]:  # Returnerar statistik för keyword-cachen och stamningen
+    return {**_stats, "entries": len(_cache), "max_entries": KEYWORD_CACHE_MAX_ENTRIES, "stemmed_words": stem.cache_info().currsize}  # Strukturerad statistik
+
+def extract_keywords(text: str, top_n: int = 30) -> List[str]:  # Extraherar de viktigaste keywords
+    return analyze(text).top(top_n)  # Rangordnat efter stam och kompetensordlista
 
 def compare_keywords(job_text: str, cv_text: str, top_n: int = 30) -> Dict[str, List[str]]:  # Jämför keywords mellan jobb och CV
-    job_keywords = extract_keywords(job_text, top_n)  # Keywords från jobbannons
-    cv_keywords = extract_keywords(cv_text, top_n)  # Keywords från CV
-    job_set = set(job_keywords)  # Gör set för snabb jämförelse
-    cv_set = set(cv_keywords)  # Gör set för snabb jämförelse
-    matched = sorted(list(job_set & cv_set))  # Ord som finns i båda
-    missing = sorted(list(job_set - cv_set))  # Ord som saknas i CV
+    job = analyze(job_text)  # Analys av jobbannonsen
+    cv = analyze(cv_text)  # Analys av CV:t (cachad per innehållshash)
+    job_keywords = job.top(top_n)  # Keywords från jobbannons
+    matched = sorted(k for k in job_keywords if job.key(k) in cv.keys)  # Finns i CV:t, även i annan böjning
+    missing = sorted(k for k in job_keywords if job.key(k) not in cv.keys)  # Saknas i CV:t
     return {  # Returnerar strukturerat resultat
         "job_keywords": job_keywords,  # Keywords från jobbannons
-        "cv_keywords": cv_keywords,  # Keywords från CV
+        "cv_keywords": cv.top(top_n),  # Keywords från CV
         "matched": matched,  # Gemensamma ord
         "missing": missing,  # Ord som saknas i CV
     }  # Slut på resultat
-
@@ -0,0 +1,128 @@
+import math  # Logaritmer för IDF
+import re  # Delar upp text i fraser
+from collections import Counter  # Räknar termer per dokument
+from typing import Dict, List, Sequence  # Typangivelser för tydlighet
+
+import numpy as np  # Vektoriserade beräkningar över hela korpusen
+from scipy import sparse  # Gles term-dokument-matris (de flesta termer saknas i de flesta dokument)
+
+from app.services import keyword_extractor  # Samma normalisering som resten av keyword-flödet
+
+METHOD_BM25 = "bm25"  # Okapi BM25: mättad termfrekvens och längdnormalisering
+METHOD_TFIDF = "tfidf"  # Klassisk TF-IDF med cosinuslikhet
+BM25_K1 = 1.5  # BM25: hur snabbt termfrekvensen mättas
+BM25_B = 0.75  # BM25: hur mycket dokumentlängden normaliseras
+
+FRAGMENT_SPLIT = re.compile(r"[.,;:!?()\[\]/|•\n]+")  # Skiljetecken där n-gram inte får korsa
+
+def extract_terms(text: str, ngram_max: int = 2) -> List[str]:  # Plockar ut unigram och n-gram ("machine learning")
+    terms: List[str] = []  # Samlar alla termer
+    for fragment in FRAGMENT_SPLIT.split(text):  # N-gram bildas bara inom samma fras
+        raw_words = keyword_extractor.tokenize(fragment)  # Samma förkompilerade tokenisering som normalize_text
+        keep = [keyword_extractor.is_keyword(w) for w in raw_words]  # Vilka ord som räknas som keywords
+        terms.extend(w for w, k in zip(raw_words, keep) if k)  # Unigram (samma som normalize_text)
+        for n in range(2, ngram_max + 1):  # Bigram, trigram osv.
+            for i in range(len(raw_words) - n + 1):  # Alla fönster av längd n
+                window = raw_words[i:i + n]  # Intilliggande ord i originaltexten
+                if all(keep[i:i + n]) and len(set(window)) == n:  # Inga stoppord emellan och inga upprepningar
+                    terms.append(" ".join(window))  # N-grammet som en term
+    return terms  # Returnerar alla termer
+
+class KeywordScoringEngine:  # Bygger en gles term-dokument-matris en gång och poängsätter CV:n mot hela korpusen
+    def __init__(self, documents: Sequence[str], ngram_max: int = 2, k1: float = BM25_K1, b: float = BM25_B):  # Indexerar dokumenten
+        self.ngram_max = ngram_max  # Längsta n-gram
+        self.k1 = k1  # BM25: hur snabbt termfrekvensen mättas
+        self.b = b  # BM25: hur mycket dokumentlängden normaliseras
+        self.vocabulary: Dict[str, int] = {}  # Term -> kolumnindex
+        rows: List[int] = []  # Radindex (dokument) för varje icke-noll-värde
+        cols: List[int] = []  # Kolumnindex (term) för varje icke-noll-värde
+        counts: List[int] = []  # Termfrekvens för varje icke-noll-värde
+        for row, text in enumerate(documents):  # Tokeniserar varje dokument exakt en gång
+            for term, count in Counter(extract_terms(text, ngram_max)).items():  # Termfrekvenser i dokumentet
+                col = self.vocabulary.setdefault(term, len(self.vocabulary))  # Ny term får nästa lediga kolumn
+                rows.append(row)  # Sparar rad
+                cols.append(col)  # Sparar kolumn
+                counts.append(count)  # Sparar frekvens
+        self.terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=object)  # Kolumnindex -> term
+        shape = (len(documents), len(self.vocabulary))  # Matrisens storlek
+        self.tf = sparse.csr_matrix((np.array(counts, dtype=np.float64), (rows, cols)), shape=shape)  # Term-dokument-matris
+        n_docs = max(shape[0], 1)  # Antal dokument (minst 1 för att undvika division med noll)
+        df = np.bincount(self.tf.indices, minlength=shape[1]).astype(np.float64)  # Antal dokument per term
+        self.idf_bm25 = np.log1p((n_docs - df + 0.5) / (df + 0.5))  # BM25-IDF (alltid positiv)
+        self.idf_tfidf = np.log((1 + n_docs) / (1 + df)) + 1.0  # Utjämnad TF-IDF-IDF
+        self.bm25 = self._build_bm25()  # Förberäknade BM25-vikter per (dokument, term)
+        self.tfidf = self._build_tfidf()  # L2-normaliserade TF-IDF-vektorer per dokument
+
+    def _build_bm25(self) -> sparse.csr_matrix:  # Räknar BM25-vikt för alla icke-noll-värden i ett svep
+        doc_len = np.asarray(self.tf.sum(axis=1)).ravel()  # Dokumentlängd i termer
+        avg_len = doc_len.mean() if doc_len.size else 0.0  # Medellängd
+        matrix = self.tf.copy()  # Kopia som fylls med vikter
+        row_len = np.repeat(doc_len, np.diff(matrix.indptr))  # Dokumentlängd för varje icke-noll-värde
+        norm = self.k1 * (1 - self.b + self.b * row_len / avg_len) if avg_len else self.k1  # Längdnormalisering
+        tf = matrix.data  # Termfrekvenser
+        matrix.data = self.idf_bm25[matrix.indices] * tf * (self.k1 + 1) / (tf + norm)  # BM25-formeln vektoriserat
+        return matrix  # Returnerar viktmatris
+
+    def _build_tfidf(self) -> sparse.csr_matrix:  # Räknar normaliserade TF-IDF-vektorer
+        matrix = self.tf.multiply(self.idf_tfidf).tocsr()  # tf * idf per kolumn
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())  # Vektorlängd per dokument
+        norms[norms == 0] = 1.0  # Tomma dokument lämnas orörda
+        return sparse.diags(1.0 / norms) @ matrix  # Varje rad får längd 1
+
+    def vectorize(self, text: str) -> sparse.csr_matrix:  # Gör om en text (t.ex. CV) till en gles rad över korpusens termer
+        counts = Counter(term for term in extract_terms(text, self.ngram_max) if term in self.vocabulary)  # Bara kända termer
+        cols = [self.vocabulary[term] for term in counts]  # Kolumnindex
+        data = np.array(list(counts.values()), dtype=np.float64)  # Frekvenser
+        return sparse.csr_matrix((data, ([0] * len(cols), cols)), shape=(1, len(self.vocabulary)))  # 1 x V-matris
+
+    def score(self, cv_text: str, method: str = METHOD_BM25) -> np.ndarray:  # Poäng för alla dokument i ett vektoriserat svep
+        query = self.vectorize(cv_text)  # CV:t som gles vektor
+        if method == METHOD_TFIDF:  # Cosinuslikhet mellan TF-IDF-vektorer
+            query = query.multiply(self.idf_tfidf).tocsr()  # Viktar CV:ts termer
+            norm = math.sqrt(query.multiply(query).sum()) or 1.0  # CV-vektorns längd
+            return np.asarray((self.tfidf @ query.T).todense()).ravel() / norm  # Alla dokument på en gång
+        if method != METHOD_BM25:  # Okänd metod
+            raise ValueError(f"Okänd poängmetod: {method}")  # Tydligt fel
+        query.data[:] = 1.0  # BM25: CV:t fungerar som fråga, varje term räknas en gång
+        return np.asarray((self.bm25 @ query.T).todense()).ravel()  # Summan av dokumentens vikter för CV:ts termer
+
+    def weighted_terms(self, doc_index: int, method: str = METHOD_BM25) -> Dict[str, float]:  # Termer i ett dokument med vikt
+        matrix = self.tfidf if method == METHOD_TFIDF else self.bm25  # Väljer viktmatris
+        row = matrix.getrow(doc_index)  # Dokumentets rad
+        return {self.terms[col]: float(weight) for col, weight in zip(row.indices, row.data)}  # Term -> vikt
+
+    def rank(self, cv_text: str, top_k: int = 10, method: str = METHOD_BM25, missing_n: int = 15) -> List[Dict[str, object]]:  # Rankade träffar
+        scores = self.score(cv_text, method)  # Poäng för alla dokument
+        if scores.size == 0 or top_k <= 0:  # Tom korpus eller inga träffar begärda
+            return []  # Inga träffar
+        top_k = min(top_k, scores.size)  # Kan inte returnera fler än vi har
+        top = np.argpartition(-scores, top_k - 1)[:top_k]  # De bästa utan att sortera hela korpusen
+        top = top[np.argsort(-scores[top])]  # Sorterar bara de bästa
+        cv_terms = set(extract_terms(cv_text, self.ngram_max))  # CV:ts termer för matchning
+        results = []  # Samlar träffar
+        for doc_index in top:  # Går igenom de bästa dokumenten
+            weights = self.weighted_terms(int(doc_index), method)  # Dokumentets viktade termer
+            missing = sorted((t for t in weights if t not in cv_terms), key=weights.get, reverse=True)  # Saknade termer, viktigast först
+            matched_weight = sum(w for t, w in weights.items() if t in cv_terms)  # Vikt som CV:t täcker
+            total_weight = sum(weights.values()) or 1.0  # Total vikt i dokumentet
+            results.append({  # Lägger till träff
+                "index": int(doc_index),  # Dokumentets plats i korpusen
+                "score": round(float(scores[doc_index]), 4),  # Poäng
+                "coverage": round(matched_weight / total_weight, 4),  # Andel av dokumentets vikt som CV:t täcker
+                "missing": [{"term": t, "weight": round(weights[t], 4)} for t in missing[:missing_n]],  # Viktade saknade keywords
+            })  # Slut på träff
+        return results  # Returnerar rankade träffar
+
+def compare_keywords_weighted(job_text: str, cv_text: str, top_n: int = 30, method: str = METHOD_BM25) -> Dict[str, object]:  # Viktad variant av compare_keywords
+    result: Dict[str, object] = dict(keyword_extractor.compare_keywords(job_text, cv_text, top_n))  # Samma fält som /keywords alltid haft
+    engine = KeywordScoringEngine([job_text])  # Index över jobbannonsen (n-gram och viktning)
+    weights = engine.weighted_terms(0, method)  # Jobbannonsens termer med vikt
+    ranked = sorted(weights, key=weights.get, reverse=True)[:top_n]  # Viktigaste termerna först
+    cv_terms = set(extract_terms(cv_text, engine.ngram_max))  # CV:ts termer
+    result["weighted_job_keywords"] = [{"term": t, "weight": round(weights[t], 4)} for t in ranked]  # Viktade keywords
+    result["weighted_matched"] = [{"term": t, "weight": round(weights[t], 4)} for t in ranked if t in cv_terms]  # Viktade träffar
+    result["weighted_missing"] = [{"term": t, "weight": round(weights[t], 4)} for t in ranked if t not in cv_terms]  # Viktade saknade
+    total = sum(weights[t] for t in ranked) or 1.0  # Total vikt för topptermerna
+    result["match_score"] = round(sum(weights[t] for t in ranked if t in cv_terms) / total, 4)  # Viktad täckning 0-1
+    result["method"] = method  # Vilken viktning som användes
+    return result  # Returnerar resultatet
@@ -0,0 +1,234 @@
+import asyncio  # Bakgrunds-task för hälsokontroller
+import json  # Läser backend-listan från miljövariabel
+import logging  # Varnar för felaktig backend-konfiguration
+import os  # Läser konfiguration från miljövariabler
+import math  # Avrundning uppåt för Retry-After
+import time  # Mäter latens och tider för circuit breaker
+from collections import deque  # Senaste latenserna per backend
+from contextlib import asynccontextmanager  # Gör lease användbar med "async with"
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set  # Typangivelser för tydlighet
+
+import httpx  # Feltyper för timeout och nätverksfel
+
+from app.services import http_client  # Delad klient för hälsokontroller
+from app.services import llm_scheduler  # Köavslag och global samtidighetsgräns
+from app.services import tracing  # Backendstatus till /metrics
+
+DEFAULT_URL = os.getenv("LM_STUDIO_URL", "http://127.0.0.1:1234/v1/chat/completions")  # Standard-backend om ingen lista anges
+DEFAULT_MODEL = os.getenv("LM_STUDIO_MODEL", "meta-llama-3.1-8b-instruct")  # Standardmodell
+LLM_BACKENDS = os.getenv("LLM_BACKENDS", "")  # JSON-lista: [{"name": ..., "url": ..., "model": ..., "max_concurrency": ...}] ("model" måste vara LM_STUDIO_MODEL)
+HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "15"))  # Sekunder mellan hälsokontroller
+HEALTH_CHECK_TIMEOUT = 5.0  # Timeout för en hälsokontroll
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURES", "3"))  # Fel i rad innan backenden stängs av
+CIRCUIT_OPEN_SECONDS = float(os.getenv("LLM_CIRCUIT_OPEN_SECONDS", "30"))  # Hur länge en avstängd backend vilar
+LATENCY_WINDOW = 200  # Antal senaste anrop som latensstatistiken bygger på
+
+logger = logging.getLogger(__name__)  # Loggare för routern
+
+STATE_CLOSED = "closed"  # Normal drift
+STATE_OPEN = "open"  # Avstängd efter upprepade fel
+STATE_HALF_OPEN = "half_open"  # Ett provanrop släpps igenom för att se om backenden är tillbaka
+
+class NoBackendAvailableError(llm_scheduler.AdmissionError):  # Alla backends är avstängda eller har redan provats (blir 503 med Retry-After)
+    pass
+
+class BackendFailure(Exception):  # Fel som ska leda till failover (timeout, nätverk, 5xx)
+    pass
+
+def is_failover_error(error: Exception) -> bool:  # Om felet beror på backenden och ett annat försök kan lyckas
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):  # Timeout eller nätverksfel
+        return True  # Prova nästa backend
+    if isinstance(error, httpx.HTTPStatusError):  # Felstatus från servern
+        return error.response.status_code >= 500  # 5xx: serverfel, 4xx: fel i anropet (hjälper inte att byta)
+    return False  # Övriga fel skickas vidare
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:  # Percentil ur en sorterad lista
+    if not values:  # Inga mätningar
+        return None  # Okänt
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))  # Närmaste index
+    return values[index]  # Värdet på percentilen
+
+class Backend:  # En OpenAI-kompatibel inferensserver
+    def __init__(self, name: str, url: str, model: str, max_concurrency: int = 1):  # Skapar en backend
+        self.name = name  # Namn i statistik och loggar
+        self.url = url  # chat/completions-URL
+        self.model = model  # Modell-id på just den här servern
+        self.max_concurrency = max(1, max_concurrency)  # Samtidiga genereringar servern klarar
+        self.outstanding = 0  # Pågående anrop
+        self.healthy = True  # Resultat av senaste hälsokontroll
+        self.state = STATE_CLOSED  # Circuit breaker-läge
+        self.consecutive_failures = 0  # Fel i rad
+        self.opened_at = 0.0  # När kretsen öppnades
+        self.probe_in_flight = False  # Om ett provanrop pågår i halvöppet läge
+        self.requests = 0  # Totalt antal anrop
+        self.failures = 0  # Totalt antal fel
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)  # Senaste latenser i sekunder
+
+    @property
+    def models_url(self) -> str:  # URL för hälsokontroll (/v1/models)
+        return self.url.rsplit("/chat/completions", 1)[0] + "/models"  # Samma bas-URL som chat/completions
+
+    def available(self, now: float) -> bool:  # Om backenden får ta emot ett nytt anrop
+        if self.state == STATE_OPEN and now - self.opened_at >= CIRCUIT_OPEN_SECONDS:  # Vilotiden är slut
+            self.state = STATE_HALF_OPEN  # Släpper igenom ett provanrop
+        if self.state == STATE_OPEN:  # Fortfarande avstängd
+            return False  # Används inte
+        if self.state == STATE_HALF_OPEN:  # Bara ett provanrop åt gången
+            return not self.probe_in_flight  # Ledig om inget prov pågår
+        return self.healthy  # Stängd krets: hälsokontrollen avgör
+
+    def load(self) -> float:  # Belastning relativt kapaciteten (för least-outstanding)
+        return self.outstanding / self.max_concurrency  # 0 = ledig, 1 = full
+
+    def avg_latency(self) -> float:  # Medellatens (används som tie-break)
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0  # 0 om inget mätt än
+
+    def record_success(self, seconds: float) -> None:  # Lyckat anrop
+        self.latencies.append(seconds)  # Sparar latens
+        self.consecutive_failures = 0  # Nollställer felräknaren
+        self.state = STATE_CLOSED  # Ett lyckat prov stänger kretsen
+        self.healthy = True  # Ett lyckat anrop betyder att servern lever
+
+    def record_failure(self, now: float) -> None:  # Misslyckat anrop
+        self.failures += 1  # Räknar fel
+        self.consecutive_failures += 1  # Fel i rad
+        if self.state == STATE_HALF_OPEN or self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:  # Provet misslyckades eller för många fel
+            self.state = STATE_OPEN  # Öppnar kretsen
+            self.opened_at = now  # Startar vilotiden
+
+    def stats(self) -> Dict[str, object]:  # Status och latens för backenden
+        ordered = sorted(self.latencies)  # Sorterade latenser för percentiler
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None  # Sekunder -> millisekunder
+        return {  # Strukturerad status
+            "name": self.name,  # Namn
+            "url": self.url,  # Endpoint
+            "model": self.model,  # Modell
+            "state": self.state,  # Circuit breaker-läge
+            "healthy": self.healthy,  # Senaste hälsokontroll
+            "outstanding": self.outstanding,  # Pågående anrop
+            "max_concurrency": self.max_concurrency,  # Kapacitet
+            "requests": self.requests,  # Totalt antal anrop
+            "failures": self.failures,  # Totalt antal fel
+            "latency_ms": {  # Latens över de senaste anropen
+                "avg": to_ms(self.avg_latency() if ordered else None),  # Medelvärde
+                "p50": to_ms(_percentile(ordered, 0.5)),  # Median
+                "p95": to_ms(_percentile(ordered, 0.95)),  # 95:e percentilen
+                "samples": len(ordered),  # Antal mätningar
+            },  # Slut på latens
+        }  # Slut på status
+
+def _default_backends() -> List[Backend]:  # Standard-backenden från LM_STUDIO_URL
+    return [Backend("default", DEFAULT_URL, DEFAULT_MODEL, int(os.getenv("LLM_MAX_CONCURRENCY", "1")))]  # En backend som tidigare
+
+def _load_backends(config: str = LLM_BACKENDS) -> List[Backend]:  # Läser backend-listan från LLM_BACKENDS eller använder standard-backenden
+    if not config.strip():  # Ingen lista angiven
+        return _default_backends()  # En backend som tidigare
+    try:  # Felaktig konfiguration ska inte stoppa uppstarten
+        backends = []  # Samlar backends
+        for index, entry in enumerate(json.loads(config)):  # Går igenom konfigurationen
+            name = entry.get("name") or f"backend-{index}"  # Namn (eller löpnummer)
+            model = entry.get("model", DEFAULT_MODEL)  # Modell på servern
+            if model != DEFAULT_MODEL:  # Cache-nycklarna bygger på LM_STUDIO_MODEL
+                raise ValueError(f"{name} kör modellen {model}, men alla backends måste köra {DEFAULT_MODEL}")  # Annars delar olika modeller cacheposter
+            backends.append(Backend(  # Skapar backend
+                name,  # Namn i statistik och loggar
+                entry["url"],  # chat/completions-URL krävs
+                model,  # Samma modell som cache-nycklarna
+                int(entry.get("max_concurrency", 1)),  # Kapacitet
+            ))  # Slut på backend
+    except (ValueError, TypeError, KeyError, AttributeError) as e:  # Ogiltig JSON, fel typ, saknad url eller annan modell
+        logger.error("Ogiltig LLM_BACKENDS, använder standard-backenden: %s", e)  # Syns i serverloggen
+        return _default_backends()  # Faller tillbaka på LM_STUDIO_URL
+    return backends or _default_backends()  # Tom lista ger standard-backenden
+
+class LLMRouter:  # Fördelar LLM-anrop över flera backends med failover
+    def __init__(self, backends: List[Backend]):  # Skapar routern
+        self.backends = backends  # Alla registrerade backends
+        self.failovers = 0  # Antal gånger ett anrop flyttades till en annan backend
+        self._health_task: Optional[asyncio.Task] = None  # Bakgrunds-task för hälsokontroller
+
+    def total_capacity(self) -> int:  # Summan av alla backends kapacitet
+        return sum(backend.max_concurrency for backend in self.backends)  # Används som global samtidighetsgräns
+
+    def apply_scheduler_capacity(self) -> None:  # Låter kön släppa in lika många som alla backends klarar (anropas i FastAPI lifespan)
+        if "LLM_MAX_CONCURRENCY" not in os.environ:  # En uttrycklig gräns vinner alltid
+            llm_scheduler.scheduler.max_concurrency = self.total_capacity()  # Summan av alla backends kapacitet
+
+    def pick(self, exclude: Set[str], last_failure: Optional[Exception] = None) -> Backend:  # Väljer backend med minst pågående anrop relativt kapaciteten
+        now = time.monotonic()  # Aktuell tid för circuit breaker
+        candidates = [b for b in self.backends if b.name not in exclude and b.available(now)]  # Tillgängliga och inte redan provade
+        if not candidates:  # Alla är avstängda eller provade
+            message = "Ingen LLM-backend är tillgänglig just nu"  # Grundmeddelande
+            if last_failure is not None:  # Alla provade backends misslyckades
+                message += f" (senaste fel: {last_failure})"  # Visar varför
+            raise NoBackendAvailableError(message, self._retry_after(now))  # Samma avslag som en överbelastad kö
+        return min(candidates, key=lambda b: (b.load(), b.avg_latency()))  # Least outstanding, snabbast vid lika
+
+    @asynccontextmanager
+    async def lease(self, exclude: Set[str], last_failure: Optional[Exception] = None) -> AsyncIterator[Backend]:  # Lånar en backend för ett anrop och mäter utfallet
+        backend = self.pick(exclude, last_failure)  # Väljer backend
+        if exclude:  # En annan backend har redan provats för samma anrop
+            self.failovers += 1  # Räknar failover
+        exclude.add(backend.name)  # Provas inte igen vid failover
+        if backend.state == STATE_HALF_OPEN:  # Det här är provanropet
+            backend.probe_in_flight = True  # Blockerar fler prov
+        backend.outstanding += 1  # Räknar pågående
+        backend.requests += 1  # Räknar anrop
+        started = time.perf_counter()  # Starttid för latens
+        try:  # Kör anroparens kod
+            yield backend  # Ger anroparen backenden
+        except Exception as e:  # Anropet misslyckades
+            if is_failover_error(e):  # Backenden var orsaken
+                backend.record_failure(time.monotonic())  # Räknar mot circuit breakern
+                raise BackendFailure(f"{backend.name}: {e}") from e  # Signalerar att nästa backend ska provas
+            raise  # Andra fel skickas vidare oförändrade
+        else:  # Lyckat anrop
+            backend.record_success(time.perf_counter() - started)  # Sparar latens
+        finally:  # Körs alltid
+            backend.outstanding -= 1  # Frigör platsen
+            backend.probe_in_flight = False  # Provet är klart
+
+    def _retry_after(self, now: float) -> int:  # Sekunder tills första avstängda backend får provas igen
+        waits = [CIRCUIT_OPEN_SECONDS - (now - b.opened_at) for b in self.backends if b.state == STATE_OPEN]  # Kvar av vilotiden
+        return max(1, math.ceil(min(waits, default=HEALTH_CHECK_INTERVAL)))  # Annars till nästa hälsokontroll
+
+    async def check_health(self) -> None:  # Frågar /v1/models på alla backends
+        client = http_client.get_client()  # Delad klient
+
+        async def check(backend: Backend) -> None:  # Kontrollerar en backend
+            try:  # Fel betyder ohälsosam
+                response = await client.get(backend.models_url, timeout=HEALTH_CHECK_TIMEOUT)  # Lätt anrop utan generering
+                backend.healthy = response.status_code == 200  # Frisk om servern svarar OK
+            except Exception:  # Timeout eller nätverksfel
+                backend.healthy = False  # Markerar som ohälsosam
+
+        await asyncio.gather(*[check(backend) for backend in self.backends])  # Alla samtidigt
+
+    async def _health_loop(self) -> None:  # Kör hälsokontroller med jämna mellanrum
+        while True:  # Tills tasken avbryts
+            await self.check_health()  # Kontrollerar alla backends
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)  # Väntar till nästa kontroll
+
+    def start_health_checks(self) -> None:  # Startar bakgrundskontrollen (anropas i FastAPI lifespan)
+        if self._health_task is None and len(self.backends) > 1:  # Bara meningsfullt med flera backends
+            self._health_task = asyncio.ensure_future(self._health_loop())  # Startar tasken
+
+    async def stop_health_checks(self) -> None:  # Stoppar bakgrundskontrollen
+        if self._health_task is not None:  # Om tasken körs
+            self._health_task.cancel()  # Avbryter den
+            try:  # Väntar tills den avslutats
+                await self._health_task  # Låter avbrottet gå klart
+            except asyncio.CancelledError:  # Förväntat
+                pass
+            self._health_task = None  # Markerar som stoppad
+
+    def stats(self) -> Dict[str, object]:  # Status för alla backends
+        return {  # Strukturerad status
+            "backends": [backend.stats() for backend in self.backends],  # Per backend
+            "total_capacity": self.total_capacity(),  # Summan av kapaciteten
+            "failovers": self.failovers,  # Antal failovers sedan start
+        }  # Slut på status
+
+router = LLMRouter(_load_backends())  # Processens gemensamma router
+tracing.register_gauge("llm_backends_available", "LLM-backends som tar emot anrop", lambda: sum(1 for b in router.backends if b.healthy and b.state != STATE_OPEN))  # Friska och inte avstängda
+tracing.register_gauge("llm_outstanding", "Pågående anrop över alla LLM-backends", lambda: sum(b.outstanding for b in router.backends))  # Belastning
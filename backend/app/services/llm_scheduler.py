@@ -0,0 +1,157 @@
+import asyncio  # Futures för att väcka köade anrop
+import bisect  # Håller kön sorterad på prioritet och ankomstordning
+import itertools  # Löpnummer för rättvis ordning inom samma prioritet
+import math  # Avrundning uppåt för Retry-After
+import os  # Används för att läsa konfiguration från miljövariabler
+import time  # Mäter kötid och genereringstid
+from contextlib import asynccontextmanager  # Gör slot användbar med "async with"
+from typing import AsyncIterator, Dict, List, Optional  # Typangivelser för tydlighet
+
+from app.services import tracing  # Kölängd och pågående genereringar till /metrics
+
+PRIORITY_INTERACTIVE = "interactive"  # Användaren väntar på svaret i webbläsaren
+PRIORITY_BATCH = "batch"  # Bakgrundsjobb som kan vänta
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}  # Lägre siffra betjänas först
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "1"))  # Antal samtidiga genereringar LM Studio klarar
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "16"))  # Max antal väntande anrop totalt
+LLM_BATCH_QUEUE_MAX = int(os.getenv("LLM_BATCH_QUEUE_MAX", "12"))  # Max väntande batch-anrop, resten reserveras för interaktiva
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "300"))  # Avvisar direkt om beräknad väntetid är längre (sekunder)
+LLM_INITIAL_ESTIMATE = float(os.getenv("LLM_INITIAL_ESTIMATE", "60"))  # Startgissning för genereringstid innan vi mätt något
+
+class AdmissionError(Exception):  # Basfel när ett anrop inte släpps in i kön
+    def __init__(self, message: str, retry_after: int):  # Sparar när klienten kan försöka igen
+        super().__init__(message)  # Sätter felmeddelandet
+        self.retry_after = retry_after  # Sekunder till nytt försök (för Retry-After-headern)
+
+class QueueFullError(AdmissionError):  # Kön är full för den här prioriteten
+    pass
+
+class QueueOverloadedError(AdmissionError):  # Kön har plats men väntetiden skulle bli för lång
+    pass
+
+class Ticket:  # Representerar ett anrops plats i kön
+    def __init__(self, priority: str, seq: int):  # Skapar en köbiljett
+        self.priority = priority  # Prioritetsklass
+        self.sort_key = (PRIORITIES[priority], seq)  # Ordning i kön: prioritet först, sedan ankomst
+        self.enqueued_at = time.perf_counter()  # När anropet ställde sig i kön
+        self.started_at: Optional[float] = None  # När anropet fick en plats
+        self.granted: asyncio.Future = asyncio.get_event_loop().create_future()  # Blir klar när platsen tilldelas
+
+    @property
+    def queue_wait(self) -> float:  # Tid i kö i sekunder
+        end = self.started_at if self.started_at is not None else time.perf_counter()  # Slut på kötiden
+        return end - self.enqueued_at  # Returnerar kötiden
+
+class LLMScheduler:  # Begränsar samtidiga LLM-anrop och köar resten med prioritet
+    def __init__(self, max_concurrency: int, max_queue: int, max_batch_queue: int, max_queue_wait: float):  # Skapar schemaläggaren
+        self.max_concurrency = max(1, max_concurrency)  # Minst en samtidig generering
+        self.max_queue = max_queue  # Max antal väntande totalt
+        self.max_batch_queue = min(max_batch_queue, max_queue)  # Max antal väntande batch-anrop
+        self.max_queue_wait = max_queue_wait  # Gräns för beräknad väntetid
+        self.avg_duration = LLM_INITIAL_ESTIMATE  # Glidande medelvärde av genereringstid
+        self._active = 0  # Antal pågående genereringar
+        self._waiting: List[Ticket] = []  # Väntande biljetter sorterade på sort_key
+        self._seq = itertools.count()  # Löpnummer för biljetter
+        self._completed = 0  # Antal färdiga genereringar
+        self._rejected: Dict[str, int] = {"queue_full": 0, "overloaded": 0}  # Antal avvisade anrop per orsak
+
+    def enter(self, priority: str = PRIORITY_INTERACTIVE) -> Ticket:  # Ställer ett anrop i kö eller avvisar det direkt
+        if priority not in PRIORITIES:  # Okänd prioritet
+            raise ValueError(f"Okänd prioritet: {priority}")  # Tydligt fel till anroparen
+        ticket = Ticket(priority, next(self._seq))  # Skapar biljett
+        if self._active < self.max_concurrency and not self._waiting:  # Ledig plats och ingen före i kön
+            self._grant(ticket)  # Släpper in direkt
+            return ticket  # Returnerar biljett som redan är klar
+        queued_same_class = sum(1 for t in self._waiting if t.priority == priority)  # Väntande i samma klass
+        limit = self.max_batch_queue if priority == PRIORITY_BATCH else self.max_queue  # Klassens kögräns
+        if len(self._waiting) >= self.max_queue or queued_same_class >= limit:  # Kön är full
+            self._rejected["queue_full"] += 1  # Räknar avvisning
+            raise QueueFullError("LLM-kön är full, försök igen senare", self._retry_after(len(self._waiting)))  # Snabbt avslag
+        position = self._insert_position(ticket)  # Var biljetten skulle hamna i kön
+        eta = self.estimate_wait(position)  # Beräknad väntetid på den platsen
+        if eta > self.max_queue_wait:  # Skulle ta för lång tid
+            self._rejected["overloaded"] += 1  # Räknar avvisning
+            raise QueueOverloadedError("LM Studio är överbelastad, försök igen senare", self._retry_after(position))  # Snabbt avslag
+        self._waiting.insert(position, ticket)  # Ställer biljetten i kön
+        return ticket  # Returnerar väntande biljett
+
+    async def wait(self, ticket: Ticket) -> None:  # Väntar tills biljetten får en plats
+        try:  # Hanterar avbrott medan vi väntar
+            await asyncio.shield(ticket.granted)  # shield så att ett avbrott inte förstör futuren
+        except asyncio.CancelledError:  # Klienten kopplade ner medan den stod i kö
+            self.release(ticket)  # Lämnar kön (eller platsen om den hann tilldelas)
+            raise  # Skickar vidare avbrottet
+
+    def release(self, ticket: Ticket) -> None:  # Lämnar tillbaka platsen eller tar bort biljetten ur kön
+        if ticket in self._waiting:  # Biljetten hann aldrig få plats
+            self._waiting.remove(ticket)  # Tar bort den ur kön
+            return  # Ingen plats att lämna tillbaka
+        if ticket.started_at is None:  # Redan släppt eller aldrig insläppt
+            return  # Inget att göra
+        duration = time.perf_counter() - ticket.started_at  # Hur länge genereringen tog
+        self.avg_duration = 0.7 * self.avg_duration + 0.3 * duration  # Uppdaterar glidande medelvärde
+        ticket.started_at = None  # Markerar biljetten som släppt så att dubbla anrop ignoreras
+        self._completed += 1  # Räknar färdig generering
+        self._active -= 1  # Frigör platsen
+        while self._waiting and self._active < self.max_concurrency:  # Släpper in nästa i kön
+            self._grant(self._waiting.pop(0))  # Högst prioritet och äldst först
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE) -> AsyncIterator[Ticket]:  # Enkel "async with" runt enter/wait/release
+        ticket = self.enter(priority)  # Ställer i kö eller kastar AdmissionError
+        await self.wait(ticket)  # Väntar på plats
+        try:  # Kör anroparens kod
+            yield ticket  # Ger tillgång till biljetten (t.ex. för kötid)
+        finally:  # Körs alltid
+            self.release(ticket)  # Lämnar tillbaka platsen
+
+    def position(self, ticket: Ticket) -> int:  # Biljettens plats i kön (0 = först, -1 = redan insläppt)
+        try:  # Letar upp biljetten
+            return self._waiting.index(ticket)  # Returnerar index i kön
+        except ValueError:  # Finns inte i kön
+            return -1  # Har redan fått plats eller lämnat kön
+
+    def estimate_wait(self, position: int) -> float:  # Beräknad väntetid i sekunder för en köplats
+        if position < 0:  # Redan insläppt
+            return 0.0  # Ingen väntetid
+        rounds = (position + self._active - self.max_concurrency + 1) / self.max_concurrency  # Antal genereringar före, per plats
+        return max(0.0, rounds) * self.avg_duration  # Omräknat till sekunder
+
+    def stats(self) -> Dict[str, object]:  # Returnerar köstatus
+        waiting_by_class = {name: 0 for name in PRIORITIES}  # Väntande per prioritet
+        for ticket in self._waiting:  # Räknar väntande
+            waiting_by_class[ticket.priority] += 1  # Ökar klassens räknare
+        return {  # Strukturerad status
+            "active": self._active,  # Pågående genereringar
+            "max_concurrency": self.max_concurrency,  # Konfigurerad samtidighet
+            "queued": waiting_by_class,  # Väntande per prioritet
+            "max_queue": self.max_queue,  # Total kögräns
+            "max_batch_queue": self.max_batch_queue,  # Kögräns för batch
+            "avg_generation_seconds": round(self.avg_duration, 1),  # Medeltid per generering
+            "estimated_wait_seconds": round(self.estimate_wait(len(self._waiting)), 1),  # Väntetid för ett nytt anrop
+            "completed": self._completed,  # Färdiga genereringar
+            "rejected": dict(self._rejected),  # Avvisade anrop per orsak
+        }  # Slut på status
+
+    def _grant(self, ticket: Ticket) -> None:  # Tilldelar en plats till en biljett
+        self._active += 1  # Tar en plats
+        ticket.started_at = time.perf_counter()  # Sparar starttid
+        if not ticket.granted.done():  # Väcker den väntande koroutinen
+            ticket.granted.set_result(None)  # Markerar att platsen är tilldelad
+
+    def _insert_position(self, ticket: Ticket) -> int:  # Hittar rätt plats i den sorterade kön
+        keys = [t.sort_key for t in self._waiting]  # Sorteringsnycklar för väntande
+        return bisect.bisect_right(keys, ticket.sort_key)  # Efter alla med samma eller högre prioritet
+
+    def _retry_after(self, position: int) -> int:  # Förslag på Retry-After i hela sekunder
+        return max(1, math.ceil(self.estimate_wait(position)))  # Minst en sekund
+
+scheduler = LLMScheduler(  # Processens gemensamma schemaläggare för alla LLM-anrop
+    LLM_MAX_CONCURRENCY,  # Samtidiga genereringar
+    LLM_QUEUE_MAX,  # Total kögräns
+    LLM_BATCH_QUEUE_MAX,  # Kögräns för batch
+    LLM_MAX_QUEUE_WAIT,  # Gräns för beräknad väntetid
+)  # Slut på schemaläggare
+tracing.register_gauge("llm_active", "Pågående genereringar", lambda: scheduler._active)  # Upptagna platser
+tracing.register_gauge("llm_queued", "Väntande anrop i LLM-kön", lambda: len(scheduler._waiting))  # Kölängd
@@ -1,46 +1,420 @@
-import asyncio  # Används för att köra blocking I/O asynkront
-import requests  # Används för HTTP-anrop till LM Studio
+import asyncio  # Används för att vänta på köplats med timeout
+import json  # Används för att tolka strömmade SSE-chunkar
+import time  # Används för tidsmätning av strömmade svar
+from typing import AsyncIterator, Callable, List, Optional, Set, Tuple  # Typangivelser för tydlighet
+import httpx  # Används för timeout-konfiguration
+from app.services import http_client  # Delad async HTTP-klient med connection pooling
 from app.services import keyword_extractor  # Används för att begränsa tillåtna keywords
+from app.services import llm_router  # Fördelar anrop över flera LM Studio-instanser med failover
+from app.services import llm_scheduler  # Kö med samtidighetsgräns och prioritet framför LM Studio
+from app.services import prompt_budget  # Komprimerar jobbannonsen till en tokenbudget
+from app.services import result_cache  # Persistent cache så att samma CV+jobb inte genereras två gånger
+from app.services import tracing  # Tid per steg, kötid och tokens per sekund
+from app.services.single_flight import SingleFlight  # Slår ihop identiska samtidiga optimeringar
 
-LM_STUDIO_URL = "http://127.0.0.1:1234/v1/chat/completions"  # OpenAI-kompatibel endpoint i LM Studio
-LM_STUDIO_MODEL = "meta-llama-3.1-8b-instruct"  # Modell-id från LM Studio API Usage
+LM_STUDIO_URL = llm_router.DEFAULT_URL  # OpenAI-kompatibel endpoint i LM Studio (standard-backend)
+LM_STUDIO_MODEL = llm_router.DEFAULT_MODEL  # Modell-id i cache-nycklar (llm_router avvisar backends med annan modell)
+LM_STUDIO_TEMPERATURE = 0.1  # Lägre temperatur för mer konsekvent output
+LM_STUDIO_TIMEOUT = httpx.Timeout(120.0, connect=10.0)  # Lång läs-timeout för generering, kort för uppkoppling
+PROMPT_VERSION = "3"  # Höj när prompten ändras så att gamla cachade svar inte återanvänds
+SECTION_PROMPT_VERSION = "2"  # Promptversion för sektionsoptimering
+LANGUAGE_PROMPT_VERSION = "1"  # Promptversion för generering av ett språk i taget
+LANGUAGE_SV = "sv"  # Svenska
+LANGUAGE_EN = "en"  # Engelska
+LANGUAGE_BOTH = "both"  # Båda språken
+LANGUAGE_MARKERS = {LANGUAGE_SV: "=== SVENSKA CV ===", LANGUAGE_EN: "=== ENGLISH CV ==="}  # Samma markörer som den dubbla prompten
+LANGUAGE_NAMES = {LANGUAGE_SV: "svenska", LANGUAGE_EN: "engelska"}  # Språkets namn i prompten
+QUEUE_STATUS_INTERVAL = 2.0  # Sekunder mellan köstatus-händelser i strömmen
+CV_GOAL_RULES = (  # Mål och struktur för prompterna som skriver om hela CV:t
+    "Optimera detta CV för jobbannonsen nedan och gör det välskrivet, professionellt och ATS-vänligt. "  # Anger mål för kvalitet
+    "Behåll exakt samma sektioner, rubriker och ordning som i CV:t. "  # Tvingar samma struktur
+)  # Slut på regler
+FACT_RULES = (  # Faktaregler som delas av alla prompter (hela CV:t, ett språk och en sektion)
+    "Skriv ENDAST om formuleringar för bättre flyt, stavning och tydlighet. "  # Tillåter förbättring utan förändring av fakta
+    "Skapa INTE nya namn, företag, datum, titlar eller erfarenheter. "  # Förbjuder påhittad information
+    "Lägg INTE till nya tekniker som saknas i CV:t. "  # Förhindrar stack-byte
+    "Skriv INTE placeholders som [Inget ...]. "  # Förbjuder placeholder-text
+)  # Slut på regler
+KEYWORD_RULE = "Använd keywords från jobbannonsen endast om de redan finns i CV:t. "  # Hindrar att nya ord läggs till
+FORMAT_RULE = "Rubriker ska avslutas med ':' och bullets ska börja med '- '.\n\n"  # Standardiserar format för DOCX
 
-async def optimize_cv(cv_text: str, job_text: str) -> str:  # Optimerar CV med hjälp av LM Studio
-    allowed_keywords = keyword_extractor.extract_keywords(cv_text, top_n=80)  # Hämtar tillåtna ord från CV:t
-    allowed_text = ", ".join(allowed_keywords)  # Skapar en kommaseparerad lista för prompten
+_optimize_flights = SingleFlight()  # Delade pågående optimeringar, nyckel = cache-nyckel
+
+class IncompleteStreamError(RuntimeError):  # Strömmen tog slut utan text eller utan slutmarkör
+    pass
+
+class CVContext:  # CV-sidans förberedda promptdelar, återanvändbara över många jobbannonser
+    def __init__(self, cv_text: str):  # Förbereder allt som bara beror på CV:t
+        self.cv_text = cv_text  # Original-CV:t
+        allowed_keywords = keyword_extractor.extract_keywords(cv_text, top_n=80)  # Hämtar tillåtna ord från CV:t
+        self.allowed_text = ", ".join(allowed_keywords)  # Skapar en kommaseparerad lista för prompten
+        self.prompt_prefix = (  # Instruktioner och CV först, så att LM Studio kan återanvända prefixet mellan jobb
+            CV_GOAL_RULES  # Mål och struktur
+            + FACT_RULES  # Inga påhittade fakta
+            + "Behåll språk per sektion (översätt inte mellan svenska/engelska). "  # Låser språket
+            + KEYWORD_RULE  # Bara keywords som redan finns
+            + f"Tillåtna keywords från CV:t: {self.allowed_text}. "  # Ger explicit lista över tillåtna ord
+            + "Skapa TVÅ versioner av CV:t: först svenska, sedan engelska. "  # Kräver dubbel output
+            + "Format: börja med raden '=== SVENSKA CV ===' och därefter '=== ENGLISH CV ==='. "  # Tydliga markörer för versioner
+            + "Returnera ENDAST text utan markdown. "  # Kräver ren text utan markdown
+            + FORMAT_RULE  # Standardiserar format för DOCX
+            + f"CV:\n{cv_text}\n\n"  # Lägger in CV-texten
+        )  # Slut på prefix
+        self.language_prefix = (  # Prefix för ett språk i taget; språket anges sist så att båda språken delar prefix
+            CV_GOAL_RULES  # Mål och struktur
+            + FACT_RULES  # Inga påhittade fakta
+            + KEYWORD_RULE  # Bara keywords som redan finns
+            + f"Tillåtna keywords från CV:t: {self.allowed_text}. "  # Ger explicit lista över tillåtna ord
+            + "Returnera ENDAST text utan markdown. "  # Kräver ren text utan markdown
+            + FORMAT_RULE  # Standardiserar format för DOCX
+            + f"CV:\n{cv_text}\n\n"  # Lägger in CV-texten
+        )  # Slut på prefix
+        self.job_budget = prompt_budget.job_token_budget(self.prompt_prefix)  # Tokens som jobbannonsen får plats med (det längre prefixet)
+
+    def fit_job(self, job_text: str) -> prompt_budget.CompressedPosting:  # Jobbannonsen komprimerad till CV:ts budget
+        return prompt_budget.compress_job_posting(job_text, self.job_budget)  # Cachad per (jobbannons, budget)
+
+def prompt_report(cv_text: str, job_text: str, context: Optional[CVContext] = None) -> dict:  # Tokenrapport utan LLM-anrop
+    context = context or CVContext(cv_text)  # CV-kontext med budget
+    compressed = context.fit_job(job_text)  # Samma komprimering som prompten använder
+    return {  # Strukturerad rapport
+        **compressed.report(),  # Tokens före och efter komprimering
+        "job_token_budget": context.job_budget,  # Budget för jobbannonsen
+        "prompt_tokens_estimate": prompt_budget.estimate_tokens(context.prompt_prefix) + compressed.tokens_after,  # Hela promptens storlek
+    }  # Slut på rapport
+
+def optimize_cache_key(cv_text: str, job_text: str) -> str:  # Skapar cache-nyckel för en optimering
+    return result_cache.make_key(  # Hashar allt som påverkar modellens svar
+        "optimize",  # Namnrymd för hela-CV-optimering
+        result_cache.normalize_text_for_key(cv_text),  # Normaliserad CV-text
+        result_cache.normalize_text_for_key(job_text),  # Normaliserad jobbannons
+        LM_STUDIO_MODEL,  # Modell-id
+        PROMPT_VERSION,  # Promptversion
+        LM_STUDIO_TEMPERATURE,  # Temperatur
+    )  # Slut på nyckel
+
+async def optimize_cv(  # Optimerar CV, med cache, single-flight och kö framför LM Studio
+    cv_text: str,  # CV-texten som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+    context: Optional[CVContext] = None,  # Förberedd CV-kontext (återanvänds i batch)
+) -> str:  # Returnerar optimerad text
+    cache_key = optimize_cache_key(cv_text, job_text)  # Räknar ut innehållsbaserad nyckel
+    content, _ = await _optimize_flights.run(  # Identiska samtidiga anrop delar på ett uppströmsanrop
+        cache_key,  # Samma nyckel som cachen använder
+        lambda: _optimize_cached(  # Arbetet som körs en gång per nyckel
+            cache_key,  # Cache-nyckel
+            lambda: _build_payload(context or CVContext(cv_text), job_text),  # Payload byggs bara vid cache-miss
+            priority,  # Prioritetsklass
+        ),  # Slut på arbete
+    )  # Slut på delat anrop
+    return content  # Returnerar den optimerade CV-texten
+
+def languages_for(language: str) -> List[str]:  # Språk som ska genereras för ett språkval
+    return [LANGUAGE_SV, LANGUAGE_EN] if language == LANGUAGE_BOTH else [language]  # Svenska först, som i den dubbla prompten
+
+def language_cache_key(cv_text: str, job_text: str, language: str) -> str:  # Skapar cache-nyckel för ett språk
+    return result_cache.make_key(  # Varje språk cachas för sig
+        "optimize_language",  # Namnrymd för generering per språk
+        result_cache.normalize_text_for_key(cv_text),  # Normaliserad CV-text
+        result_cache.normalize_text_for_key(job_text),  # Normaliserad jobbannons
+        language,  # Språket
+        LM_STUDIO_MODEL,  # Modell-id
+        LANGUAGE_PROMPT_VERSION,  # Promptversion
+        LM_STUDIO_TEMPERATURE,  # Temperatur
+    )  # Slut på nyckel
+
+def _with_marker(content: str, language: str) -> str:  # Ser till att texten börjar med språkets markör
+    text = content.strip()  # Tar bort blanksteg runt svaret
+    marker = LANGUAGE_MARKERS[language]  # Markören för språket
+    return text if text.startswith(marker) else f"{marker}\n{text}"  # Lägger till markören om modellen utelämnade den
+
+async def optimize_cv_language(  # Optimerar CV:t på ett språk, cachat per språk
+    cv_text: str,  # CV-texten som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    language: str,  # "sv" eller "en"
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+    context: Optional[CVContext] = None,  # Förberedd CV-kontext (delas mellan språken)
+) -> Tuple[str, bool]:  # Returnerar text och om den kom från cachen
+    cache_key = language_cache_key(cv_text, job_text, language)  # Språkets nyckel
+    content, cached = await _optimize_flights.run(  # Samma språk för samma CV och jobb genereras bara en gång åt gången
+        cache_key,  # Språkets cache-nyckel
+        lambda: _optimize_cached(  # Arbetet som körs en gång per nyckel
+            cache_key,  # Cache-nyckel
+            lambda: _build_language_payload(context or CVContext(cv_text), job_text, language),  # Payload byggs bara vid cache-miss
+            priority,  # Prioritetsklass
+        ),  # Slut på arbete
+    )  # Slut på delat anrop
+    return _with_marker(content, language), cached  # Text med språkmarkör
+
+async def optimize_cv_languages(  # Optimerar CV:t per språk, språken genereras samtidigt
+    cv_text: str,  # CV-texten som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    language: str = LANGUAGE_BOTH,  # "sv", "en" eller "both"
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+) -> str:  # Returnerar texten i samma format som den dubbla prompten
+    context = CVContext(cv_text)  # CV-kontexten byggs en gång för alla språk
+    results = await asyncio.gather(*[  # Ett anrop per språk; kön och routern kör dem parallellt om det finns plats
+        optimize_cv_language(cv_text, job_text, lang, priority, context) for lang in languages_for(language)
+    ])  # Slut på anrop
+    return "\n\n".join(text for text, _ in results)  # Svenska följt av engelska
+
+def section_cache_key(section_text: str, job_text: str) -> str:  # Skapar cache-nyckel för en enskild CV-sektion
+    return result_cache.make_key(  # Nyckeln beror bara på sektionen och jobbet, inte resten av CV:t
+        "section",  # Namnrymd för sektionsoptimering
+        result_cache.make_key(result_cache.normalize_text_for_key(section_text)),  # Sektionens hash
+        result_cache.make_key(result_cache.normalize_text_for_key(job_text)),  # Jobbannonsens hash
+        LM_STUDIO_MODEL,  # Modell-id
+        SECTION_PROMPT_VERSION,  # Promptversion för sektioner
+        LM_STUDIO_TEMPERATURE,  # Temperatur
+    )  # Slut på nyckel
+
+async def optimize_section(  # Optimerar en enskild CV-sektion, cachad per (sektion, jobb)
+    context: CVContext,  # CV-kontext med tillåtna keywords för hela CV:t
+    section_text: str,  # Sektionen (rubrik + innehåll) som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+) -> Tuple[str, bool]:  # Returnerar optimerad sektion och om den kom från cachen
+    cache_key = section_cache_key(section_text, job_text)  # Räknar ut sektionens nyckel
+    return await _optimize_flights.run(  # Samma sektion mot samma jobb genereras bara en gång åt gången
+        cache_key,  # Sektionens cache-nyckel
+        lambda: _optimize_cached(  # Arbetet som körs en gång per nyckel
+            cache_key,  # Cache-nyckel
+            lambda: _build_section_payload(context, section_text, job_text),  # Payload byggs bara vid cache-miss
+            priority,  # Prioritetsklass
+        ),  # Slut på arbete
+    )  # Slut på delat anrop
+
+def inflight_stats() -> dict:  # Returnerar statistik för pågående delade optimeringar
+    return _optimize_flights.stats()  # Hämtar räknare från single-flight-lagret
+
+async def _optimize_cached(  # Läser cache eller genererar och sparar
+    cache_key: str,  # Cache-nyckel
+    build_payload: Callable[[], dict],  # Bygger payload vid cache-miss
+    priority: str,  # Prioritetsklass i LLM-kön
+) -> Tuple[str, bool]:  # Returnerar text och om den kom från cachen
+    cached = await result_cache.lookup(cache_key)  # Försöker hämta tidigare generering
+    if cached is not None:  # Om resultatet redan finns
+        return cached, True  # Returnerar direkt utan nytt LLM-anrop
+    with tracing.span("prompt_build"):  # Tid för keywords, komprimering och prompt
+        payload = build_payload()  # Bygger payload först vid cache-miss
+    content = await _complete(payload, priority)  # Genererar nytt svar via LM Studio
+    await result_cache.store(cache_key, content)  # Sparar svaret för nästa export
+    return content, False  # Returnerar nygenererad text
+
+def _chat_payload(user_prompt: str) -> dict:  # Bygger chat/completions-payload kring en användarprompt
     system_prompt = "Du är en professionell CV-optimerare som skriver ATS-vänliga CV:n."  # Systeminstruktion för modellen
-    user_prompt = (  # Bygger användarprompt med både CV och jobbannons
-        "Optimera detta CV för jobbannonsen nedan och gör det välskrivet, professionellt och ATS-vänligt. "  # Anger mål för kvalitet
-        "Behåll exakt samma sektioner, rubriker och ordning som i CV:t. "  # Tvingar samma struktur
-        "Skriv ENDAST om formuleringar för bättre flyt, stavning och tydlighet. "  # Tillåter förbättring utan förändring av fakta
-        "Skapa INTE nya namn, företag, datum, titlar eller erfarenheter. "  # Förbjuder påhittad information
-        "Lägg INTE till nya tekniker som saknas i CV:t. "  # Förhindrar stack-byte
-        "Skriv INTE placeholders som [Inget ...]. "  # Förbjuder placeholder-text
-        "Behåll språk per sektion (översätt inte mellan svenska/engelska). "  # Låser språket
-        "Använd keywords från jobbannonsen endast om de redan finns i CV:t. "  # Hindrar att nya ord läggs till
-        f"Tillåtna keywords från CV:t: {allowed_text}. "  # Ger explicit lista över tillåtna ord
-        "Skapa TVÅ versioner av CV:t: först svenska, sedan engelska. "  # Kräver dubbel output
-        "Format: börja med raden '=== SVENSKA CV ===' och därefter '=== ENGLISH CV ==='. "  # Tydliga markörer för versioner
-        "Returnera ENDAST text utan markdown. "  # Kräver ren text utan markdown
-        "Rubriker ska avslutas med ':' och bullets ska börja med '- '.\n\n"  # Standardiserar format för DOCX
-        f"JOBBANNONS:\n{job_text}\n\n"  # Lägger in jobbannonsens text
-        f"CV:\n{cv_text}\n"  # Lägger in CV-texten
-    )  # Slut på prompten
     payload = {  # Skapar payload för OpenAI-kompatibel chat/completions
         "model": LM_STUDIO_MODEL,  # Väljer modellen i LM Studio
         "messages": [  # Skapar meddelandelista för chat-formatet
             {"role": "system", "content": system_prompt},  # Systemmeddelande för modellens beteende
             {"role": "user", "content": user_prompt},  # Användarmeddelande med uppgiften
         ],  # Slut på meddelandelistan
-        "temperature": 0.1,  # Lägre temperatur för mer konsekvent output
+        "temperature": LM_STUDIO_TEMPERATURE,  # Lägre temperatur för mer konsekvent output
     }  # Slut på payload
-    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
-    response = await loop.run_in_executor(  # Kör blocking requests i separat tråd
-        None,  # Använder default threadpool
-        lambda: requests.post(LM_STUDIO_URL, json=payload, timeout=120.0),  # Skickar POST-anrop till LM Studio
-    )  # Slut på async körning
-    response.raise_for_status()  # Kastar fel om HTTP-status inte är OK
+    return payload  # Returnerar färdig payload
+
+def _build_payload(context: CVContext, job_text: str) -> dict:  # Bygger payload för optimering av hela CV:t
+    compressed = context.fit_job(job_text)  # Kravbärande meningar inom tokenbudgeten
+    prompt_budget.record(compressed)  # Räknar sparade tokens för faktiska anrop
+    return _chat_payload(context.prompt_prefix + f"JOBBANNONS:\n{compressed.text}\n")  # Delat CV-prefix följt av jobbannonsen
+
+def _build_language_payload(context: CVContext, job_text: str, language: str) -> dict:  # Bygger payload för ett språk
+    compressed = context.fit_job(job_text)  # Samma komprimerade jobbannons för båda språken
+    prompt_budget.record(compressed)  # Räknar sparade tokens för faktiska anrop
+    return _chat_payload(  # Språkinstruktionen sist, efter det gemensamma prefixet
+        context.language_prefix + f"JOBBANNONS:\n{compressed.text}\n\n"  # Delat CV-prefix följt av jobbannonsen
+        f"Skriv hela CV:t på {LANGUAGE_NAMES[language]} (översätt sektioner som är på ett annat språk). "  # Ett språk per anrop
+        f"Börja med raden '{LANGUAGE_MARKERS[language]}'.\n"  # Samma markör som den dubbla prompten
+    )  # Slut på payload
+
+def _build_section_payload(context: CVContext, section_text: str, job_text: str) -> dict:  # Bygger payload för en sektion
+    compressed = context.fit_job(job_text)  # Samma komprimerade jobbannons för alla sektioner
+    prompt_budget.record(compressed)  # Räknar sparade tokens för faktiska anrop
+    user_prompt = (  # Samma regler som för hela CV:t, men bara för en sektion och ett språk
+        "Optimera denna sektion av ett CV för jobbannonsen nedan och gör den välskriven, professionell och ATS-vänlig. "  # Anger mål för kvalitet
+        + "Behåll sektionens rubrik, struktur och ordning. "  # Tvingar samma struktur
+        + FACT_RULES  # Inga påhittade fakta
+        + "Behåll sektionens språk (översätt inte). "  # Låser språket
+        + f"Tillåtna keywords från CV:t: {context.allowed_text}. "  # Ger explicit lista över tillåtna ord
+        + "Returnera ENDAST den omskrivna sektionen som text utan markdown. "  # Kräver ren text utan markdown
+        + FORMAT_RULE  # Standardiserar format för DOCX
+        + f"SEKTION:\n{section_text}\n\n"  # Lägger in sektionen
+        + f"JOBBANNONS:\n{compressed.text}\n"  # Lägger in jobbannonsen
+    )  # Slut på prompten
+    return _chat_payload(user_prompt)  # Returnerar färdig payload
+
+def _backend_payload(payload: dict, backend: llm_router.Backend) -> dict:  # Payload med modell-id för just den backenden
+    return {**payload, "model": backend.model}  # Kopia, originalet återanvänds vid failover
+
+async def _post(payload: dict) -> httpx.Response:  # Skickar payload till minst belastade backend, med failover vid timeout och 5xx
+    client = http_client.get_client()  # Delad klient, återanvänder keep-alive-anslutningar
+    tried: Set[str] = set()  # Backends som redan provats för anropet
+    last_failure: Optional[Exception] = None  # Senaste felet (visas om alla misslyckas)
+    while True:  # Tills en backend svarar eller alla provats
+        try:  # Timeout, nätverksfel och 5xx leder till nästa backend
+            async with llm_router.router.lease(tried, last_failure) as backend:  # Väljer backend (eller kastar NoBackendAvailableError)
+                async with http_client.host_slot(backend.url):  # Begränsar samtidiga anrop mot värden
+                    response = await client.post(backend.url, json=_backend_payload(payload, backend), timeout=LM_STUDIO_TIMEOUT)  # Skickar POST-anrop utan att låna en tråd
+                response.raise_for_status()  # Kastar fel om HTTP-status inte är OK
+                return response  # Lyckat svar
+        except llm_router.BackendFailure as e:  # Backenden svarade inte eller gav serverfel
+            last_failure = e  # Sparar felet och provar nästa
+
+async def _complete(payload: dict, priority: str) -> str:  # Skickar en payload till LM Studio genom kön
+    async with llm_scheduler.scheduler.slot(priority) as ticket:  # Väntar på plats i LLM-kön (eller avvisas direkt)
+        queue_wait = ticket.queue_wait  # Tid i kö (läses innan platsen släpps)
+        started = time.perf_counter()  # Starttid för genereringen
+        with tracing.span("llm_generate"):  # Tid för genereringen
+            response = await _post(payload)  # Minst belastade backend, med failover
+        generation_seconds = time.perf_counter() - started  # Genereringstid
     data = response.json()  # Tolkar JSON-svaret
     content = data["choices"][0]["message"]["content"]  # Plockar ut textsvaret från modellen
-    return content  # Returnerar den optimerade CV-texten
+    completion_tokens = (data.get("usage") or {}).get("completion_tokens") or prompt_budget.estimate_tokens(content)  # Faktiska tokens eller uppskattning
+    tracing.observe_llm(queue_wait, generation_seconds, completion_tokens)  # Kötid och tokens per sekund
+    return content  # Returnerar textsvaret
+
+async def stream_optimize_cv(  # Strömmar tokens från LM Studio medan de genereras
+    cv_text: str,  # CV-texten som ska optimeras
+    job_text: str,  # Jobbannonsen som CV:t anpassas till
+    priority: str = llm_scheduler.PRIORITY_INTERACTIVE,  # Prioritetsklass i LLM-kön
+    language: str = LANGUAGE_BOTH,  # "sv" eller "en" strömmar bara det språket
+) -> AsyncIterator[dict]:  # Händelser: queued, token och done
+    started = time.perf_counter()  # Starttid för tidsmätning
+    single_language = language != LANGUAGE_BOTH  # Ett språk i stället för den dubbla prompten
+    if single_language:  # Samma nyckel som optimize_cv_language
+        cache_key = language_cache_key(cv_text, job_text, language)  # Språkets nyckel
+    else:  # Båda språken i en generering
+        cache_key = optimize_cache_key(cv_text, job_text)  # Samma nyckel som icke-strömmande optimering
+
+    def build_payload(context: CVContext) -> dict:  # Samma prompt som icke-strömmande anrop med samma nyckel
+        if single_language:  # Ett språk
+            return _build_language_payload(context, job_text, language)  # Bygger prompt för språket
+        return _build_payload(context, job_text)  # Båda språken
+
+    if _optimize_flights.in_flight(cache_key):  # Samma optimering pågår redan (ström eller /optimize)
+        content, _ = await _optimize_flights.run(  # Väntar på den i stället för att generera en gång till
+            cache_key,  # Samma nyckel som cachen använder
+            lambda: _optimize_cached(cache_key, lambda: build_payload(CVContext(cv_text)), priority),  # Används bara om den pågående ger upp
+        )  # Slut på delat anrop
+        for event in _ready_events(content, language, started, shared=True):  # Hela texten direkt
+            yield event  # Vidare till klienten
+        return  # Inget eget LLM-anrop
+    flight = _optimize_flights.lead(cache_key)  # Registreras innan första await, så att samtidiga anrop alltid hittar den
+    try:  # Väntande startar om själva om strömmen avbryts eller misslyckas
+        cached = await result_cache.lookup(cache_key)  # Kollar om resultatet redan finns
+        if cached is not None:  # Cache-träff: skicka hela texten direkt
+            flight.set_result((cached, True))  # Väntande får samma text
+            for event in _ready_events(cached, language, started, shared=False):  # Hela texten direkt
+                yield event  # Vidare till klienten
+            return  # Inget LLM-anrop behövs
+        async for event in _stream_generation(cache_key, build_payload, priority, started, cv_text, job_text):  # Kö, tokens och slut-händelse
+            if event["type"] == "done":  # Texten är sparad i cachen
+                flight.set_result((event.pop("content"), False))  # Delar texten med väntande anrop
+            yield event  # Vidare till klienten
+    finally:  # Körs även när klienten kopplar ner
+        _optimize_flights.abandon(cache_key, flight)  # Ingen effekt om resultatet redan satts
+
+def _ready_events(content: str, language: str, started: float, shared: bool) -> List[dict]:  # Händelser för text som inte genererades av strömmen
+    if language != LANGUAGE_BOTH:  # Samma text som icke-strömmande anrop returnerar
+        content = _with_marker(content, language)  # Med språkmarkör
+    return [  # Hela texten som en enda token-händelse och en slut-händelse
+        {"type": "token", "content": content},  # Hela texten
+        {  # Slut-händelse med mätvärden
+            "type": "done",  # Markerar att strömmen är klar
+            "cached": True,  # Svaret genererades inte av den här strömmen
+            "shared": shared,  # Delad med en samtidig generering i stället för cachen
+            "length": len(content),  # Antal tecken i svaret
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),  # Total tid i millisekunder
+        },  # Slut på slut-händelse
+    ]  # Slut på händelser
 
+async def _stream_generation(  # Genererar via LM Studio med strömning och sparar fullständiga svar
+    cache_key: str,  # Cache-nyckel för resultatet
+    build_payload: Callable[[CVContext], dict],  # Bygger payload för CV-kontexten
+    priority: str,  # Prioritetsklass i LLM-kön
+    started: float,  # Starttid för hela anropet
+    cv_text: str,  # CV-texten (för promptrapporten)
+    job_text: str,  # Jobbannonsen (för promptrapporten)
+) -> AsyncIterator[dict]:  # Händelser: queued, token och done (done innehåller hela texten)
+    with tracing.span("prompt_build"):  # Tid för keywords, komprimering och prompt
+        context = CVContext(cv_text)  # CV-kontext med tokenbudget
+        payload = build_payload(context)  # Bygger prompt och payload
+    payload["stream"] = True  # Ber LM Studio skicka tokens löpande (SSE)
+    payload["stream_options"] = {"include_usage": True}  # Ber om token-räkning i sista chunken
+    parts: List[str] = []  # Samlar genererade textbitar för cache
+    chunk_count = 0  # Antal mottagna textbitar (approximerar tokens om usage saknas)
+    usage: Optional[dict] = None  # Token-räkning från LM Studio om den skickas
+    first_token_at: Optional[float] = None  # Tidpunkt för första token
+    finished = False  # Om LM Studio skickade [DONE]
+    ticket = llm_scheduler.scheduler.enter(priority)  # Ställer anropet i LLM-kön (eller avvisas direkt)
+    try:  # Säkerställer att platsen alltid lämnas tillbaka
+        while not ticket.granted.done():  # Så länge vi står i kö
+            position = llm_scheduler.scheduler.position(ticket)  # Aktuell plats i kön
+            yield {  # Köstatus till klienten
+                "type": "queued",  # Markerar köstatus
+                "position": position + 1,  # Plats i kön (1 = näst på tur)
+                "eta_seconds": round(llm_scheduler.scheduler.estimate_wait(position), 1),  # Beräknad väntetid
+            }  # Slut på köhändelse
+            await asyncio.wait({ticket.granted}, timeout=QUEUE_STATUS_INTERVAL)  # Väntar på plats eller nästa statusintervall
+        await llm_scheduler.scheduler.wait(ticket)  # Bekräftar tilldelad plats
+        queue_wait = ticket.queue_wait  # Tid i kö för slut-händelsen
+        client = http_client.get_client()  # Delad klient, återanvänder keep-alive-anslutningar
+        tried: Set[str] = set()  # Backends som redan provats
+        last_failure: Optional[Exception] = None  # Senaste felet (visas om alla misslyckas)
+        while True:  # Failover fram till första token, därefter kan strömmen inte flyttas
+            try:  # Timeout, nätverksfel och 5xx före första token leder till nästa backend
+                async with llm_router.router.lease(tried, last_failure) as backend:  # Minst belastade backend
+                    async with http_client.host_slot(backend.url):  # Begränsar samtidiga anrop mot värden
+                        async with client.stream("POST", backend.url, json=_backend_payload(payload, backend), timeout=LM_STUDIO_TIMEOUT) as response:  # Öppnar strömmande POST-anrop
+                            response.raise_for_status()  # Kastar fel om HTTP-status inte är OK
+                            async for line in response.aiter_lines():  # Läser SSE-rader allteftersom de kommer
+                                if not line.startswith("data:"):  # Hoppar över tomma rader och kommentarer
+                                    continue  # Går vidare till nästa rad
+                                data = line[len("data:"):].strip()  # Plockar ut JSON-delen
+                                if data == "[DONE]":  # OpenAI-formatets slutmarkör
+                                    finished = True  # Hela svaret har tagits emot
+                                    break  # Avslutar läsningen
+                                chunk = json.loads(data)  # Tolkar JSON-chunken
+                                if chunk.get("usage"):  # Sista chunken kan innehålla token-räkning
+                                    usage = chunk["usage"]  # Sparar token-räkningen
+                                choices = chunk.get("choices") or []  # Usage-chunken saknar choices
+                                if not choices:  # Om det inte finns någon text i chunken
+                                    continue  # Går vidare till nästa rad
+                                content = (choices[0].get("delta") or {}).get("content")  # Plockar ut ny text
+                                if not content:  # Roll-chunkar och tomma deltan saknar text
+                                    continue  # Går vidare till nästa rad
+                                if first_token_at is None:  # Första riktiga token
+                                    first_token_at = time.perf_counter()  # Sparar tid till första token
+                                chunk_count += 1  # Räknar textbitar
+                                parts.append(content)  # Sparar texten för cache
+                                yield {"type": "token", "content": content}  # Skickar token vidare till klienten
+                break  # Strömmen är klar
+            except llm_router.BackendFailure as e:  # Backenden föll bort
+                if parts:  # Text har redan skickats till klienten
+                    raise  # Kan inte börja om på en annan backend
+                last_failure = e  # Provar nästa backend
+    finally:  # Körs även om klienten kopplar ner mitt i strömmen
+        llm_scheduler.scheduler.release(ticket)  # Lämnar tillbaka platsen eller lämnar kön
+    content = "".join(parts)  # Sätter ihop hela svaret
+    if not finished or not content:  # Avbruten ström eller tomt svar får aldrig hamna i cachen
+        raise IncompleteStreamError("LM Studio avslutade strömmen utan fullständigt svar")  # Rapporteras som felhändelse
+    await result_cache.store(cache_key, content)  # Sparar svaret så att DOCX/PDF-export blir direkt
+    total_seconds = time.perf_counter() - started  # Total tid i sekunder
+    completion_tokens = (usage or {}).get("completion_tokens", chunk_count)  # Faktiska tokens eller uppskattning
+    generation_seconds = total_seconds - ((first_token_at or started) - started)  # Tid från första token till slut
+    tracing.observe_llm(queue_wait, generation_seconds, completion_tokens)  # Kötid och tokens per sekund
+    yield {  # Slut-händelse med mätvärden
+        "type": "done",  # Markerar att strömmen är klar
+        "content": content,  # Hela texten (tas bort innan händelsen skickas till klienten)
+        "cached": False,  # Svaret genererades nu
+        "shared": False,  # Genererades av den här strömmen
+        "length": len(content),  # Antal tecken i svaret
+        "prompt_tokens": (usage or {}).get("prompt_tokens"),  # Antal tokens i prompten om känt
+        "completion_tokens": completion_tokens,  # Antal genererade tokens
+        "time_to_first_token_ms": round(((first_token_at or started) - started) * 1000, 1),  # Tid till första token
+        "queue_wait_ms": round(queue_wait * 1000, 1),  # Tid i LLM-kön
+        "total_ms": round(total_seconds * 1000, 1),  # Total tid i millisekunder
+        "tokens_per_second": round(completion_tokens / generation_seconds, 2) if generation_seconds > 0 else None,  # Genereringshastighet
+        "prompt_budget": prompt_report(cv_text, job_text, context),  # Tokens före och efter komprimering av jobbannonsen
+    }  # Slut på slut-händelse
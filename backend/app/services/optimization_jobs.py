@@ -0,0 +1,165 @@
+import asyncio  # Bakgrunds-tasks och trådpool för SQLite
+import os  # Läser konfiguration från miljövariabler
+import sqlite3  # Lokal databas så att jobb överlever en omstart av uvicorn
+import threading  # Lås så att samtidiga skrivningar inte krockar
+import time  # Tidsstämplar för jobbens tider
+import uuid  # Unika jobb-id:n
+from typing import Dict, Optional  # Typangivelser för tydlighet
+
+from app.services import cv_sections  # Sektionsvis optimering
+from app.services import cv_storage  # Återanvänder DATA_DIR så att databasen hamnar bredvid övrig data
+from app.services import llm_scheduler  # Köavslag hanteras genom att försöka igen senare
+from app.services import lm_studio_client  # Själva optimeringen (med cache och kö)
+
+JOBS_DB_FILE = cv_storage.DATA_DIR / "optimization_jobs.sqlite3"  # SQLite-fil för jobbstatus och resultat
+JOB_MAX_ADMISSION_ATTEMPTS = int(os.getenv("JOB_MAX_ADMISSION_ATTEMPTS", "20"))  # Köavslag innan jobbet ges upp (räknas även över omstarter)
+
+STATUS_QUEUED = "queued"  # Jobbet väntar på att starta
+STATUS_RUNNING = "running"  # Jobbet genereras just nu
+STATUS_DONE = "done"  # Resultatet finns att hämta
+STATUS_FAILED = "failed"  # Genereringen misslyckades
+STATUS_CANCELLED = "cancelled"  # Avbrutet av klienten
+
+_lock = threading.Lock()  # Serialiserar åtkomst till databasen mellan trådar
+_tasks: Dict[str, asyncio.Task] = {}  # Jobb-id -> bakgrunds-task (referens så att den inte skräpsamlas, och för avbrott)
+_COLUMNS = {"mode": "TEXT NOT NULL DEFAULT 'full'", "language": "TEXT NOT NULL DEFAULT 'both'", "attempts": "INTEGER NOT NULL DEFAULT 0"}  # Kolumner som lagts till efter första versionen
+
+def _connect() -> sqlite3.Connection:  # Öppnar databasen och skapar tabellen vid behov
+    cv_storage.ensure_data_dir()  # Säkerställer att data-mappen finns
+    conn = sqlite3.connect(JOBS_DB_FILE)  # Öppnar SQLite-filen
+    conn.row_factory = sqlite3.Row  # Rader kan läsas som dict
+    conn.execute(  # Skapar jobbtabellen om den saknas
+        "CREATE TABLE IF NOT EXISTS optimization_jobs ("
+        "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority TEXT NOT NULL, "
+        "cv_text TEXT NOT NULL, job_text TEXT NOT NULL, result TEXT, error TEXT, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )  # Slut på tabelldefinition
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(optimization_jobs)")}  # Kolumner i en äldre databas
+    for column, definition in _COLUMNS.items():  # Lägger till saknade kolumner
+        if column not in existing:  # Databasen skapades av en äldre version
+            conn.execute(f"ALTER TABLE optimization_jobs ADD COLUMN {column} {definition}")  # Gamla jobb får standardvärden
+    return conn  # Returnerar öppen anslutning
+
+def _execute_sync(sql: str, params: tuple = ()) -> None:  # Kör en skrivande SQL-sats synkront
+    with _lock:  # Låser databasen under skrivningen
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            conn.execute(sql, params)  # Kör satsen
+            conn.commit()  # Sparar ändringen
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _fetch_sync(sql: str, params: tuple = ()) -> list:  # Kör en läsande SQL-sats synkront
+    with _lock:  # Låser för konsekvent läsning
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]  # Returnerar rader som dicts
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+async def _execute(sql: str, params: tuple = ()) -> None:  # Skrivning utan att blockera event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    await loop.run_in_executor(None, lambda: _execute_sync(sql, params))  # Kör i trådpool
+
+async def _fetch(sql: str, params: tuple = ()) -> list:  # Läsning utan att blockera event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    return await loop.run_in_executor(None, lambda: _fetch_sync(sql, params))  # Kör i trådpool
+
+async def optimize(cv_text: str, job_text: str, mode: str, language: str, priority: str) -> str:  # Samma val av optimering som /optimize
+    if mode == "sections":  # Sektionsvis optimering med cache per sektion
+        result = await cv_sections.optimize_sections(cv_text, job_text, priority)  # Bara ändrade sektioner genereras
+        return result["optimized_cv"]  # Sammanfogad text
+    if mode == "languages" or language != lm_studio_client.LANGUAGE_BOTH:  # Ett anrop per språk, bara valda språk
+        return await lm_studio_client.optimize_cv_languages(cv_text, job_text, language, priority)  # Språken genereras samtidigt
+    return await lm_studio_client.optimize_cv(cv_text, job_text, priority)  # Delad (cachad) generering
+
+def _spawn(job_id: str) -> None:  # Startar ett jobb i bakgrunden
+    task = asyncio.ensure_future(_run(job_id))  # Skapar bakgrunds-task
+    _tasks[job_id] = task  # Sparar referens
+    task.add_done_callback(lambda done: _forget(job_id, done))  # Tar bort referensen när tasken är klar
+
+def _forget(job_id: str, task: asyncio.Task) -> None:  # Tar bort en klar task ur registret
+    if _tasks.get(job_id) is task:  # Tar bara bort om det är samma task
+        _tasks.pop(job_id, None)  # Jobbet kan inte längre avbrytas via tasken
+
+async def _finish(job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:  # Sparar slutstatus
+    await _execute(  # Ett avbrutet jobb skrivs aldrig över
+        "UPDATE optimization_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status != ?",
+        (status, result, error, time.time(), job_id, STATUS_CANCELLED),
+    )  # Slut på uppdatering
+
+async def _run(job_id: str) -> None:  # Kör ett jobb från kö till färdigt resultat
+    rows = await _fetch(  # Läser jobbets input
+        "SELECT cv_text, job_text, priority, mode, language, attempts FROM optimization_jobs WHERE id = ?", (job_id,)
+    )  # Slut på läsning
+    if not rows:  # Jobbet finns inte längre
+        return  # Inget att göra
+    job = rows[0]  # Jobbets rad
+    attempts = job["attempts"]  # Köavslag hittills (även före en omstart)
+    while True:  # Försöker tills LLM-kön tar emot jobbet eller försöken tar slut
+        try:  # Kör optimeringen
+            await _execute(  # Markerar att jobbet har startat
+                "UPDATE optimization_jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ? AND status != ?",
+                (STATUS_RUNNING, time.time(), job_id, STATUS_CANCELLED),
+            )  # Slut på uppdatering
+            result = await optimize(job["cv_text"], job["job_text"], job["mode"], job["language"], job["priority"])  # Cachad, köad generering
+        except llm_scheduler.AdmissionError as e:  # Kön är full just nu
+            attempts += 1  # Räknar försöket
+            if attempts >= JOB_MAX_ADMISSION_ATTEMPTS:  # Kön har varit full för länge
+                await _finish(job_id, STATUS_FAILED, error=f"LLM-kön tog inte emot jobbet efter {attempts} försök: {e}")  # Ger upp
+                return  # Jobbet är klart (med fel)
+            await _execute(  # Jobbet står kvar som köat
+                "UPDATE optimization_jobs SET status = ?, started_at = NULL, attempts = ? WHERE id = ? AND status != ?",
+                (STATUS_QUEUED, attempts, job_id, STATUS_CANCELLED),
+            )  # Slut på uppdatering
+            await asyncio.sleep(e.retry_after)  # Väntar så länge kön föreslår och försöker igen
+            continue  # Nytt försök
+        except Exception as e:  # Genereringen misslyckades
+            await _finish(job_id, STATUS_FAILED, error=str(e))  # Sparar felet
+            return  # Jobbet är klart (med fel)
+        await _finish(job_id, STATUS_DONE, result=result)  # Sparar resultatet
+        return  # Jobbet är klart
+
+async def submit(cv_text: str, job_text: str, priority: str, mode: str = "full", language: str = "both") -> Dict[str, object]:  # Skapar ett nytt jobb och startar det
+    job_id = uuid.uuid4().hex  # Unikt id för jobbet
+    await _execute(  # Sparar jobbet innan det startar så att det överlever en omstart
+        "INSERT INTO optimization_jobs (id, status, priority, mode, language, cv_text, job_text, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, STATUS_QUEUED, priority, mode, language, cv_text, job_text, time.time()),
+    )  # Slut på insert
+    _spawn(job_id)  # Startar jobbet i bakgrunden
+    return await get(job_id)  # Returnerar jobbets status
+
+async def cancel(job_id: str) -> Optional[Dict[str, object]]:  # Avbryter ett jobb som inte är klart
+    task = _tasks.get(job_id)  # Pågående bakgrunds-task
+    if task is not None:  # Jobbet körs eller väntar på kön
+        task.cancel()  # Slutar vänta; en redan startad generering blir klar och hamnar i cachen
+    await _execute(  # Bara jobb som inte hunnit bli klara avbryts
+        "UPDATE optimization_jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+        (STATUS_CANCELLED, time.time(), job_id, STATUS_QUEUED, STATUS_RUNNING),
+    )  # Slut på uppdatering
+    return await get(job_id, include_result=False)  # Jobbets status efter avbrottet (None om okänt)
+
+async def get(job_id: str, include_result: bool = True) -> Optional[Dict[str, object]]:  # Hämtar status, tider och resultat
+    rows = await _fetch(  # Läser jobbets rad
+        "SELECT id, status, priority, mode, language, attempts, result, error, created_at, started_at, finished_at FROM optimization_jobs WHERE id = ?",
+        (job_id,),
+    )  # Slut på läsning
+    if not rows:  # Okänt id
+        return None  # Signalerar att jobbet saknas
+    job = rows[0]  # Jobbets rad
+    now = time.time()  # Aktuell tid för pågående jobb
+    started = job["started_at"]  # När genereringen startade
+    finished = job["finished_at"]  # När jobbet blev klart
+    job["queue_seconds"] = round((started or finished or now) - job["created_at"], 2)  # Tid innan start
+    job["run_seconds"] = round((finished or now) - started, 2) if started else None  # Tid för generering
+    if not include_result:  # Anroparen vill inte ha hela texten
+        job.pop("result")  # Tar bort resultatet ur svaret
+    return job  # Returnerar jobbet
+
+async def resume_pending() -> int:  # Startar om jobb som avbröts av en omstart
+    rows = await _fetch(  # Hittar jobb som inte hann bli klara
+        "SELECT id FROM optimization_jobs WHERE status IN (?, ?) ORDER BY created_at", (STATUS_QUEUED, STATUS_RUNNING)
+    )  # Slut på läsning
+    for row in rows:  # Går igenom jobben i ursprunglig ordning
+        _spawn(row["id"])  # Startar om jobbet (cachen gör att färdiga genereringar inte körs igen)
+    return len(rows)  # Antal återupptagna jobb
@@ -1,42 +1,76 @@
 from reportlab.lib.pagesizes import A4  # Importerar standardformat A4 för PDF
 from reportlab.pdfgen import canvas  # Importerar canvas för att rita text i PDF
 from reportlab.lib.units import mm  # Importerar mm för enklare marginaler
-from typing import List  # Importerar List för typangivelser
+from reportlab.pdfbase.pdfmetrics import stringWidth  # Mäter textbredd med fontens teckenbredder
+from io import BytesIO  # PDF:en byggs i minnet
+from typing import BinaryIO, List, Union  # Importerar typer för typangivelser
 
-def _wrap_text(text: str, max_chars: int) -> List[str]:  # Radbryter texten för PDF
+FONT_NAME = "Helvetica"  # Standardfont
+FONT_SIZE = 10  # Fontstorlek i punkter
+LINE_HEIGHT = 12  # Radavstånd
+MARGIN = 15 * mm  # Marginaler
+PAGE_WIDTH, PAGE_HEIGHT = A4  # Sidstorlek A4
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN  # Tillgänglig bredd för text
+
+def _split_long_word(word: str, max_width: float, font_name: str, font_size: float) -> List[str]:  # Delar ett ord som är bredare än en hel rad
+    parts: List[str] = []  # Delar av ordet
+    current = ""  # Pågående del
+    for char in word:  # Tecken för tecken (bara för extremt långa ord, t.ex. URL:er)
+        if current and stringWidth(current + char, font_name, font_size) > max_width:  # Tecknet får inte plats
+            parts.append(current)  # Sparar delen
+            current = char  # Startar ny del
+        else:  # Tecknet får plats
+            current += char  # Lägger till tecknet
+    if current:  # Sista delen
+        parts.append(current)  # Sparar den
+    return parts  # Returnerar delarna
+
+def _wrap_text(text: str, max_width: float, font_name: str = FONT_NAME, font_size: float = FONT_SIZE) -> List[str]:  # Radbryter texten efter verklig textbredd
+    space_width = stringWidth(" ", font_name, font_size)  # Bredd på mellanslag mäts en gång
     lines: List[str] = []  # Skapar lista för rader
     for paragraph in text.splitlines():  # Itererar genom varje rad i input
         if not paragraph.strip():  # Om raden är tom
             lines.append("")  # Lägg in tom rad för luft
             continue  # Gå vidare till nästa rad
-        words = paragraph.split()  # Dela upp raden i ord
-        current = ""  # Håller pågående rad
-        for word in words:  # Itererar genom orden
-            test_line = f"{current} {word}".strip()  # Testar om ordet får plats
-            if len(test_line) <= max_chars:  # Om raden inte blir för lång
-                current = test_line  # Uppdaterar aktuell rad
-            else:  # Om raden blir för lång
-                lines.append(current)  # Lägg till raden
-                current = word  # Starta ny rad med ordet
+        current: List[str] = []  # Ord på pågående rad
+        current_width = 0.0  # Pågående rads bredd
+        for word in paragraph.split():  # Itererar genom orden
+            word_width = stringWidth(word, font_name, font_size)  # Varje ord mäts exakt en gång
+            if word_width > max_width:  # Ordet är bredare än en hel rad
+                if current:  # Avslutar pågående rad först
+                    lines.append(" ".join(current))  # Lägg till raden
+                pieces = _split_long_word(word, max_width, font_name, font_size)  # Delar ordet
+                lines.extend(pieces[:-1])  # Hela delar blir egna rader
+                current = [pieces[-1]]  # Sista delen fortsätter raden
+                current_width = stringWidth(pieces[-1], font_name, font_size)  # Dess bredd
+                continue  # Nästa ord
+            added_width = word_width + (space_width if current else 0.0)  # Bredd som ordet lägger till
+            if current_width + added_width <= max_width:  # Om raden inte blir för bred
+                current.append(word)  # Lägger till ordet
+                current_width += added_width  # Uppdaterar bredden
+            else:  # Om raden blir för bred
+                lines.append(" ".join(current))  # Lägg till raden
+                current = [word]  # Starta ny rad med ordet
+                current_width = word_width  # Ny rads bredd
         if current:  # Om det finns kvar text i raden
-            lines.append(current)  # Lägg till sista raden
+            lines.append(" ".join(current))  # Lägg till sista raden
     return lines  # Returnerar alla rader
 
-def create_pdf_from_text(text: str, output_path: str) -> None:  # Skapar PDF från text
-    width, height = A4  # Sätter sidstorlek till A4
-    margin = 15 * mm  # Sätter marginaler
-    line_height = 12  # Sätter radavstånd
-    max_chars = 95  # Grov gräns för radlängd
-    c = canvas.Canvas(output_path, pagesize=A4)  # Skapar PDF-canvas
-    c.setFont("Helvetica", 10)  # Sätter standardfont
-    y = height - margin  # Startposition från toppen
-    lines = _wrap_text(text, max_chars)  # Radbryter texten
+def create_pdf_from_text(text: str, output: Union[str, BinaryIO]) -> None:  # Skapar PDF från text (till fil eller buffert)
+    c = canvas.Canvas(output, pagesize=A4)  # Skapar PDF-canvas
+    c.setFont(FONT_NAME, FONT_SIZE)  # Sätter standardfont
+    y = PAGE_HEIGHT - MARGIN  # Startposition från toppen
+    lines = _wrap_text(text, TEXT_WIDTH)  # Radbryter texten efter fontens mått
     for line in lines:  # Itererar genom alla rader
-        if y < margin:  # Om vi når botten
+        if y < MARGIN:  # Om vi når botten
             c.showPage()  # Skapar ny sida
-            c.setFont("Helvetica", 10)  # Sätter font igen
-            y = height - margin  # Återställ y-position
-        c.drawString(margin, y, line)  # Ritar raden
-        y -= line_height  # Flyttar y-positionen nedåt
-    c.save()  # Sparar PDF-filen
+            c.setFont(FONT_NAME, FONT_SIZE)  # Sätter font igen
+            y = PAGE_HEIGHT - MARGIN  # Återställ y-position
+        c.drawString(MARGIN, y, line)  # Ritar raden
+        y -= LINE_HEIGHT  # Flyttar y-positionen nedåt
+    c.save()  # Sparar PDF:en
 
+def render_pdf_bytes(text: str) -> bytes:  # Skapar PDF i minnet utan temporära filer
+    buffer = BytesIO()  # Minnesbuffert
+    create_pdf_from_text(text, buffer)  # Ritar PDF:en i bufferten
+    return buffer.getvalue()  # Returnerar PDF-bytes
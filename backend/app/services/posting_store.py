@@ -0,0 +1,252 @@
+import asyncio  # Kör SQLite och sökning i trådpool
+import hashlib  # Innehållshash så att samma annons bara lagras en gång
+import sqlite3  # Lokal databas för annonser och inverterat index
+import threading  # Lås runt databasen och indexet i minnet
+import time  # Tidsstämpel när annonsen lades till
+from collections import Counter  # Termfrekvens per annons
+from typing import Dict, List, Optional, Tuple  # Typangivelser för tydlighet
+
+import numpy as np  # Vektoriserad BM25-summering över alla annonser
+
+from app.services import cv_storage  # Återanvänder DATA_DIR så att databasen hamnar bredvid övrig data
+from app.services import keyword_extractor  # Samma normalisering som keyword-analysen
+from app.services import keyword_scoring  # Samma BM25-parametrar som poängmotorn
+from app.services import tracing  # Tid per steg i spårade anrop
+
+POSTINGS_DB_FILE = cv_storage.DATA_DIR / "job_postings.sqlite3"  # SQLite-fil för annonser och index
+
+_lock = threading.Lock()  # Skyddar databasen och indexet i minnet mellan trådar
+
+class _MemoryIndex:  # Kopia av det inverterade indexet i minnet, laddas en gång och uppdateras inkrementellt
+    def __init__(self) -> None:  # Skapar ett tomt index
+        self.posting_ids: List[int] = []  # Rad -> annons-id
+        self.doc_len: List[int] = []  # Rad -> antal tokens i annonsen
+        self.added_at: List[float] = []  # Rad -> när annonsen lades till
+        self.base_rows = np.zeros(0, dtype=np.int64)  # Laddat index: rader sorterade per token
+        self.base_tf = np.zeros(0, dtype=np.float64)  # Laddat index: frekvenser i samma ordning
+        self.base_slices: Dict[str, Tuple[int, int]] = {}  # Token -> (start, slut) i base-arrayerna
+        self.delta: Dict[str, Tuple[List[int], List[int]]] = {}  # Token -> (rader, frekvenser) tillagda efter laddning
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}  # Token -> färdig postingslista (cache)
+
+    def add(self, posting_id: int, added_at: float, counts: Dict[str, int]) -> None:  # Lägger till en annons
+        row = len(self.posting_ids)  # Nästa lediga rad
+        self.posting_ids.append(posting_id)  # Sparar id
+        self.doc_len.append(sum(counts.values()))  # Sparar längd
+        self.added_at.append(added_at)  # Sparar tidsstämpel
+        for token, tf in counts.items():  # Uppdaterar varje tokens postingslista
+            rows, tfs = self.delta.setdefault(token, ([], []))  # Hämtar eller skapar tilläggslistan
+            rows.append(row)  # Lägger till raden
+            tfs.append(tf)  # Lägger till frekvensen
+            self._arrays.pop(token, None)  # Cachen för token är inaktuell
+
+    def arrays(self, token: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:  # Postingslista som numpy-arrayer
+        cached = self._arrays.get(token)  # Kollar cachen
+        if cached is not None:  # Redan byggd
+            return cached  # Returnerar direkt
+        span = self.base_slices.get(token)  # Del av det laddade indexet
+        extra = self.delta.get(token)  # Tillägg efter laddning
+        if span is None and extra is None:  # Token finns inte i någon annons
+            return None  # Ingen postingslista
+        rows = self.base_rows[span[0]:span[1]] if span else self.base_rows[:0]  # Laddade rader (vy, ingen kopia)
+        tf = self.base_tf[span[0]:span[1]] if span else self.base_tf[:0]  # Laddade frekvenser
+        if extra is not None:  # Slår ihop med tillägg
+            rows = np.concatenate([rows, np.asarray(extra[0], dtype=np.int64)])  # Alla rader
+            tf = np.concatenate([tf, np.asarray(extra[1], dtype=np.float64)])  # Alla frekvenser
+        self._arrays[token] = (rows, tf)  # Sparar i cachen
+        return rows, tf  # Returnerar postingslistan
+
+_memory: Optional[_MemoryIndex] = None  # Laddas vid första sökning
+
+def _connect() -> sqlite3.Connection:  # Öppnar databasen och skapar tabellerna vid behov
+    cv_storage.ensure_data_dir()  # Säkerställer att data-mappen finns
+    conn = sqlite3.connect(POSTINGS_DB_FILE)  # Öppnar SQLite-filen
+    conn.row_factory = sqlite3.Row  # Rader kan läsas som dict
+    conn.execute(  # Annonser med innehållshash för deduplicering
+        "CREATE TABLE IF NOT EXISTS postings ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, content_hash TEXT UNIQUE NOT NULL, title TEXT NOT NULL, "
+        "text TEXT NOT NULL, source_url TEXT, token_count INTEGER NOT NULL, added_at REAL NOT NULL)"
+    )  # Slut på tabelldefinition
+    conn.execute(  # Inverterat index: token -> annonser, lagrat sorterat på token (WITHOUT ROWID)
+        "CREATE TABLE IF NOT EXISTS posting_terms ("
+        "token TEXT NOT NULL, posting_id INTEGER NOT NULL, tf INTEGER NOT NULL, "
+        "PRIMARY KEY (token, posting_id)) WITHOUT ROWID"
+    )  # Slut på tabelldefinition
+    conn.execute("CREATE INDEX IF NOT EXISTS postings_added_at ON postings (added_at)")  # Snabb filtrering på datum
+    return conn  # Returnerar öppen anslutning
+
+def _load_memory(conn: sqlite3.Connection) -> _MemoryIndex:  # Läser hela indexet från disk en gång
+    memory = _MemoryIndex()  # Tomt index
+    postings = conn.execute("SELECT id, token_count, added_at FROM postings ORDER BY id").fetchall()  # Annonser i id-ordning
+    memory.posting_ids = [row[0] for row in postings]  # Rad -> annons-id
+    memory.doc_len = [row[1] for row in postings]  # Rad -> längd
+    memory.added_at = [row[2] for row in postings]  # Rad -> tidsstämpel
+    conn.row_factory = None  # Vanliga tupler är mycket snabbare än sqlite3.Row för miljontals rader
+    terms = conn.execute("SELECT token, posting_id, tf FROM posting_terms").fetchall()  # Läses i primärnyckelordning, dvs. per token
+    conn.row_factory = sqlite3.Row  # Återställer för övriga frågor
+    if not terms:  # Tomt index
+        return memory  # Inget mer att ladda
+    tokens, ids, tfs = zip(*terms)  # Delar upp kolumnerna
+    sorted_ids = np.asarray(memory.posting_ids, dtype=np.int64)  # Annons-id i radordning (stigande)
+    memory.base_rows = np.searchsorted(sorted_ids, np.asarray(ids, dtype=np.int64))  # Annons-id -> rad, vektoriserat
+    memory.base_tf = np.asarray(tfs, dtype=np.float64)  # Frekvenser
+    token_array = np.asarray(tokens, dtype=object)  # Tokens för att hitta gränser
+    starts = np.concatenate([[0], np.flatnonzero(token_array[1:] != token_array[:-1]) + 1])  # Där en ny token börjar
+    ends = np.append(starts[1:], len(tokens))  # Där varje token slutar
+    memory.base_slices = {tokens[start]: (int(start), int(end)) for start, end in zip(starts, ends)}  # Token -> intervall
+    return memory  # Returnerar laddat index
+
+def _ensure_memory(conn: sqlite3.Connection) -> _MemoryIndex:  # Returnerar indexet i minnet, laddar vid behov
+    global _memory  # Uppdaterar modulens index
+    if _memory is None:  # Första gången
+        _memory = _load_memory(conn)  # Laddar från disk
+    return _memory  # Returnerar indexet
+
+def _title_of(text: str) -> str:  # Första icke-tomma raden som rubrik
+    for line in text.splitlines():  # Går igenom raderna
+        if line.strip():  # Första raden med innehåll
+            return line.strip()[:200]  # Begränsad längd
+    return ""  # Tom annons
+
+def _add_sync(text: str, source_url: Optional[str]) -> Dict[str, object]:  # Lägger till en annons och uppdaterar indexet
+    content_hash = hashlib.sha256(text.strip().encode("utf-8")).hexdigest()  # Hash av annonsens innehåll
+    counts = Counter(keyword_extractor.normalize_text(text))  # Tokens och frekvenser
+    with _lock:  # Låser databas och minnesindex
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            existing = conn.execute("SELECT id, added_at FROM postings WHERE content_hash = ?", (content_hash,)).fetchone()  # Finns annonsen redan?
+            if existing is not None:  # Samma innehåll har redan lagrats
+                return {"id": existing["id"], "added_at": existing["added_at"], "created": False}  # Returnerar befintlig
+            added_at = time.time()  # Tidsstämpel
+            cursor = conn.execute(  # Sparar annonsen
+                "INSERT INTO postings (content_hash, title, text, source_url, token_count, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, _title_of(text), text, source_url, sum(counts.values()), added_at),
+            )  # Slut på insert
+            posting_id = cursor.lastrowid  # Annonsens nya id
+            conn.executemany(  # Lägger till annonsens tokens i det inverterade indexet
+                "INSERT INTO posting_terms (token, posting_id, tf) VALUES (?, ?, ?)",
+                [(token, posting_id, tf) for token, tf in counts.items()],
+            )  # Slut på insert
+            conn.commit()  # Sparar allt i en transaktion
+            if _memory is not None:  # Indexet i minnet finns redan
+                _memory.add(posting_id, added_at, counts)  # Uppdaterar det inkrementellt
+            return {"id": posting_id, "added_at": added_at, "created": True}  # Returnerar ny annons
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _search_sync(  # BM25-sökning över alla annonser med CV:ts tokens som fråga
+    query_text: str,  # Texten vi söker med (master CV)
+    limit: int,  # Antal träffar per sida
+    offset: int,  # Hur många träffar som hoppas över
+    added_after: Optional[float],  # Bara annonser tillagda efter denna tid
+    added_before: Optional[float],  # Bara annonser tillagda före denna tid
+) -> Dict[str, object]:  # Returnerar träffar och totalt antal
+    query_tokens = set(keyword_extractor.normalize_text(query_text))  # Unika tokens i CV:t
+    with _lock:  # Låser minnesindexet under sökningen
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            memory = _ensure_memory(conn)  # Indexet i minnet
+            n_docs = len(memory.posting_ids)  # Antal annonser
+            if n_docs == 0 or not query_tokens:  # Inget att söka i eller med
+                return {"total": 0, "items": []}  # Tomt resultat
+            doc_len = np.asarray(memory.doc_len, dtype=np.float64)  # Längd per annons
+            avg_len = doc_len.mean() or 1.0  # Medellängd
+            norm = keyword_scoring.BM25_K1 * (1 - keyword_scoring.BM25_B + keyword_scoring.BM25_B * doc_len / avg_len)  # Längdnormalisering
+            scores = np.zeros(n_docs, dtype=np.float64)  # Poäng per annons
+            matched = np.zeros(n_docs, dtype=np.int32)  # Antal matchade tokens per annons
+            for token in query_tokens:  # Bara CV:ts tokens berörs (inverterat index)
+                arrays = memory.arrays(token)  # Postingslistan för token
+                if arrays is None:  # Token finns inte i någon annons
+                    continue  # Går vidare
+                rows, tf = arrays  # Rader och frekvenser
+                idf = np.log1p((n_docs - rows.size + 0.5) / (rows.size + 0.5))  # BM25-IDF
+                scores[rows] += idf * tf * (keyword_scoring.BM25_K1 + 1) / (tf + norm[rows])  # BM25-bidrag för alla annonser på en gång
+                matched[rows] += 1  # Räknar matchade tokens
+            mask = scores > 0  # Bara annonser med minst en träff
+            if added_after is not None or added_before is not None:  # Datumfilter
+                added = np.asarray(memory.added_at, dtype=np.float64)  # Tidsstämplar
+                if added_after is not None:  # Undre gräns
+                    mask &= added >= added_after  # Filtrerar bort äldre
+                if added_before is not None:  # Övre gräns
+                    mask &= added < added_before  # Filtrerar bort nyare
+            candidates = np.flatnonzero(mask)  # Rader som matchar
+            total = int(candidates.size)  # Totalt antal träffar
+            wanted = min(offset + limit, total)  # Så många behöver sorteras
+            if wanted <= offset:  # Sidan ligger efter sista träffen
+                return {"total": total, "items": []}  # Tom sida
+            top = candidates[np.argpartition(-scores[candidates], wanted - 1)[:wanted]]  # De bästa utan full sortering
+            top = top[np.argsort(-scores[top], kind="stable")][offset:wanted]  # Sorterar och plockar ut sidan
+            ids = [memory.posting_ids[row] for row in top]  # Annons-id för sidan
+            placeholders = ",".join("?" * len(ids))  # SQL-platshållare
+            meta = {  # Hämtar rubrik och metadata för sidans annonser
+                row["id"]: dict(row)  # Id -> rad
+                for row in conn.execute(
+                    f"SELECT id, title, source_url, token_count, added_at FROM postings WHERE id IN ({placeholders})", ids
+                )  # Slut på läsning
+            }  # Slut på metadata
+            items = [  # Bygger träfflistan i rankad ordning
+                {**meta[memory.posting_ids[row]], "score": round(float(scores[row]), 4), "matched_terms": int(matched[row])}  # Metadata och poäng
+                for row in top  # Går igenom sidans rader
+            ]  # Slut på träfflista
+            return {"total": total, "items": items}  # Returnerar sidan
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _list_sync(limit: int, offset: int) -> Dict[str, object]:  # Listar annonser, nyaste först
+    with _lock:  # Låser databasen
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            total = conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]  # Totalt antal annonser
+            rows = conn.execute(  # Hämtar en sida
+                "SELECT id, title, source_url, token_count, added_at FROM postings ORDER BY added_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()  # Slut på läsning
+            return {"total": total, "items": [dict(row) for row in rows]}  # Returnerar sidan
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _get_sync(posting_id: int) -> Optional[Dict[str, object]]:  # Hämtar en annons med text
+    with _lock:  # Låser databasen
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            row = conn.execute(  # Läser annonsen
+                "SELECT id, title, text, source_url, token_count, added_at FROM postings WHERE id = ?", (posting_id,)
+            ).fetchone()  # Slut på läsning
+            return dict(row) if row else None  # Returnerar annonsen eller None
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _warm_up_sync() -> int:  # Laddar indexet i minnet i förväg
+    with _lock:  # Låser databas och minnesindex
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            return len(_ensure_memory(conn).posting_ids)  # Laddar och returnerar antal annonser
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+async def warm_up() -> int:  # Laddar indexet vid start så att första sökningen också går på millisekunder
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    return await loop.run_in_executor(None, _warm_up_sync)  # Kör i trådpool
+
+async def add_posting(text: str, source_url: Optional[str] = None) -> Dict[str, object]:  # Lägger till en annons utan att blockera
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("postings_add"):  # Tid för indexering
+        return await loop.run_in_executor(None, lambda: _add_sync(text, source_url))  # Kör i trådpool
+
+async def search(  # Söker bästa annonser för en text (t.ex. master CV)
+    query_text: str,  # Texten vi söker med
+    limit: int = 10,  # Antal träffar per sida
+    offset: int = 0,  # Hur många träffar som hoppas över
+    added_after: Optional[float] = None,  # Undre datumgräns (Unix-tid)
+    added_before: Optional[float] = None,  # Övre datumgräns (Unix-tid)
+) -> Dict[str, object]:  # Returnerar träffar och totalt antal
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("postings_search"):  # Tid för BM25-sökningen
+        return await loop.run_in_executor(None, lambda: _search_sync(query_text, limit, offset, added_after, added_before))  # Kör i trådpool
+
+async def list_postings(limit: int = 20, offset: int = 0) -> Dict[str, object]:  # Listar annonser utan att blockera
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    return await loop.run_in_executor(None, lambda: _list_sync(limit, offset))  # Kör i trådpool
+
+async def get_posting(posting_id: int) -> Optional[Dict[str, object]]:  # Hämtar en annons utan att blockera
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    return await loop.run_in_executor(None, lambda: _get_sync(posting_id))  # Kör i trådpool
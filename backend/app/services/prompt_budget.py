@@ -0,0 +1,128 @@
+import os  # Läser konfiguration från miljövariabler
+import re  # Delar upp text i meningar och ord
+from collections import Counter  # Vikter för jobbannonsens keywords
+from functools import lru_cache  # Samma jobbannons komprimeras bara en gång
+from typing import Dict, List  # Typangivelser för tydlighet
+
+from app.services import keyword_extractor  # Samma normalisering och keywords som resten av appen
+
+CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))  # Modellens kontextfönster
+COMPLETION_TOKEN_RESERVE = int(os.getenv("LLM_COMPLETION_TOKEN_RESERVE", "3000"))  # Plats som lämnas åt svaret (två CV-versioner)
+JOB_MAX_TOKENS = int(os.getenv("PROMPT_JOB_MAX_TOKENS", "900"))  # Tak för jobbannonsen även när kontexten räcker
+JOB_MIN_TOKENS = 150  # Jobbannonsen får alltid minst så här mycket plats
+PREFILL_TOKENS_PER_SECOND = float(os.getenv("LLM_PREFILL_TOKENS_PER_SECOND", "400"))  # Uppskattad prefill-hastighet för rapportering
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)  # Ord och skiljetecken
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")  # Meningsslut eller radbrytning
+REQUIREMENT_CUES = (  # Ord som brukar inleda krav och kvalifikationer
+    "krav", "kräver", "erfarenhet", "kunskap", "kompetens", "meriterande", "söker", "förväntas", "ansvar", "arbetsuppgifter",
+    "utbildning", "examen", "behärskar", "goda", "required", "requirements", "experience", "knowledge", "skills",
+    "qualifications", "must", "should", "proficient", "familiar", "responsibilities", "degree", "plus", "nice",
+)  # Slut på signalord
+BOILERPLATE_PATTERN = re.compile(  # Rader som nästan aldrig säger något om jobbet
+    r"\b(?:cookies?|kakor|logga in|log in|sign in|dela annons(?:en)?|share|skriv ut|print|tipsa en vän|copyright|alla rättigheter|"
+    r"all rights reserved|integritetspolicy|privacy policy|följ oss|follow us|prenumerera|subscribe)\b|©",  # Hela ord, så att "sprint" och "SharePoint" inte träffas
+    re.IGNORECASE,
+)  # Slut på mönster
+BOILERPLATE_MAX_TOKENS = 25  # Bara korta rader räknas som boilerplate (längre rader kan vara riktiga stycken)
+REQUIREMENT_BONUS = 2.0  # Extra poäng för meningar med signalord
+BULLET_BONUS = 1.0  # Extra poäng för punktlisterader (krav listas ofta som bullets)
+
+_stats = {"prompts": 0, "job_tokens_before": 0, "job_tokens_after": 0}  # Räknare för faktiska LLM-anrop
+
+def estimate_tokens(text: str) -> int:  # Uppskattar antal tokens lokalt utan tokenizer
+    tokens = 0  # Summa
+    for piece in TOKEN_PATTERN.findall(text):  # Ord och skiljetecken
+        tokens += 1 + (len(piece) - 1) // 6 if len(piece) > 1 else 1  # Långa ord (vanligt på svenska) delas i flera tokens
+    return tokens  # Returnerar uppskattningen
+
+class CompressedPosting:  # Resultat av komprimeringen av en jobbannons
+    def __init__(self, text: str, tokens_before: int, tokens_after: int, sentences_before: int, sentences_after: int):  # Skapar resultatet
+        self.text = text  # Komprimerad jobbannons
+        self.tokens_before = tokens_before  # Tokens före komprimering
+        self.tokens_after = tokens_after  # Tokens efter komprimering
+        self.sentences_before = sentences_before  # Meningar före
+        self.sentences_after = sentences_after  # Meningar efter
+
+    def report(self) -> Dict[str, object]:  # Rapport för API-svar och loggning
+        saved = self.tokens_before - self.tokens_after  # Sparade tokens
+        return {  # Strukturerad rapport
+            "job_tokens_before": self.tokens_before,  # Tokens före komprimering
+            "job_tokens_after": self.tokens_after,  # Tokens efter komprimering
+            "job_tokens_saved": saved,  # Skillnaden
+            "sentences_before": self.sentences_before,  # Meningar före
+            "sentences_after": self.sentences_after,  # Meningar efter
+            "estimated_prefill_ms_saved": round(saved / PREFILL_TOKENS_PER_SECOND * 1000, 1),  # Uppskattad sparad prefill-tid
+        }  # Slut på rapport
+
+def _split_sentences(job_text: str) -> List[str]:  # Delar jobbannonsen i meningar och rader
+    return [s.strip() for s in SENTENCE_SPLIT.split(job_text) if s and s.strip()]  # Icke-tomma delar i ordning
+
+def _is_boilerplate(sentence: str) -> bool:  # Kort rad som nästan aldrig säger något om jobbet
+    return bool(BOILERPLATE_PATTERN.search(sentence)) and estimate_tokens(sentence) <= BOILERPLATE_MAX_TOKENS  # Längre rader kan vara riktiga stycken
+
+def _dedupe(sentences: List[str]) -> List[str]:  # Tar bort upprepningar
+    seen = set()  # Normaliserade meningar som redan finns
+    kept = []  # Meningar som behålls
+    for sentence in sentences:  # Går igenom i ordning
+        key = " ".join(keyword_extractor.normalize_text(sentence)) or sentence.lower()  # Jämförs utan skiljetecken och stoppord
+        if key in seen:  # Samma mening har redan kommit
+            continue  # Hoppar över upprepningen
+        seen.add(key)  # Kommer ihåg meningen
+        kept.append(sentence)  # Behåller meningen
+    return kept  # Returnerar unika meningar
+
+def _score(sentence: str, weights: Counter) -> float:  # Hur mycket krav och keywords en mening bär
+    words = keyword_extractor.normalize_text(sentence)  # Samma normalisering som keyword-analysen
+    if not words:  # Bara siffror/skiljetecken
+        return 0.0  # Ingen poäng
+    score = sum(weights.get(word, 0) for word in set(words))  # Summan av keywordvikter (varje ord räknas en gång)
+    lowered = sentence.lower()  # För signalord
+    if any(cue in lowered for cue in REQUIREMENT_CUES):  # Meningen beskriver krav eller uppgifter
+        score += REQUIREMENT_BONUS * max(weights.values(), default=1)  # Krav väger tungt oavsett ordval
+    if sentence.startswith(("-", "*", "•")):  # Punktlisterad
+        score += BULLET_BONUS  # Liten bonus
+    return score / (len(words) ** 0.5)  # Normaliserar så att långa stycken inte vinner bara på längd
+
+@lru_cache(maxsize=256)
+def compress_job_posting(job_text: str, max_tokens: int = JOB_MAX_TOKENS) -> CompressedPosting:  # Komprimerar jobbannonsen till en tokenbudget
+    sentences = _split_sentences(job_text)  # Meningar och rader
+    tokens_before = estimate_tokens(job_text)  # Tokens före
+    unique = _dedupe(sentences)  # Utan upprepningar
+    costs = [estimate_tokens(s) for s in unique]  # Tokens per mening (räknas en gång)
+    if sum(costs) <= max_tokens:  # Allt ryms efter rensningen
+        kept_indexes = list(range(len(unique)))  # Behåller alla unika meningar, även sådant som liknar boilerplate
+    else:  # Måste välja de viktigaste meningarna
+        unique = [sentence for sentence in unique if not _is_boilerplate(sentence)]  # Boilerplate rensas bara när annonsen inte ryms
+        costs = [estimate_tokens(s) for s in unique]  # Tokens för de meningar som är kvar
+        unique_words = keyword_extractor.normalize_text("\n".join(unique))  # Frekvenser efter dedupe, så att upprepad boilerplate inte väger tungt
+        weights = Counter(dict(Counter(unique_words).most_common(40)))  # Jobbets keywords med frekvens
+        scores = [_score(sentence, weights) for sentence in unique]  # Poäng per mening
+        ranked = sorted(range(len(unique)), key=lambda i: scores[i], reverse=True)  # Bäst först
+        kept_indexes, used = [], 0  # Valda meningar och använd budget
+        for index in ranked:  # Tar bästa meningarna så länge de ryms
+            if scores[index] > 0 and used + costs[index] <= max_tokens:  # Meningen bär något och ryms i budgeten
+                kept_indexes.append(index)  # Väljer meningen
+                used += costs[index]  # Räknar budget
+        kept_indexes.sort()  # Ursprunglig ordning så att texten går att läsa
+    text = "\n".join(unique[i] for i in kept_indexes)  # Komprimerad jobbannons
+    return CompressedPosting(text, tokens_before, estimate_tokens(text), len(sentences), len(kept_indexes))  # Resultat
+
+def job_token_budget(prompt_prefix: str) -> int:  # Hur många tokens jobbannonsen får med ett visst CV-prefix
+    available = CONTEXT_TOKENS - COMPLETION_TOKEN_RESERVE - estimate_tokens(prompt_prefix)  # Kvar efter instruktioner, CV och svar
+    return max(JOB_MIN_TOKENS, min(JOB_MAX_TOKENS, available))  # Inom min- och maxgräns
+
+def record(compressed: CompressedPosting) -> None:  # Räknar ett faktiskt LLM-anrop i statistiken
+    _stats["prompts"] += 1  # Antal prompter
+    _stats["job_tokens_before"] += compressed.tokens_before  # Tokens före
+    _stats["job_tokens_after"] += compressed.tokens_after  # Tokens efter
+
+def stats() -> Dict[str, object]:  # Returnerar statistik för alla prompter sedan start
+    saved = _stats["job_tokens_before"] - _stats["job_tokens_after"]  # Sparade tokens totalt
+    return {  # Strukturerad statistik
+        **_stats,  # Råa räknare
+        "job_tokens_saved": saved,  # Sparade tokens
+        "estimated_prefill_seconds_saved": round(saved / PREFILL_TOKENS_PER_SECOND, 2),  # Uppskattad sparad prefill-tid
+        "context_tokens": CONTEXT_TOKENS,  # Konfigurerat kontextfönster
+        "job_max_tokens": JOB_MAX_TOKENS,  # Konfigurerat tak för jobbannonsen
+    }  # Slut på statistik
@@ -0,0 +1,112 @@
+import asyncio  # Används för att köra blocking SQLite-anrop i trådpool
+import hashlib  # Används för att skapa innehållsbaserade cache-nycklar
+import json  # Används för att serialisera nyckeldelar på ett stabilt sätt
+import os  # Används för att läsa konfiguration från miljövariabler
+import sqlite3  # Lokal databas för persistent cache (överlever omstart)
+import threading  # Lås så att samtidiga skrivningar inte krockar
+import time  # Tidsstämplar för TTL och LRU
+from typing import Dict, Optional  # Typangivelser för tydlighet
+
+from app.services import cv_storage  # Återanvänder DATA_DIR så att cachen hamnar bredvid övrig data
+from app.services import tracing  # Tid per steg i spårade anrop
+
+CACHE_DB_FILE = cv_storage.DATA_DIR / "optimize_cache.sqlite3"  # SQLite-fil för cachade genereringar
+CACHE_MAX_ENTRIES = int(os.getenv("OPTIMIZE_CACHE_MAX_ENTRIES", "500"))  # Max antal poster innan äldsta tas bort
+CACHE_TTL_SECONDS = int(os.getenv("OPTIMIZE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # Livslängd per post (default 7 dagar)
+
+_lock = threading.Lock()  # Serialiserar åtkomst till databasen mellan trådar
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}  # Räknare för cache-statistik
+
+def normalize_text_for_key(text: str) -> str:  # Normaliserar text så att oviktiga skillnader ger samma nyckel
+    lines = [" ".join(line.split()) for line in text.strip().splitlines()]  # Komprimerar blanksteg per rad
+    compact = [line for line in lines if line]  # Tar bort tomma rader
+    return "\n".join(compact)  # Returnerar normaliserad text
+
+def make_key(*parts: object) -> str:  # Skapar en SHA-256-nyckel av godtyckliga nyckeldelar
+    serialized = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))  # Stabil serialisering av delarna
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()  # Returnerar hex-hash som nyckel
+
+def _connect() -> sqlite3.Connection:  # Öppnar databasen och skapar tabellen vid behov
+    cv_storage.ensure_data_dir()  # Säkerställer att data-mappen finns
+    conn = sqlite3.connect(CACHE_DB_FILE)  # Öppnar SQLite-filen
+    conn.execute(  # Skapar cache-tabellen om den saknas
+        "CREATE TABLE IF NOT EXISTS optimize_cache ("
+        "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+    )  # Slut på tabelldefinition
+    return conn  # Returnerar öppen anslutning
+
+def _get_sync(key: str) -> Optional[str]:  # Läser en post synkront (körs i trådpool)
+    now = time.time()  # Aktuell tid för TTL-kontroll
+    with _lock:  # Låser så att läsning och uppdatering sker atomiskt
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            row = conn.execute("SELECT value, created_at FROM optimize_cache WHERE key = ?", (key,)).fetchone()  # Hämtar posten
+            if row is None:  # Om nyckeln saknas
+                _stats["misses"] += 1  # Räknar miss
+                return None  # Ingen träff
+            value, created_at = row  # Packar upp raden
+            if now - created_at > CACHE_TTL_SECONDS:  # Om posten har gått ut
+                conn.execute("DELETE FROM optimize_cache WHERE key = ?", (key,))  # Tar bort utgången post
+                conn.commit()  # Sparar borttagningen
+                _stats["evictions"] += 1  # Räknar borttagning
+                _stats["misses"] += 1  # Räknar som miss
+                return None  # Ingen giltig träff
+            conn.execute("UPDATE optimize_cache SET last_access = ? WHERE key = ?", (now, key))  # Uppdaterar LRU-tid
+            conn.commit()  # Sparar uppdateringen
+            _stats["hits"] += 1  # Räknar träff
+            return value  # Returnerar cachat värde
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _set_sync(key: str, value: str) -> None:  # Skriver en post synkront och tillämpar eviction
+    now = time.time()  # Aktuell tid för tidsstämplar
+    with _lock:  # Låser så att skrivning och eviction sker atomiskt
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            conn.execute(  # Lägger in eller ersätter posten
+                "INSERT OR REPLACE INTO optimize_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )  # Slut på insert
+            expired = conn.execute(  # Tar bort poster som passerat TTL
+                "DELETE FROM optimize_cache WHERE created_at < ?", (now - CACHE_TTL_SECONDS,)
+            ).rowcount  # Antal borttagna utgångna poster
+            overflow = conn.execute(  # Tar bort minst nyligen använda poster över maxgränsen
+                "DELETE FROM optimize_cache WHERE key IN ("
+                "SELECT key FROM optimize_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (CACHE_MAX_ENTRIES,),
+            ).rowcount  # Antal borttagna poster p.g.a. storlek
+            conn.commit()  # Sparar ändringarna
+            _stats["stores"] += 1  # Räknar skrivning
+            _stats["evictions"] += expired + overflow  # Räknar alla borttagningar
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+def _count_sync() -> int:  # Räknar antal poster i cachen
+    with _lock:  # Låser för konsekvent läsning
+        conn = _connect()  # Öppnar databasen
+        try:  # Säkerställer att anslutningen stängs
+            return conn.execute("SELECT COUNT(*) FROM optimize_cache").fetchone()[0]  # Returnerar antal rader
+        finally:  # Körs alltid
+            conn.close()  # Stänger anslutningen
+
+async def lookup(key: str) -> Optional[str]:  # Hämtar ett cachat resultat utan att blockera event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("cache_lookup"):  # Tid för SQLite-läsning
+        return await loop.run_in_executor(None, lambda: _get_sync(key))  # Kör SQLite-läsning i trådpool
+
+async def store(key: str, value: str) -> None:  # Sparar ett resultat utan att blockera event loop
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    with tracing.span("cache_store"):  # Tid för SQLite-skrivning
+        await loop.run_in_executor(None, lambda: _set_sync(key, value))  # Kör SQLite-skrivning i trådpool
+
+async def stats() -> Dict[str, object]:  # Returnerar statistik för cachen
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async I/O
+    entries = await loop.run_in_executor(None, _count_sync)  # Räknar poster i trådpool
+    lookups = _stats["hits"] + _stats["misses"]  # Totalt antal uppslag
+    return {  # Returnerar strukturerad statistik
+        **_stats,  # Träffar, missar, skrivningar och borttagningar
+        "entries": entries,  # Antal poster i cachen just nu
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0,  # Andel träffar
+        "max_entries": CACHE_MAX_ENTRIES,  # Konfigurerad maxstorlek
+        "ttl_seconds": CACHE_TTL_SECONDS,  # Konfigurerad livslängd
+    }  # Slut på statistik
@@ -0,0 +1,68 @@
+import asyncio  # Används för delade tasks och skydd mot avbrott
+from typing import Awaitable, Callable, Dict, TypeVar  # Typangivelser för tydlighet
+
+T = TypeVar("T")  # Generisk returtyp för det delade anropet
+
+class FlightAbandoned(Exception):  # Ledaren gav upp (t.ex. strömmande klient kopplade ner); väntande startar om
+    pass
+
+class SingleFlight:  # Slår ihop identiska samtidiga anrop till ett enda uppströmsanrop
+    def __init__(self) -> None:  # Skapar en tom samling av pågående anrop
+        self._inflight: Dict[str, asyncio.Task] = {}  # Nyckel -> pågående delad task
+        self._waiters: Dict[str, int] = {}  # Nyckel -> antal klienter som väntar på samma task
+        self.coalesced = 0  # Antal anrop som hakade på ett redan pågående anrop
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:  # Kör factory en gång per nyckel åt alla väntande
+        while True:  # Startar om om ledaren överger arbetet
+            task = self._inflight.get(key)  # Kollar om samma arbete redan pågår
+            if task is None:  # Första anroparen startar det delade arbetet
+                task = asyncio.ensure_future(factory())  # Startar uppströmsanropet som egen task
+                self._register(key, task)  # Andra anropare kan hitta den
+            else:  # Någon annan har redan startat samma arbete
+                self.coalesced += 1  # Räknar sammanslagningen för statistik
+            self._waiters[key] = self._waiters.get(key, 0) + 1  # Räknar upp väntande klienter
+            try:  # Väntar på resultatet
+                # shield gör att en klient som kopplar ner (CancelledError) bara slutar vänta;
+                # själva uppströmsanropet fortsätter för övriga väntande och hamnar i cachen.
+                return await asyncio.shield(task)  # Returnerar det delade resultatet (eller felet)
+            except FlightAbandoned:  # Ledaren slutade innan resultatet fanns
+                if self._inflight.get(key) is task:  # _finish har inte hunnit köras än
+                    self._inflight.pop(key, None)  # Annars hittas samma klara future igen och loopen snurrar utan att släppa event loop
+                continue  # Nästa varv startar eller ansluter till ett nytt arbete
+            finally:  # Körs både vid lyckat svar, fel och avbrott
+                remaining = self._waiters.get(key, 1) - 1  # Räknar ner väntande klienter
+                if remaining > 0:  # Om någon fortfarande väntar
+                    self._waiters[key] = remaining  # Sparar nytt antal
+                else:  # Ingen väntar längre
+                    self._waiters.pop(key, None)  # Tar bort räknaren
+
+    def in_flight(self, key: str) -> bool:  # Om arbete med nyckeln pågår just nu
+        return key in self._inflight  # Registrerad och inte klar
+
+    def lead(self, key: str) -> "asyncio.Future":  # Registrerar ett arbete som anroparen själv driver (t.ex. en ström)
+        future = asyncio.get_running_loop().create_future()  # Löses av anroparen med set_result
+        self._register(key, future)  # Andra anrop med samma nyckel väntar på den
+        return future  # Anroparen måste lösa den eller anropa abandon
+
+    def abandon(self, key: str, future: "asyncio.Future") -> None:  # Ledaren ger upp; väntande startar om med egen factory
+        if not future.done():  # Inte redan löst
+            future.set_exception(FlightAbandoned(key))  # Väcker väntande
+        if self._inflight.get(key) is future:  # Tas bort direkt; _finish körs först på nästa varv i event loop
+            self._inflight.pop(key, None)  # Nästa anrop med nyckeln startar nytt arbete
+
+    def _register(self, key: str, future: "asyncio.Future") -> None:  # Lägger in ett pågående arbete
+        self._inflight[key] = future  # Registrerar arbetet så att andra kan hitta det
+        future.add_done_callback(lambda done: self._finish(key, done))  # Städar upp när arbetet är klart
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:  # Tar bort en klar task ur registret
+        if self._inflight.get(key) is task:  # Tar bara bort om det är samma task
+            self._inflight.pop(key, None)  # Nästa anrop med nyckeln startar nytt arbete
+        if not task.cancelled():  # Cancelled tasks saknar exception att hämta
+            task.exception()  # Markerar felet som hämtat så att asyncio inte varnar när alla klienter lämnat
+
+    def stats(self) -> Dict[str, int]:  # Returnerar statistik för pågående anrop
+        return {  # Strukturerad statistik
+            "in_flight": len(self._inflight),  # Antal unika pågående uppströmsanrop
+            "waiters": sum(self._waiters.values()),  # Antal klienter som väntar totalt
+            "coalesced": self.coalesced,  # Antal anrop som slogs ihop
+        }  # Slut på statistik
@@ -0,0 +1,163 @@
+import os  # Läser konfiguration från miljövariabler
+import random  # Slumpar vilka anrop som spåras
+import time  # Mäter tid per steg
+from contextlib import contextmanager  # Gör span användbar med "with"
+from contextvars import ContextVar  # Aktuell spårning följer anropet genom await och tasks
+from typing import Callable, Dict, Iterator, List, Optional, Tuple  # Typangivelser för tydlighet
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # Andel HTTP-anrop som spåras per steg (0 = av, 1 = alla)
+TRACE_SERVER_TIMING = os.getenv("TRACE_SERVER_TIMING", "1") != "0"  # Skickar Server-Timing-header på spårade anrop
+METRIC_PREFIX = "cv_optimizer_"  # Prefix för alla mätvärden
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)  # Sekunder
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200)  # Genereringshastighet
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:  # Prometheus-etiketter: {a="x",b="y"}
+    pairs = ['%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in zip(names, values)]  # Escapar \ och "
+    if extra:  # T.ex. le="0.5" för histogram
+        pairs.append(extra)  # Lägger till sist
+    return "{" + ",".join(pairs) + "}" if pairs else ""  # Tom sträng utan etiketter
+
+class Counter:  # Räknare som bara ökar
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):  # Skapar räknaren
+        self.name = METRIC_PREFIX + name  # Fullt namn
+        self.help_text = help_text  # Beskrivning
+        self.label_names = label_names  # Etikettnamn
+        self._values: Dict[Tuple[str, ...], float] = {}  # Etikettvärden -> summa
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:  # Ökar räknaren
+        self._values[labels] = self._values.get(labels, 0.0) + amount  # Summerar per etikettkombination
+
+    def render(self) -> List[str]:  # Rader i Prometheus textformat
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]  # Metadata
+        for labels, value in sorted(self._values.items()):  # Stabil ordning
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")  # En rad per kombination
+        return lines  # Returnerar raderna
+
+class Histogram:  # Fördelning av mätvärden i fasta hinkar
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DURATION_BUCKETS):  # Skapar histogrammet
+        self.name = METRIC_PREFIX + name  # Fullt namn
+        self.help_text = help_text  # Beskrivning
+        self.label_names = label_names  # Etikettnamn
+        self.buckets = buckets  # Övre gränser
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # Etikettvärden -> [antal per hink..., summa, antal]
+
+    def observe(self, value: float, *labels: str) -> None:  # Registrerar ett mätvärde
+        series = self._series.get(labels)  # Serien för etiketterna
+        if series is None:  # Första mätningen
+            series = [0.0] * (len(self.buckets) + 2)  # Hinkar + summa + antal
+            self._series[labels] = series  # Sparar serien
+        for index, bound in enumerate(self.buckets):  # Hittar första hinken som rymmer värdet
+            if value <= bound:  # Värdet ryms
+                series[index] += 1  # Räknar i hinken (kumuleras vid rendering)
+                break  # Klar
+        series[-2] += value  # Summa
+        series[-1] += 1  # Antal
+
+    def render(self) -> List[str]:  # Rader i Prometheus textformat
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]  # Metadata
+        for labels, series in sorted(self._series.items()):  # Stabil ordning
+            cumulative = 0.0  # Kumulativt antal
+            for bound, count in zip(self.buckets, series):  # Hink för hink
+                cumulative += count  # Prometheus-hinkar är kumulativa
+                bucket_labels = _format_labels(self.label_names, labels, 'le="%g"' % bound)  # Etiketter med övre gräns
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")  # Hinkrad
+            inf_labels = _format_labels(self.label_names, labels, 'le="+Inf"')  # Etiketter för sista hinken
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-1]:g}")  # Alla mätningar
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {series[-2]:g}")  # Summa
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {series[-1]:g}")  # Antal
+        return lines  # Returnerar raderna
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP-anrop per route och status", ("method", "route", "status"))  # Alla anrop
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "Svarstid per route", ("method", "route"))  # Alla anrop
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Tid per steg i spårade anrop", ("stage",))  # Bara spårade anrop
+LLM_QUEUE_SECONDS = Histogram("llm_queue_wait_seconds", "Väntetid i LLM-kön")  # Alla LLM-anrop
+LLM_GENERATION_SECONDS = Histogram("llm_generation_seconds", "Tid för en generering")  # Alla LLM-anrop
+LLM_TOKENS_PER_SECOND = Histogram("llm_tokens_per_second", "Genererade tokens per sekund", buckets=TOKENS_PER_SECOND_BUCKETS)  # Alla LLM-anrop
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Genererade tokens totalt")  # Alla LLM-anrop
+_metrics = [HTTP_REQUESTS, HTTP_SECONDS, STAGE_SECONDS, LLM_QUEUE_SECONDS, LLM_GENERATION_SECONDS, LLM_TOKENS_PER_SECOND, LLM_COMPLETION_TOKENS]  # Renderas av /metrics
+_gauges: List[Tuple[str, str, Callable[[], float]]] = []  # Namn, beskrivning och funktion som läser aktuellt värde
+
+def register_gauge(name: str, help_text: str, read: Callable[[], float]) -> None:  # Mätvärde som läses vid varje skrapning (t.ex. kölängd)
+    _gauges.append((METRIC_PREFIX + name, help_text, read))  # Sparas och anropas av render_metrics
+
+class Trace:  # Summerad tid per steg för ett HTTP-anrop
+    def __init__(self):  # Skapar en tom spårning
+        self.stages: Dict[str, List[float]] = {}  # Steg -> [sekunder, antal]
+
+    def add(self, stage: str, seconds: float) -> None:  # Lägger till tid för ett steg
+        entry = self.stages.setdefault(stage, [0.0, 0])  # Stegets summa
+        entry[0] += seconds  # Summerar tid (parallella steg summeras)
+        entry[1] += 1  # Räknar förekomster
+
+    def server_timing(self, total_seconds: float) -> str:  # Server-Timing-headerns värde
+        parts = [f"{stage};dur={seconds * 1000:.1f}" + (f';desc="x{count}"' if count > 1 else "") for stage, (seconds, count) in self.stages.items()]  # Millisekunder per steg
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")  # Tid fram till headers
+        return ", ".join(parts)  # Kommaseparerad lista
+
+_current: ContextVar[Optional[Trace]] = ContextVar("cv_optimizer_trace", default=None)  # Spårningen för pågående anrop
+
+def record(stage: str, seconds: float) -> None:  # Registrerar en redan uppmätt tid (t.ex. kötid)
+    trace = _current.get()  # Aktuell spårning
+    if trace is None:  # Anropet spåras inte
+        return  # Ingen kostnad
+    trace.add(stage, seconds)  # Till Server-Timing
+    STAGE_SECONDS.observe(seconds, stage)  # Till /metrics
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:  # Mäter tiden för ett steg i spårade anrop
+    if _current.get() is None:  # Anropet spåras inte (sampling eller bakgrundsjobb)
+        yield  # Kör koden utan mätning
+        return  # Klar
+    started = time.perf_counter()  # Starttid
+    try:  # Mäter även om steget kastar fel
+        yield  # Kör steget
+    finally:  # Körs alltid
+        record(stage, time.perf_counter() - started)  # Registrerar tiden
+
+def observe_llm(queue_wait: float, generation_seconds: float, completion_tokens: Optional[int]) -> None:  # Mätvärden för en generering
+    LLM_QUEUE_SECONDS.observe(queue_wait)  # Tid i kön
+    LLM_GENERATION_SECONDS.observe(generation_seconds)  # Tid för genereringen
+    record("llm_queue", queue_wait)  # Till spårningen om anropet spåras
+    if completion_tokens:  # Antal tokens känt
+        LLM_COMPLETION_TOKENS.inc(completion_tokens)  # Summerar tokens
+        if generation_seconds > 0:  # Undviker division med noll
+            LLM_TOKENS_PER_SECOND.observe(completion_tokens / generation_seconds)  # Genereringshastighet
+
+def render_metrics() -> str:  # Alla mätvärden i Prometheus textformat
+    lines: List[str] = []  # Samlar rader
+    for metric in _metrics:  # Räknare och histogram
+        lines.extend(metric.render())  # Metricens rader
+    for name, help_text, read in _gauges:  # Aktuella värden
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read():g}"])  # En rad per gauge
+    return "\n".join(lines) + "\n"  # Avslutande radbrytning krävs av formatet
+
+class TracingMiddleware:  # ASGI-middleware: tid per route, sampling och Server-Timing-header
+    def __init__(self, app):  # Omsluter appen
+        self.app = app  # Nästa lager
+
+    async def __call__(self, scope, receive, send):  # Körs för varje anrop
+        if scope["type"] != "http":  # Websockets och lifespan passerar rakt igenom
+            await self.app(scope, receive, send)  # Ingen mätning
+            return  # Klar
+        trace = Trace() if TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE else None  # Sampling per anrop
+        token = _current.set(trace)  # Spårningen följer anropet
+        started = time.perf_counter()  # Starttid
+        status = 500  # Antas om inget svar hann skickas
+
+        async def send_with_timing(message):  # Lägger till Server-Timing när headers skickas
+            nonlocal status  # Uppdaterar statusen
+            if message["type"] == "http.response.start":  # Status och headers
+                status = message["status"]  # Sparar status
+                if trace is not None and TRACE_SERVER_TIMING:  # Spårat anrop
+                    headers = list(message.get("headers", []))  # Kopia av headers
+                    headers.append((b"server-timing", trace.server_timing(time.perf_counter() - started).encode("latin-1")))  # Tid per steg
+                    message = {**message, "headers": headers}  # Nytt meddelande med headern
+            await send(message)  # Skickar vidare
+
+        try:  # Mäter även misslyckade anrop
+            await self.app(scope, receive, send_with_timing)  # Kör anropet
+        finally:  # Körs alltid
+            _current.reset(token)  # Återställer kontexten
+            route = getattr(scope.get("route"), "path", "unmatched")  # Route-mall, inte konkret sökväg (begränsar antal serier)
+            HTTP_REQUESTS.inc(1.0, scope["method"], route, str(status))  # Räknar anropet
+            HTTP_SECONDS.observe(time.perf_counter() - started, scope["method"], route)  # Svarstid (för strömmar: hela strömmen)
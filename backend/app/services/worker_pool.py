@@ -0,0 +1,24 @@
+import asyncio  # Väntar på processpoolen utan att blockera event loop
+import os  # Läser konfiguration och antal kärnor
+from concurrent.futures import ProcessPoolExecutor  # Separata processer för CPU-tungt arbete (ingen GIL)
+from typing import Any, Callable, Optional  # Typangivelser för tydlighet
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(max(1, min(4, os.cpu_count() or 1)))))  # Antal arbetarprocesser
+
+_executor: Optional[ProcessPoolExecutor] = None  # Skapas vid första användning
+
+def get_executor() -> ProcessPoolExecutor:  # Returnerar den delade processpoolen
+    global _executor  # Modulnivåns pool
+    if _executor is None:  # Första anropet
+        _executor = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)  # Startar poolen
+    return _executor  # Returnerar poolen
+
+async def run(func: Callable[..., Any], *args: Any) -> Any:  # Kör en funktion i en arbetarprocess
+    loop = asyncio.get_event_loop()  # Hämtar event loop för async väntan
+    return await loop.run_in_executor(get_executor(), func, *args)  # Funktion och argument måste gå att pickla
+
+def shutdown() -> None:  # Stänger poolen när servern stängs
+    global _executor  # Modulnivåns pool
+    if _executor is not None:  # Poolen har startats
+        _executor.shutdown(wait=False, cancel_futures=True)  # Väntar inte på köade jobb vid avstängning
+        _executor = None  # Nästa anrop skapar en ny pool
@@ -0,0 +1 @@
+# Benchmark- och lasttestsvit för backend. Körs med: python -m benchmarks.run
@@ -0,0 +1,136 @@
+import asyncio  # Samtidiga klienter
+import os  # Miljövariabler till serverprocesserna
+import socket  # Hittar lediga portar
+import subprocess  # Startar stubserver och backend
+import sys  # Samma Python-tolk för underprocesserna
+import tempfile  # Egen datamapp för backend under testet
+import time  # Mäter latens och väntar på uppstart
+from contextlib import contextmanager  # Startar och stänger processerna
+from pathlib import Path  # Sökvägar
+from typing import Callable, Dict, Iterator, List  # Typangivelser för tydlighet
+
+import httpx  # Lastklient
+
+from benchmarks import stats, synthetic  # Sammanfattning och syntetiska dokument
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent  # Mappen med app/
+STARTUP_TIMEOUT = 30.0  # Sekunder att vänta på att servrarna svarar
+
+def _free_port() -> int:  # Ledig TCP-port på localhost
+    with socket.socket() as sock:  # Tillfällig socket
+        sock.bind(("127.0.0.1", 0))  # Operativsystemet väljer port
+        return sock.getsockname()[1]  # Portnumret
+
+def _wait_until_ready(url: str, process: subprocess.Popen) -> None:  # Väntar tills servern svarar
+    deadline = time.monotonic() + STARTUP_TIMEOUT  # Sista tidpunkt
+    while time.monotonic() < deadline:  # Försöker tills tiden är slut
+        if process.poll() is not None:  # Processen dog vid start
+            raise RuntimeError(f"Servern avslutades vid start ({url})")  # Tydligt fel
+        try:  # Servern kanske inte lyssnar än
+            if httpx.get(url, timeout=1.0).status_code == 200:  # Svarar
+                return  # Klar
+        except httpx.HTTPError:  # Inte uppe än
+            pass
+        time.sleep(0.1)  # Försöker igen strax
+    raise RuntimeError(f"Servern startade inte inom {STARTUP_TIMEOUT} s ({url})")  # Tydligt fel
+
+@contextmanager
+def _process(args: List[str], env: Dict[str, str], ready_url: str) -> Iterator[None]:  # Kör en server under testet
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)  # Startar processen
+    try:  # Stänger alltid processen
+        _wait_until_ready(ready_url, process)  # Väntar på uppstart
+        yield  # Kör testet
+    finally:  # Körs alltid
+        process.terminate()  # Ber processen avsluta
+        try:  # Ger den några sekunder
+            process.wait(timeout=10)  # Väntar
+        except subprocess.TimeoutExpired:  # Hänger sig
+            process.kill()  # Tvingar avslut
+
+@contextmanager
+def running_stack(latency: float, tokens_per_second: float, completion_tokens: int, llm_concurrency: int) -> Iterator[str]:  # Stubserver + backend, returnerar backendens bas-URL
+    mock_port, app_port = _free_port(), _free_port()  # Lediga portar
+    env = dict(os.environ)  # Ärver miljön
+    env["PYTHONPATH"] = str(BACKEND_DIR) + os.pathsep + env.get("PYTHONPATH", "")  # app och benchmarks importerbara
+    mock_args = [  # Stubservern
+        sys.executable, "-m", "benchmarks.mock_lm_studio", "--port", str(mock_port), "--latency", str(latency),
+        "--tokens-per-second", str(tokens_per_second), "--completion-tokens", str(completion_tokens),
+        "--max-concurrency", str(llm_concurrency),
+    ]  # Slut på argument
+    with tempfile.TemporaryDirectory(prefix="cv-bench-data-") as data_dir:  # Tom datamapp, så att cacher från tidigare körningar inte påverkar
+        app_env = {  # Backend pekar mot stubben
+            **env,  # Ärvd miljö
+            "CV_DATA_DIR": data_dir,  # Egen datamapp
+            "LM_STUDIO_URL": f"http://127.0.0.1:{mock_port}/v1/chat/completions",  # Stubservern
+            "LLM_MAX_CONCURRENCY": str(llm_concurrency),  # Samma kapacitet som stubben
+        }  # Slut på miljö
+        app_args = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"]  # FastAPI-appen från app/main.py
+        with _process(mock_args, env, f"http://127.0.0.1:{mock_port}/v1/models"):  # Startar stubben
+            with _process(app_args, app_env, f"http://127.0.0.1:{app_port}/health"):  # Startar backend
+                yield f"http://127.0.0.1:{app_port}"  # Bas-URL för lastklienten
+
+async def _run_scenario(base_url: str, make_request: Callable[[httpx.AsyncClient, int], "asyncio.Future"], requests: int, concurrency: int) -> Dict[str, object]:  # Kör ett scenario med fast antal samtidiga klienter
+    latencies: List[float] = []  # Tid per lyckat anrop
+    statuses: Dict[str, int] = {}  # Antal per HTTP-status
+    errors = 0  # Misslyckade anrop
+    counter = iter(range(requests))  # Delad räknare: varje anrop får ett unikt index
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)  # En anslutning per klient
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300.0) as client:  # Delad klient
+
+        async def worker() -> None:  # En simulerad användare
+            nonlocal errors  # Uppdaterar felräknaren
+            for index in counter:  # Tar nästa anrop tills alla är gjorda
+                started = time.perf_counter()  # Starttid
+                try:  # Nätverksfel räknas som fel
+                    response = await make_request(client, index)  # Skickar anropet
+                except httpx.HTTPError:  # Timeout, nedkopplad server osv.
+                    errors += 1  # Räknar fel
+                    continue  # Nästa anrop
+                elapsed = time.perf_counter() - started  # Latens
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1  # Räknar status
+                if response.status_code < 400:  # Lyckat anrop
+                    latencies.append(elapsed)  # Sparar latens
+                else:  # 4xx/5xx, t.ex. 429 från LLM-kön
+                    errors += 1  # Räknar fel
+
+        started = time.perf_counter()  # Starttid för scenariot
+        await asyncio.gather(*[worker() for _ in range(concurrency)])  # Alla klienter samtidigt
+        wall_seconds = time.perf_counter() - started  # Total tid
+    return stats.summarize(latencies, wall_seconds, errors, statuses)  # Percentiler och genomströmning
+
+def _scenarios(requests: int) -> Dict[str, Callable[[httpx.AsyncClient, int], "asyncio.Future"]]:  # Alla lastscenarier
+    cv = synthetic.cv_text(0, bullets_per_section=15)  # Ett CV som många jobb optimeras mot
+    jobs = [synthetic.job_text(seed, paragraphs=12) for seed in range(requests)]  # Unika annonser ger cachemissar
+    uploads = [synthetic.cv_docx_bytes(seed, bullets_per_section=20) for seed in range(requests)]  # Unika filer ger tolkning varje gång
+    docx_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"  # MIME-typ för uppladdningen
+
+    def optimize(path: str, cached: bool = False, **extra: object) -> Callable[[httpx.AsyncClient, int], "asyncio.Future"]:  # Optimeringsanrop mot en endpoint
+        return lambda client, i: client.post(path, json={"cv_text": cv, "job_text": jobs[0 if cached else i], **extra})  # Samma eller unik annons
+
+    async def stream(client: httpx.AsyncClient, i: int) -> httpx.Response:  # Läser hela SSE-strömmen
+        async with client.stream("POST", "/api/cv/optimize-stream", json={"cv_text": cv, "job_text": jobs[i] + " stream"}) as response:  # Egen annonsvariant, så att den inte delar cache med /optimize
+            async for _ in response.aiter_bytes():  # Läser till slutet
+                pass
+        return response  # Status finns kvar efter stängning
+
+    return {  # Namn -> anropsfunktion
+        "load.keywords": lambda client, i: client.post("/api/cv/keywords", json={"cv_text": cv, "job_text": jobs[i]}),  # Ren CPU
+        "load.keywords_weighted": lambda client, i: client.post("/api/cv/keywords", json={"cv_text": cv, "job_text": jobs[i], "mode": "weighted"}),  # N-gram och BM25
+        "load.upload_docx": lambda client, i: client.post(  # Uppladdning och tolkning
+            "/api/cv/upload", files={"file": (f"cv-{i}.docx", uploads[i], docx_type)}, headers={"X-Session-Id": f"bench-{i % 8}"}  # Några sessioner
+        ),  # Slut på uppladdning
+        "load.optimize": optimize("/api/cv/optimize"),  # Unika jobb: kö och LLM
+        "load.optimize_cached": optimize("/api/cv/optimize", cached=True),  # Samma jobb: cache och single-flight
+        "load.optimize_languages": optimize("/api/cv/optimize", mode="languages"),  # Ett anrop per språk
+        "load.optimize_stream": stream,  # SSE
+        "load.optimize_docx": optimize("/api/cv/optimize-docx", cached=True),  # Cachad text, rendering
+        "load.optimize_pdf": optimize("/api/cv/optimize-pdf", cached=True),  # Cachad text, rendering
+    }  # Slut på scenarier
+
+def run(requests: int = 50, concurrency: int = 8, latency: float = 0.2, tokens_per_second: float = 200.0, completion_tokens: int = 120, llm_concurrency: int = 2) -> Dict[str, Dict[str, object]]:  # Kör alla lastscenarier
+    results: Dict[str, Dict[str, object]] = {}  # Resultat per scenario
+    scenarios = _scenarios(requests)  # Förberedda anrop
+    with running_stack(latency, tokens_per_second, completion_tokens, llm_concurrency) as base_url:  # Stub + backend
+        for name, make_request in scenarios.items():  # Ett scenario i taget, så att de inte stör varandra
+            results[name] = asyncio.run(_run_scenario(base_url, make_request, requests, concurrency))  # Kör scenariot
+    return results  # Returnerar alla resultat
@@ -0,0 +1,62 @@
+import asyncio  # cv_reader är async och använder processpoolen
+import tempfile  # Syntetiska filer skrivs till en temporär mapp
+import time  # Mäter tid per anrop
+from pathlib import Path  # Sökvägar till syntetiska filer
+from typing import Callable, Dict, List  # Typangivelser för tydlighet
+
+from benchmarks import stats, synthetic  # Sammanfattning och syntetiska dokument
+from app.services import content_extractor  # HTML-tolkningen som job_scraper använder
+from app.services import cv_reader  # PDF/DOCX-tolkning
+from app.services import document_renderer  # DOCX-rendering
+from app.services import keyword_extractor  # Keyword-analys
+from app.services import pdf_exporter  # PDF-rendering
+from app.services import worker_pool  # Stängs efter körningen
+
+def _time_calls(calls: List[Callable[[], object]], warmup: int = 1) -> Dict[str, object]:  # Kör anropen i tur och ordning och mäter alla utom uppvärmningen
+    for call in calls[:warmup]:  # Uppvärmning (imports, mallar, JIT-liknande cacher i bibliotek)
+        call()  # Resultatet räknas inte
+    latencies = []  # Tid per anrop
+    started = time.perf_counter()  # Starttid för hela serien
+    for call in calls[warmup:]:  # Ett anrop i taget
+        t = time.perf_counter()  # Starttid
+        call()  # Kör anropet
+        latencies.append(time.perf_counter() - t)  # Sparar tiden
+    return stats.summarize(latencies, time.perf_counter() - started)  # Percentiler och genomströmning
+
+async def _time_async_calls(calls: List[Callable[[], "asyncio.Future"]], warmup: int = 1) -> Dict[str, object]:  # Samma som _time_calls för koroutiner
+    for call in calls[:warmup]:  # Uppvärmning (startar arbetarprocesserna)
+        await call()  # Resultatet räknas inte
+    latencies = []  # Tid per anrop
+    started = time.perf_counter()  # Starttid för hela serien
+    for call in calls[warmup:]:  # Ett anrop i taget
+        t = time.perf_counter()  # Starttid
+        await call()  # Kör anropet
+        latencies.append(time.perf_counter() - t)  # Sparar tiden
+    return stats.summarize(latencies, time.perf_counter() - started)  # Percentiler och genomströmning
+
+async def _cv_reader_benchmarks(iterations: int, work_dir: Path) -> Dict[str, Dict[str, object]]:  # Tolkning av stora PDF- och DOCX-filer
+    pdf_path = work_dir / "cv.pdf"  # Syntetisk PDF
+    pdf_path.write_bytes(synthetic.cv_pdf_bytes(bullets_per_section=80))  # Flera sidor, så att sidorna delas över processer
+    docx_path = work_dir / "cv.docx"  # Syntetisk DOCX
+    docx_path.write_bytes(synthetic.cv_docx_bytes(bullets_per_section=80))  # Många paragrafer
+    counter = iter(range(10 ** 9))  # Unik hash per anrop så att textcachen aldrig träffar
+    return {  # En mätserie per format
+        "cv_reader.read_pdf": await _time_async_calls([lambda: cv_reader.read_cv_from_file(str(pdf_path), f"bench-pdf-{next(counter)}") for _ in range(iterations + 1)]),  # PDF
+        "cv_reader.read_docx": await _time_async_calls([lambda: cv_reader.read_cv_from_file(str(docx_path), f"bench-docx-{next(counter)}") for _ in range(iterations + 1)]),  # DOCX
+    }  # Slut på resultat
+
+def run(iterations: int = 20) -> Dict[str, Dict[str, object]]:  # Kör alla mikrobenchmarks
+    cvs = [synthetic.cv_text(seed) for seed in range(iterations + 1)]  # Olika CV:n så att eventuella cacher inte träffar
+    jobs = [synthetic.job_text(seed) for seed in range(iterations + 1)]  # Olika annonser
+    pages = [synthetic.job_html(seed) for seed in range(iterations + 1)]  # Olika HTML-sidor
+    results = {  # Synkrona benchmarks
+        "keyword_extractor.extract_keywords": _time_calls([lambda text=text: keyword_extractor.extract_keywords(text, 80) for text in cvs]),  # Tillåtna keywords ur ett stort CV
+        "keyword_extractor.compare_keywords": _time_calls([lambda cv=cv, job=job: keyword_extractor.compare_keywords(job, cv, 30) for cv, job in zip(cvs, jobs)]),  # Jämförelse jobb mot CV
+        "job_scraper.extract_main_text": _time_calls([lambda html=html: content_extractor.extract_main_text(html) for html in pages]),  # HTML-tolkningen bakom job_scraper
+        "pdf_exporter.render_pdf": _time_calls([lambda text=text: pdf_exporter.render_pdf_bytes(text) for text in cvs]),  # Radbrytning och PDF
+        "document_renderer.render_docx": _time_calls([lambda text=text: document_renderer.render_docx_bytes(text) for text in cvs]),  # DOCX
+    }  # Slut på synkrona benchmarks
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as work_dir:  # Syntetiska filer
+        results.update(asyncio.run(_cv_reader_benchmarks(iterations, Path(work_dir))))  # Async tolkning i processpoolen
+    worker_pool.shutdown()  # Stänger arbetarprocesserna
+    return results  # Returnerar alla mätserier
@@ -0,0 +1,78 @@
+import argparse  # Kommandoradsflaggor för latens och hastighet
+import asyncio  # Simulerad väntan utan att blockera servern
+import json  # SSE-chunkar och JSON-svar
+import time  # Tidsstämplar i svaren
+
+import uvicorn  # Kör stubservern
+from fastapi import FastAPI, Request  # Minimal OpenAI-kompatibel server
+from fastapi.responses import JSONResponse, StreamingResponse  # Vanliga och strömmade svar
+
+# Stub för LM Studio med OpenAI-kompatibelt API. Latens före första token och
+# tokens per sekund är konfigurerbara, och max_concurrency simulerar att en
+# lokal GPU bara genererar ett fåtal svar åt gången (resten väntar i servern).
+
+COMPLETION_LINES = (  # Svaret ser ut som ett riktigt CV så att DOCX/PDF-rendering får realistisk text
+    "=== SVENSKA CV ===", "PROFIL:", "- Erfaren utvecklare med fokus på Python, FastAPI och molntjänster",
+    "ERFARENHET:", "- Byggde och drev API:er med hög tillgänglighet", "- Ledde migrering till containerbaserad drift",
+    "=== ENGLISH CV ===", "PROFILE:", "- Experienced developer focused on Python, FastAPI and cloud services",
+    "EXPERIENCE:", "- Built and operated highly available APIs", "- Led migration to container-based deployment",
+)  # Slut på rader
+
+def completion_tokens_text(tokens: int) -> list:  # Ungefär ett ord per token, radbrytningar som i ett CV
+    words = []  # Samlar tokens
+    source = " \n".join(COMPLETION_LINES).split(" ")  # Ord med radbrytningar kvar
+    while len(words) < tokens:  # Upprepar CV-texten tills antalet räcker
+        words.extend(source)  # Ett varv till
+    return [word + " " for word in words[:tokens]]  # Varje token med mellanslag
+
+def create_app(latency: float, tokens_per_second: float, completion_tokens: int, max_concurrency: int) -> FastAPI:  # Bygger stubservern
+    app = FastAPI(title="Mock LM Studio")  # Egen app, helt fristående från backend
+    slots = asyncio.Semaphore(max(1, max_concurrency))  # Samtidiga genereringar "GPU:n" klarar
+    token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0  # Sekunder per token
+
+    def usage(prompt: str) -> dict:  # Token-räkning som LM Studio skickar
+        return {"prompt_tokens": len(prompt.split()), "completion_tokens": completion_tokens, "total_tokens": len(prompt.split()) + completion_tokens}  # Ungefärliga tal
+
+    @app.get("/v1/models")  # Hälsokontroll som routern använder
+    async def models():  # Listar en modell
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model"}]}  # Samma form som LM Studio
+
+    @app.post("/v1/chat/completions")  # Generering
+    async def chat_completions(request: Request):  # Vanligt eller strömmat svar
+        body = await request.json()  # Payload från backend
+        prompt = " ".join(message.get("content", "") for message in body.get("messages", []))  # Hela prompten
+        tokens = completion_tokens_text(completion_tokens)  # Svarets tokens
+        if body.get("stream"):  # SSE-ström
+            async def events():  # Skickar token för token
+                async with slots:  # Väntar på ledig "GPU"
+                    await asyncio.sleep(latency)  # Prefill / tid till första token
+                    for token in tokens:  # En chunk per token
+                        chunk = {"choices": [{"index": 0, "delta": {"content": token}}], "created": int(time.time())}  # OpenAI-format
+                        yield f"data: {json.dumps(chunk)}\n\n"  # SSE-rad
+                        await asyncio.sleep(token_delay)  # Genereringshastighet
+                yield f"data: {json.dumps({'choices': [], 'usage': usage(prompt)})}\n\n"  # Token-räkning sist
+                yield "data: [DONE]\n\n"  # Slutmarkör
+
+            return StreamingResponse(events(), media_type="text/event-stream")  # Strömmat svar
+        async with slots:  # Väntar på ledig "GPU"
+            await asyncio.sleep(latency + token_delay * len(tokens))  # Prefill plus generering
+        return JSONResponse({  # Vanligt svar
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}}],  # Genererad text
+            "usage": usage(prompt),  # Token-räkning
+        })  # Slut på svar
+
+    return app  # Returnerar appen
+
+def main() -> None:  # Startar stubservern från kommandoraden
+    parser = argparse.ArgumentParser(description="OpenAI-kompatibel stub för LM Studio")  # Flaggor
+    parser.add_argument("--port", type=int, default=1234)  # Samma port som LM Studio
+    parser.add_argument("--latency", type=float, default=0.2)  # Sekunder till första token
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)  # Genereringshastighet
+    parser.add_argument("--completion-tokens", type=int, default=120)  # Tokens per svar
+    parser.add_argument("--max-concurrency", type=int, default=1)  # Samtidiga genereringar
+    args = parser.parse_args()  # Tolkar flaggorna
+    app = create_app(args.latency, args.tokens_per_second, args.completion_tokens, args.max_concurrency)  # Bygger appen
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")  # Kör tills processen avslutas
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse  # Kommandoradsflaggor
+import os  # Datamapp för mikrobenchmarks
+import platform  # Maskininfo i baslinjen
+import sys  # Exit-kod vid regression
+import tempfile  # Temporär datamapp
+import time  # Tidsstämpel i baslinjen
+from pathlib import Path  # Sökväg till baslinjen
+
+# Benchmark- och lasttestsvit. Körs från backend-mappen:
+#
+#   python -m benchmarks.run                      # mikro + last, jämför mot baslinjen om den finns
+#   python -m benchmarks.run --suite micro        # bara mikrobenchmarks
+#   python -m benchmarks.run --save-baseline      # sparar resultatet som ny baslinje
+#   python -m benchmarks.run --quick              # färre anrop, för en snabb kontroll
+#
+# Lasttesterna startar app/main.py med uvicorn mot en stub för LM Studio
+# (benchmarks/mock_lm_studio.py) med konfigurerbar latens och tokens/s, och
+# en egen temporär datamapp så att cacher från tidigare körningar inte
+# påverkar. Baslinjen är maskinberoende: jämför bara körningar på samma dator.
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"  # Standardfil för baslinjen
+
+def main() -> int:  # Kör sviten och returnerar exit-kod
+    parser = argparse.ArgumentParser(description="Benchmarks och lasttester för CV Optimizer-backend")  # Flaggor
+    parser.add_argument("--suite", choices=["all", "micro", "load"], default="all")  # Vilka delar som körs
+    parser.add_argument("--quick", action="store_true")  # Färre anrop
+    parser.add_argument("--iterations", type=int, default=20)  # Anrop per mikrobenchmark
+    parser.add_argument("--requests", type=int, default=50)  # Anrop per lastscenario
+    parser.add_argument("--concurrency", type=int, default=8)  # Samtidiga klienter i lasttesterna
+    parser.add_argument("--llm-latency", type=float, default=0.2)  # Stubbens tid till första token (sekunder)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)  # Stubbens genereringshastighet
+    parser.add_argument("--llm-completion-tokens", type=int, default=120)  # Tokens per stubsvar
+    parser.add_argument("--llm-concurrency", type=int, default=2)  # Samtidiga genereringar i stubben och i LLM-kön
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)  # Baslinjefil
+    parser.add_argument("--save-baseline", action="store_true")  # Sparar resultatet som baslinje
+    parser.add_argument("--tolerance", type=float, default=0.15)  # Tillåten försämring innan det räknas som regression
+    parser.add_argument("--fail-on-regression", action="store_true")  # Exit-kod 1 vid regression (för CI)
+    args = parser.parse_args()  # Tolkar flaggorna
+    if args.quick:  # Snabb kontroll
+        args.iterations, args.requests = 5, 12  # Färre anrop
+
+    os.environ.setdefault("CV_DATA_DIR", tempfile.mkdtemp(prefix="cv-bench-micro-"))  # Måste sättas innan app-moduler importeras
+    from benchmarks import stats  # Importeras efter CV_DATA_DIR
+
+    results = {}  # Alla resultat
+    if args.suite in ("all", "micro"):  # Mikrobenchmarks
+        from benchmarks import micro  # Importerar app-moduler
+        print(f"Mikrobenchmarks ({args.iterations} anrop per benchmark)...", flush=True)  # Förlopp
+        results.update(micro.run(args.iterations))  # Kör
+    if args.suite in ("all", "load"):  # Lastscenarier
+        from benchmarks import load  # Startar servrar vid körning
+        print(f"Lastscenarier ({args.requests} anrop, {args.concurrency} samtidiga klienter)...", flush=True)  # Förlopp
+        results.update(load.run(  # Kör
+            args.requests, args.concurrency, args.llm_latency, args.llm_tokens_per_second, args.llm_completion_tokens, args.llm_concurrency,
+        ))  # Slut på lastscenarier
+
+    print()  # Tom rad
+    print(stats.format_results(results))  # Resultattabell
+    regressions = 0  # Antal försämrade benchmarks
+    baseline = stats.load_baseline(args.baseline)  # Tidigare resultat
+    if baseline is not None:  # Finns något att jämföra med
+        rows = stats.compare(results, baseline, args.tolerance)  # Jämförelse
+        regressions = sum(1 for row in rows if row["status"] == "sämre")  # Räknar regressioner
+        print()  # Tom rad
+        print(f"Jämförelse mot {args.baseline} (tolerans {args.tolerance:.0%}):")  # Rubrik
+        print(stats.format_comparison(rows))  # Jämförelsetabell
+    if args.save_baseline:  # Ny baslinje
+        meta = {"saved_at": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(), "machine": platform.platform(), "args": {k: str(v) for k, v in vars(args).items()}}  # Körningens förutsättningar
+        stats.save_baseline(args.baseline, results, meta)  # Sparar
+        print(f"\nBaslinje sparad i {args.baseline}")  # Bekräftelse
+    return 1 if args.fail_on_regression and regressions else 0  # Exit-kod
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import json  # Baslinjen sparas som JSON
+from pathlib import Path  # Sökväg till baslinjefilen
+from typing import Dict, List, Optional  # Typangivelser för tydlighet
+
+def percentile(sorted_values: List[float], fraction: float) -> float:  # Percentil med linjär interpolation
+    if not sorted_values:  # Inga mätningar
+        return 0.0  # Inget att rapportera
+    position = fraction * (len(sorted_values) - 1)  # Position mellan två mätningar
+    lower = int(position)  # Mätningen under
+    upper = min(lower + 1, len(sorted_values) - 1)  # Mätningen över
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)  # Interpolerat värde
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0, statuses: Optional[Dict[str, int]] = None) -> Dict[str, object]:  # Sammanfattning av en mätserie
+    ordered = sorted(latencies)  # Sorterat för percentiler
+    to_ms = lambda seconds: round(seconds * 1000, 2)  # Sekunder -> millisekunder
+    summary = {  # Strukturerad sammanfattning
+        "count": len(ordered),  # Lyckade mätningar
+        "errors": errors,  # Misslyckade anrop
+        "p50_ms": to_ms(percentile(ordered, 0.50)),  # Median
+        "p95_ms": to_ms(percentile(ordered, 0.95)),  # 95:e percentilen
+        "p99_ms": to_ms(percentile(ordered, 0.99)),  # 99:e percentilen
+        "mean_ms": to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,  # Medelvärde
+        "throughput_per_s": round(len(ordered) / wall_seconds, 2) if wall_seconds > 0 else 0.0,  # Lyckade per sekund
+    }  # Slut på sammanfattning
+    if statuses:  # HTTP-statusar för lasttester
+        summary["statuses"] = statuses  # T.ex. hur många som fick 429/503
+    return summary  # Returnerar sammanfattningen
+
+def load_baseline(path: Path) -> Optional[Dict[str, Dict[str, object]]]:  # Läser sparad baslinje
+    if not path.exists():  # Ingen baslinje sparad än
+        return None  # Inget att jämföra med
+    return json.loads(path.read_text(encoding="utf-8"))["results"]  # Resultat per benchmark
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, object]], meta: Dict[str, object]) -> None:  # Sparar resultaten som ny baslinje
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=2, ensure_ascii=False), encoding="utf-8")  # Läsbar JSON
+
+def compare(results: Dict[str, Dict[str, object]], baseline: Dict[str, Dict[str, object]], tolerance: float) -> List[Dict[str, object]]:  # Jämför mot baslinjen
+    rows = []  # En rad per benchmark
+    for name, current in results.items():  # Går igenom aktuella resultat
+        previous = baseline.get(name)  # Samma benchmark i baslinjen
+        if not previous or not previous.get("p95_ms"):  # Ny benchmark eller tom mätning
+            rows.append({"name": name, "status": "ny"})  # Inget att jämföra med
+            continue  # Nästa
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1  # Relativ ändring av p95 (positivt = långsammare)
+        throughput_change = (current["throughput_per_s"] / previous["throughput_per_s"] - 1) if previous.get("throughput_per_s") else 0.0  # Positivt = snabbare
+        regressed = p95_change > tolerance or throughput_change < -tolerance  # Sämre än toleransen
+        improved = p95_change < -tolerance or throughput_change > tolerance  # Bättre än toleransen
+        rows.append({  # Jämförelserad
+            "name": name,  # Benchmark
+            "p95_ms": current["p95_ms"],  # Aktuell p95
+            "baseline_p95_ms": previous["p95_ms"],  # Baslinjens p95
+            "p95_change": round(p95_change * 100, 1),  # Procent
+            "throughput_change": round(throughput_change * 100, 1),  # Procent
+            "status": "sämre" if regressed else "bättre" if improved else "oförändrad",  # Bedömning
+        })  # Slut på rad
+    return rows  # Returnerar jämförelsen
+
+def format_results(results: Dict[str, Dict[str, object]]) -> str:  # Tabell med resultat
+    header = f"{'benchmark':<36} {'n':>6} {'fel':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>9}"  # Kolumnrubriker
+    lines = [header, "-" * len(header)]  # Rubrik och linje
+    for name, r in results.items():  # En rad per benchmark
+        lines.append(f"{name:<36} {r['count']:>6} {r['errors']:>5} {r['p50_ms']:>10} {r['p95_ms']:>10} {r['p99_ms']:>10} {r['throughput_per_s']:>9}")  # Värden
+    return "\n".join(lines)  # Färdig tabell
+
+def format_comparison(rows: List[Dict[str, object]]) -> str:  # Tabell med jämförelse mot baslinjen
+    header = f"{'benchmark':<36} {'p95 ms':>10} {'bas p95':>10} {'p95 %':>8} {'per s %':>8}  status"  # Kolumnrubriker
+    lines = [header, "-" * len(header)]  # Rubrik och linje
+    for row in rows:  # En rad per benchmark
+        if "p95_ms" not in row:  # Ny benchmark
+            lines.append(f"{row['name']:<36} {'':>10} {'':>10} {'':>8} {'':>8}  {row['status']}")  # Bara status
+            continue  # Nästa
+        lines.append(f"{row['name']:<36} {row['p95_ms']:>10} {row['baseline_p95_ms']:>10} {row['p95_change']:>+8} {row['throughput_change']:>+8}  {row['status']}")  # Värden
+    return "\n".join(lines)  # Färdig tabell
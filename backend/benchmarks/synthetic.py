@@ -0,0 +1,63 @@
+import random  # Deterministiska syntetiska dokument
+from io import BytesIO  # DOCX byggs i minnet
+from typing import List  # Typangivelser för tydlighet
+
+from docx import Document  # Skapar DOCX-filer
+
+from app.services import pdf_exporter  # Samma PDF-rendering som appen
+
+SKILLS = (  # Ordförråd som liknar riktiga CV:n och annonser
+    "python", "fastapi", "django", "docker", "kubernetes", "aws", "azure", "terraform", "postgresql", "redis",
+    "react", "typescript", "javascript", "java", "kotlin", "go", "rust", "linux", "ci/cd", "github",
+    "machine learning", "data engineering", "microservices", "rest", "graphql", "kafka", "spark", "airflow",
+    "agile", "scrum", "testautomation", "säkerhet", "molntjänster", "systemarkitektur", "devops", "observability",
+)  # Slut på kompetenser
+FILLER = (  # Vanliga ord runt kompetenserna
+    "erfarenhet", "av", "arbetat", "med", "ansvar", "för", "utveckling", "team", "kunder", "projekt", "leverans",
+    "designed", "built", "operated", "improved", "performance", "reliability", "platform", "service", "users",
+)  # Slut på utfyllnad
+SECTIONS = ("PROFIL:", "ERFARENHET:", "UTBILDNING:", "KOMPETENSER:", "SPRÅK:", "CERTIFIERINGAR:")  # Rubriker som cv_sections känner igen
+
+def _sentence(rng: random.Random, words: int) -> str:  # En mening med blandade kompetenser och utfyllnad
+    return " ".join(rng.choice(SKILLS) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(words)).capitalize() + "."  # Ungefär 30 % kompetenser
+
+def cv_text(seed: int = 0, bullets_per_section: int = 40) -> str:  # Stort syntetiskt CV som text
+    rng = random.Random(seed)  # Samma seed ger samma CV
+    lines: List[str] = []  # Samlar rader
+    for section in SECTIONS:  # En rubrik i taget
+        lines.append(section)  # Rubrikrad
+        lines.extend(f"- {_sentence(rng, rng.randint(8, 20))}" for _ in range(bullets_per_section))  # Bullets
+        lines.append("")  # Tom rad mellan sektioner
+    return "\n".join(lines)  # Hela CV:t
+
+def job_text(seed: int = 0, paragraphs: int = 30) -> str:  # Stor syntetisk jobbannons som text
+    rng = random.Random(seed + 10_000)  # Egen sekvens så att annonsen inte liknar CV:t exakt
+    lines = ["Vi söker en senior utvecklare.", "Krav:"]  # Inledning
+    lines.extend(f"- {_sentence(rng, rng.randint(6, 14))}" for _ in range(paragraphs))  # Krav som bullets
+    lines.append("Meriterande:")  # Rubrik
+    lines.extend(_sentence(rng, rng.randint(10, 25)) for _ in range(paragraphs))  # Löptext
+    return "\n".join(lines)  # Hela annonsen
+
+def job_html(seed: int = 0, paragraphs: int = 30, noise_blocks: int = 60) -> str:  # Jobbannons inbäddad i en tung HTML-sida
+    rng = random.Random(seed + 20_000)  # Egen sekvens
+    nav = "".join(f"<li><a href='/p/{i}'>Länk {i}</a></li>" for i in range(noise_blocks))  # Meny med många länkar
+    noise = "".join(f"<div class='related-jobs'><a href='/job/{i}'>{_sentence(rng, 6)}</a></div>" for i in range(noise_blocks))  # Liknande jobb
+    body = "".join(f"<p>{line}</p>" for line in job_text(seed, paragraphs).splitlines())  # Själva annonsen
+    return (  # Hela sidan
+        "<html><head><title>Jobb</title><script>var x = 1;</script><style>p{}</style></head><body>"
+        f"<nav><ul>{nav}</ul></nav><div id='cookie-banner'>Vi använder kakor. Acceptera alla cookies.</div>"
+        f"<main><article class='job-description'><h1>Senior utvecklare</h1>{body}</article></main>"
+        f"<aside>{noise}</aside><footer>© Företaget. Alla rättigheter förbehållna.</footer></body></html>"
+    )  # Slut på sida
+
+def cv_docx_bytes(seed: int = 0, bullets_per_section: int = 40) -> bytes:  # Syntetiskt CV som DOCX
+    doc = Document()  # Tomt dokument
+    for line in cv_text(seed, bullets_per_section).splitlines():  # Samma text som cv_text
+        if line:  # Hoppar över tomma rader
+            doc.add_paragraph(line)  # En paragraf per rad
+    buffer = BytesIO()  # Minnesbuffert
+    doc.save(buffer)  # Sparar DOCX
+    return buffer.getvalue()  # DOCX-bytes
+
+def cv_pdf_bytes(seed: int = 0, bullets_per_section: int = 40) -> bytes:  # Syntetiskt CV som PDF (flera sidor)
+    return pdf_exporter.render_pdf_bytes(cv_text(seed, bullets_per_section))  # Samma renderare som appen
@@ -0,0 +1,7 @@
+import os  # Miljövariabler sätts innan app-moduler importeras
+import sys  # Gör app-paketet importerbart
+import tempfile  # Temporär datamapp för testerna
+from pathlib import Path  # Sökväg till backend-mappen
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # backend/ först i sökvägen, så att "app" hittas
+os.environ.setdefault("CV_DATA_DIR", tempfile.mkdtemp(prefix="cv-tests-"))  # Testerna skriver aldrig till den riktiga datamappen
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.services import batch_optimizer, llm_scheduler, lm_studio_client
+
+
+def _run_batch(items, max_parallel=1):
+    async def collect():
+        return [event async for event in batch_optimizer.optimize_batch("PROFIL:\n- Python", items, max_parallel)]
+    return asyncio.run(collect())
+
+
+def test_full_queue_fails_item_after_bounded_retries(monkeypatch):
+    attempts = []
+
+    async def always_full(cv_text, job_text, priority, context=None):
+        attempts.append(job_text)
+        raise llm_scheduler.QueueFullError("Kön är full", retry_after=0)
+
+    monkeypatch.setattr(lm_studio_client, "optimize_cv", always_full)
+    monkeypatch.setattr(batch_optimizer, "BATCH_MAX_ADMISSION_ATTEMPTS", 3)
+    events = _run_batch([batch_optimizer.BatchItem(0, text="Jobb A"), batch_optimizer.BatchItem(1, text="Jobb B")])
+    jobs = [e for e in events if e["type"] == "job"]
+    assert len(attempts) == 6  # Tre försök per jobbannons, sedan ges den upp
+    assert {j["status"] for j in jobs} == {"failed"}
+    assert all("3 försök" in j["error"] for j in jobs)
+    assert events[-1]["failed"] == 2
+
+
+def test_retry_succeeds_and_other_items_are_not_blocked(monkeypatch):
+    rejected = set()
+
+    async def full_once(cv_text, job_text, priority, context=None):
+        if job_text not in rejected:  # Första försöket per jobb avvisas
+            rejected.add(job_text)
+            raise llm_scheduler.QueueFullError("Kön är full", retry_after=0)
+        return f"CV för {job_text}"
+
+    monkeypatch.setattr(lm_studio_client, "optimize_cv", full_once)
+    events = _run_batch([batch_optimizer.BatchItem(0, text="Jobb A"), batch_optimizer.BatchItem(1, text="Jobb B")])
+    jobs = sorted((e for e in events if e["type"] == "job"), key=lambda e: e["index"])
+    assert [j["optimized_cv"] for j in jobs] == ["CV för Jobb A", "CV för Jobb B"]
+    assert events[-1]["succeeded"] == 2
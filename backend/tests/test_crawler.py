@@ -0,0 +1,22 @@
+import asyncio
+
+from app.services import crawler
+
+
+def test_domain_reservations_are_pruned(monkeypatch):
+    monkeypatch.setattr(crawler, "DOMAIN_PRUNE_THRESHOLD", 3)
+    monkeypatch.setattr(crawler, "CRAWL_DOMAIN_INTERVAL", 0.0)
+    monkeypatch.setattr(crawler, "_next_allowed", {})
+
+    async def crawl():
+        for index in range(10):
+            await crawler._polite_wait(f"https://site{index}.example/jobb")
+
+    asyncio.run(crawl())
+    assert len(crawler._next_allowed) <= 3
+
+
+def test_pending_domains_are_kept(monkeypatch):
+    monkeypatch.setattr(crawler, "_next_allowed", {"old.example": 1.0, "busy.example": 100.0})
+    crawler._prune_domains(50.0)
+    assert crawler._next_allowed == {"busy.example": 100.0}
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.services import cv_sections, llm_scheduler, lm_studio_client
+from app.services.cv_sections import split_sections
+
+CV = """Anna Andersson
+anna@example.com
+
+PROFIL
+Backendutvecklare med fokus på Python.
+
+Erfarenhet:
+Acme AB:
+- Byggde API:er i FastAPI
+- Drev migrering till PostgreSQL
+
+UTBILDNING
+KTH
+"""
+
+
+def test_sections_split_at_headings_and_keep_header_block():
+    sections = split_sections(CV)
+    assert [s.heading for s in sections] == ["", "PROFIL", "Erfarenhet:", "UTBILDNING"]
+    assert sections[0].text == "Anna Andersson\nanna@example.com"
+
+
+def test_heading_directly_after_heading_is_content():
+    sections = split_sections(CV)
+    assert "Acme AB:" in sections[2].lines  # Arbetsgivaren är inte en egen sektion
+    assert sections[3].text == "UTBILDNING\nKTH"  # "KTH" är versaler men följer direkt på rubriken
+
+
+def test_sections_rejoin_to_the_original_content():
+    joined = "\n\n".join(s.text for s in split_sections(CV))
+    assert [line for line in joined.splitlines() if line] == [line.strip() for line in CV.splitlines() if line.strip()]
+
+
+def test_many_sections_are_not_rejected_by_the_queue(monkeypatch):
+    scheduler = llm_scheduler.LLMScheduler(1, 16, 12, 300.0)
+    scheduler.avg_duration = 60.0  # Sjunde köplatsen skulle ge (6 + 1) * 60 > 300 sekunder
+    monkeypatch.setattr(llm_scheduler, "scheduler", scheduler)
+
+    async def fake_optimize_section(context, section_text, job_text, priority):
+        async with scheduler.slot(priority):
+            await asyncio.sleep(0)
+        return section_text.upper(), False
+
+    monkeypatch.setattr(lm_studio_client, "optimize_section", fake_optimize_section)
+    cv_text = "\n\n".join(f"RUBRIK {i}:\nRad {i}" for i in range(10))
+    result = asyncio.run(cv_sections.optimize_sections(cv_text, "Krav: Python"))
+    assert result["sections_total"] == 10
+    assert result["optimized_cv"].startswith("RUBRIK 0:\nRAD 0")
+    assert scheduler.stats()["rejected"] == {"queue_full": 0, "overloaded": 0}
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.services import cv_storage
+
+
+def test_read_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(cv_storage, "STORAGE_CACHE_MAX_ENTRIES", 2)
+    cv_storage._cache.clear()
+
+    async def scenario():
+        await cv_storage.save_master_cv("CV a", "lru-a")
+        await cv_storage.save_master_cv("CV b", "lru-b")
+        assert await cv_storage.get_master_cv("lru-a") == "CV a"  # a blir senast använd
+        await cv_storage.save_master_cv("CV c", "lru-c")  # Tredje dokumentet tvingar fram en borttagning
+
+    asyncio.run(scenario())
+    keys = list(cv_storage._cache)
+    assert ("lru-a", cv_storage.KIND_MASTER_CV) in keys  # Läst nyligen, behålls
+    assert ("lru-b", cv_storage.KIND_MASTER_CV) not in keys  # Minst nyligen använd tas bort
+
+
+def test_evicted_document_is_read_back_from_disk(monkeypatch):
+    monkeypatch.setattr(cv_storage, "STORAGE_CACHE_MAX_ENTRIES", 1)
+    cv_storage._cache.clear()
+
+    async def scenario():
+        await cv_storage.save_master_cv("Första", "disk-a")
+        await cv_storage.save_master_cv("Andra", "disk-b")  # disk-a lämnar cachen
+        return await cv_storage.get_master_cv("disk-a")
+
+    assert asyncio.run(scenario()) == "Första"
@@ -0,0 +1,102 @@
+import io
+import zipfile
+
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import cv_reader, document_ingest, worker_pool
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx_bytes(*paragraphs):  # Ett riktigt Word-dokument i minnet
+    document = Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _zip_bytes(entries):  # Zip-arkiv med (namn, innehåll); innehåll None ger en mapp
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            if data is None:
+                archive.writestr(zipfile.ZipInfo(name), b"")
+            else:
+                archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):  # Egen cachemapp för tolkad text
+    monkeypatch.setattr(cv_reader, "PARSED_CACHE_DIR", tmp_path / "parsed_text")
+    yield TestClient(app)
+    worker_pool.shutdown()
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):  # Räknar verkliga tolkningar i processpoolen
+    calls = []
+    real_read_docx = cv_reader._read_docx
+
+    async def counting_read_docx(file_path):
+        calls.append(file_path)
+        return await real_read_docx(file_path)
+
+    monkeypatch.setattr(cv_reader, "_read_docx", counting_read_docx)
+    return calls
+
+
+def test_reupload_of_same_bytes_uses_parsed_text_cache(client, parse_calls):
+    data = _docx_bytes("Anna Andersson", "PROFIL:", "Python-utvecklare")
+    first = client.post("/api/cv/upload", files={"file": ("cv.docx", data, DOCX_TYPE)})
+    second = client.post("/api/cv/upload", files={"file": ("annat-namn.docx", data, DOCX_TYPE)})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["text"] == second.json()["text"] == "Anna Andersson\nPROFIL:\nPython-utvecklare"
+    assert len(parse_calls) == 1  # Andra uppladdningen kom från cachen
+
+
+def test_zip_skips_unsupported_entries_and_reports_broken_files(client):
+    archive = _zip_bytes([
+        ("cv/anna.docx", _docx_bytes("Anna")),
+        ("cv/", None),
+        ("cv/.dold.docx", _docx_bytes("Dold")),
+        ("__MACOSX/cv/._anna.docx", b"metadata"),
+        ("cv/anteckningar.txt", b"inte ett CV"),
+        ("cv/trasig.pdf", b"inte en pdf"),
+    ])
+    response = client.post("/api/cv/upload-zip", files={"file": ("cv.zip", archive, "application/zip")})
+    assert response.status_code == 200
+    result = response.json()
+    assert [f["filename"] for f in result["files"]] == ["cv/anna.docx", "cv/trasig.pdf"]
+    assert result["files"][0]["text"] == "Anna"
+    assert result["files"][1]["success"] is False and "PDF" in result["files"][1]["error"]
+    assert (result["total"], result["succeeded"], result["failed"]) == (2, 1, 1)
+
+
+def test_oversized_upload_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(document_ingest, "UPLOAD_MAX_BYTES", 100)
+    response = client.post("/api/cv/upload-zip", files={"file": ("cv.zip", b"x" * 1000, "application/zip")})
+    assert response.status_code == 413
+
+
+def test_zip_bomb_is_rejected_before_extraction(client, monkeypatch):
+    monkeypatch.setattr(document_ingest, "ZIP_MAX_UNCOMPRESSED_BYTES", 10_000)
+    archive = _zip_bytes([("bomb.pdf", b"\0" * 1_000_000)])  # Packas till någon kilobyte
+    assert len(archive) < 10_000
+    response = client.post("/api/cv/upload-zip", files={"file": ("cv.zip", archive, "application/zip")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Arkivet är för stort uppackat"
+
+
+def test_too_many_files_and_invalid_zip_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(document_ingest, "ZIP_MAX_FILES", 1)
+    archive = _zip_bytes([("a.docx", b"a"), ("b.docx", b"b")])
+    assert client.post("/api/cv/upload-zip", files={"file": ("cv.zip", archive, "application/zip")}).status_code == 400
+    response = client.post("/api/cv/upload-zip", files={"file": ("cv.zip", b"inte zip", "application/zip")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Filen är inte ett giltigt zip-arkiv"
@@ -0,0 +1,72 @@
+import pytest
+
+from app.services import keyword_extractor
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("erfarenheter", "erfarenhet"),  # Plural -> singular, inte "erfarenh"
+    ("erfarenhet", "erfarenhet"),  # Grundformen lämnas orörd
+    ("process", "process"),  # Dubbel-s hör till stammen
+    ("status", "status"),  # -us är inte plural
+    ("analysis", "analysis"),  # -is är inte plural
+    ("angular", "angular"),  # -ar tas inte bort
+    ("utvecklare", "utvecklare"),  # Yrket ensamt lämnas orört
+    ("pythonutvecklare", "python"),  # Sammansättning -> kompetensen
+    ("python3", "python"),  # Versionsnummer tas bort
+    ("lösningar", "lösning"),  # Svensk plural
+    ("kunderna", "kund"),  # Bestämd plural
+    ("technologies", "technology"),  # Engelsk -ies
+    ("services", "service"),  # Engelsk plural
+    ("docker", "docker"),  # Skyddat tekniskt namn
+])
+def test_stem(word, expected):
+    assert keyword_extractor.stem(word) == expected
+
+
+def test_stem_strips_at_most_one_suffix():
+    assert keyword_extractor.stem("kundernas") == "kunderna"  # Bara -s, inte -s och sedan -erna
+    assert keyword_extractor.stem("javautvecklarna") == "java"  # Sammansättningen räknas som den enda borttagningen
+
+
+def test_normalize_text_unchanged():
+    assert keyword_extractor.normalize_text("Python3, CI/CD och Docker!") == ["python3", "docker"]  # Samma ord som före stamningen
+
+
+def test_skill_matcher_finds_phrases_in_one_pass():
+    matcher = keyword_extractor.SkillMatcher(["machine learning", "learning analytics", "ci/cd", "google cloud", "google cloud platform"])
+    stems = [keyword_extractor.stem(t) for t in keyword_extractor.tokenize("Machine learning analytics på Google Cloud Platform med CI/CD")]
+    found = [phrase for _, phrase in matcher.find(stems)]
+    assert found == ["machine learning", "learning analytics", "google cloud", "google cloud platform", "ci/cd"]  # Överlappande träffar via fail-länkar
+
+
+def test_skill_matcher_ignores_partial_phrases():
+    matcher = keyword_extractor.SkillMatcher(["machine learning"])
+    assert list(matcher.find(["machine", "vision"])) == []  # Bara första ordet matchar
+
+
+def test_extract_keywords_merges_variants_and_ranks_skills():
+    keywords = keyword_extractor.extract_keywords("Python, python3 och pythonutvecklare. Machine learning. Docker.", 5)
+    assert keywords[:2] == ["python", "machine learning"]  # Tre python-varianter, en kompetens med dubbel vikt
+    assert "python" in keywords and "python3" not in keywords and "pythonutvecklare" not in keywords  # En post per stam, vanligaste formen visas
+
+
+def test_compare_keywords_matches_inflected_forms():
+    result = keyword_extractor.compare_keywords("Jag har erfarenheter av python", "Erfarenhet av Python", 10)
+    assert set(result) == {"job_keywords", "cv_keywords", "matched", "missing"}  # Samma fält som tidigare
+    assert result["matched"] == ["erfarenheter", "python"]  # Böjd form räknas som träff (tidigare bara "python")
+    assert result["missing"] == ["har", "jag"]  # Resten saknas i CV:t
+
+
+def test_compare_keywords_matches_outside_cv_top_n():
+    cv = "java " * 5 + "kotlin"  # Kotlin hamnar utanför CV:ts topp-1
+    result = keyword_extractor.compare_keywords("kotlin", cv, 1)
+    assert result["cv_keywords"] == ["java"]
+    assert result["matched"] == ["kotlin"]  # Hela CV:t räknas, inte bara topplistan
+
+
+def test_analysis_is_cached_per_content_hash():
+    text = "Unik text för cachetestet: rust, go och wasm"
+    before = keyword_extractor.stats()["hits"]
+    first = keyword_extractor.analyze(text)
+    assert keyword_extractor.analyze(text) is first  # Samma innehåll ger samma analys
+    assert keyword_extractor.stats()["hits"] == before + 1
@@ -0,0 +1,68 @@
+import math
+from collections import Counter
+
+import pytest
+
+from app.services import keyword_scoring
+from app.services.keyword_scoring import KeywordScoringEngine, extract_terms
+
+DOCS = [
+    "Python developer with Django and PostgreSQL experience.",
+    "Java developer, Spring Boot, Kubernetes.",
+    "Data engineer: Python, Spark, Airflow and PostgreSQL.",
+]
+CV = "Python and Django developer who knows PostgreSQL"
+
+
+def _naive_bm25(docs, query, k1=keyword_scoring.BM25_K1, b=keyword_scoring.BM25_B):  # Referens utan matriser
+    doc_terms = [Counter(extract_terms(d)) for d in docs]
+    avg_len = sum(sum(c.values()) for c in doc_terms) / len(docs)
+    query_terms = set(extract_terms(query))
+    scores = []
+    for counts in doc_terms:
+        length = sum(counts.values())
+        total = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            df = sum(1 for c in doc_terms if term in c)
+            idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+            total += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(total)
+    return scores
+
+
+def test_extract_terms_builds_ngrams_within_fragments():
+    terms = extract_terms("Machine learning, Python")
+    assert "machine learning" in terms
+    assert "learning python" not in terms  # Kommatecknet bryter n-grammet
+
+
+def test_bm25_matches_reference_formula():
+    engine = KeywordScoringEngine(DOCS)
+    scores = engine.score(CV, keyword_scoring.METHOD_BM25)
+    assert scores == pytest.approx(_naive_bm25(DOCS, CV))
+
+
+def test_tfidf_is_cosine_similarity():
+    engine = KeywordScoringEngine(DOCS)
+    scores = engine.score(DOCS[1], keyword_scoring.METHOD_TFIDF)
+    assert scores[1] == pytest.approx(1.0)  # Samma text ger cosinus 1
+    assert all(0.0 <= s <= 1.0 + 1e-9 for s in scores)
+
+
+def test_rank_orders_best_match_first_and_lists_missing_terms():
+    engine = KeywordScoringEngine(DOCS)
+    matches = engine.rank(CV, top_k=2)
+    assert [m["index"] for m in matches] == [0, 2]
+    missing = {entry["term"] for entry in matches[1]["missing"]}
+    assert "spark" in missing and "python" not in missing
+    assert 0.0 < matches[0]["coverage"] <= 1.0
+
+
+def test_rank_handles_empty_requests_and_unknown_method():
+    engine = KeywordScoringEngine(DOCS)
+    assert engine.rank(CV, top_k=0) == []
+    with pytest.raises(ValueError):
+        engine.score(CV, "okänd")
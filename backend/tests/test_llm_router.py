@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+import httpx
+import pytest
+
+from app.services import llm_router, llm_scheduler
+from app.services.llm_router import Backend, BackendFailure, LLMRouter, NoBackendAvailableError
+
+
+def _fail_once(router, exclude=None):
+    async def scenario():
+        with pytest.raises(BackendFailure):
+            async with router.lease(exclude if exclude is not None else set()):
+                raise httpx.ConnectError("nere")
+
+    asyncio.run(scenario())
+
+
+def test_circuit_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(llm_router, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    backend = Backend("a", "http://a/v1/chat/completions", "m")
+    router = LLMRouter([backend])
+    _fail_once(router)
+    assert backend.state == llm_router.STATE_CLOSED
+    _fail_once(router)
+    assert backend.state == llm_router.STATE_OPEN
+    with pytest.raises(NoBackendAvailableError) as info:
+        router.pick(set())
+    assert info.value.retry_after >= 1
+
+
+def test_half_open_probe_closes_or_reopens_circuit(monkeypatch):
+    monkeypatch.setattr(llm_router, "CIRCUIT_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(llm_router, "CIRCUIT_OPEN_SECONDS", 0.0)
+    backend = Backend("a", "http://a/v1/chat/completions", "m")
+    router = LLMRouter([backend])
+    _fail_once(router)
+    assert backend.state == llm_router.STATE_OPEN
+    assert backend.available(backend.opened_at) is True  # Vilotiden är slut
+    assert backend.state == llm_router.STATE_HALF_OPEN
+    _fail_once(router)  # Provet misslyckas
+    assert backend.state == llm_router.STATE_OPEN
+
+    async def succeed():
+        async with router.lease(set()):
+            pass
+
+    backend.available(backend.opened_at)
+    asyncio.run(succeed())  # Lyckat prov stänger kretsen
+    assert backend.state == llm_router.STATE_CLOSED
+    assert backend.consecutive_failures == 0
+
+
+def test_half_open_allows_a_single_probe():
+    backend = Backend("a", "http://a/v1/chat/completions", "m")
+    backend.state = llm_router.STATE_HALF_OPEN
+    backend.probe_in_flight = True
+    assert backend.available(0.0) is False
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    backend = Backend("a", "http://a/v1/chat/completions", "m")
+    router = LLMRouter([backend])
+    response = httpx.Response(400, request=httpx.Request("POST", backend.url))
+
+    async def scenario():
+        with pytest.raises(httpx.HTTPStatusError):
+            async with router.lease(set()):
+                raise httpx.HTTPStatusError("fel", request=response.request, response=response)
+
+    asyncio.run(scenario())
+    assert backend.consecutive_failures == 0
+
+
+def test_failover_skips_backends_already_tried():
+    first = Backend("a", "http://a/v1/chat/completions", "m")
+    second = Backend("b", "http://b/v1/chat/completions", "m")
+    router = LLMRouter([first, second])
+    exclude = set()
+    _fail_once(router, exclude)
+    assert router.pick(exclude) is second
+    assert router.stats()["failovers"] == 0
+
+
+def test_invalid_backend_config_falls_back_to_default(caplog):
+    with caplog.at_level(logging.ERROR, logger=llm_router.__name__):
+        backends = llm_router._load_backends("[{not json")
+    assert [b.name for b in backends] == ["default"]
+    assert "LLM_BACKENDS" in caplog.text
+    assert [b.name for b in llm_router._load_backends('[{"name": "x"}]')] == ["default"]  # url saknas
+
+
+def test_scheduler_capacity_follows_backends(monkeypatch):
+    monkeypatch.delenv("LLM_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setattr(llm_scheduler.scheduler, "max_concurrency", 1)
+    router = LLMRouter([Backend("a", "http://a", "m", 2), Backend("b", "http://b", "m", 3)])
+    router.apply_scheduler_capacity()
+    assert llm_scheduler.scheduler.max_concurrency == 5
+
+
+def test_backend_with_another_model_is_rejected(caplog):
+    config = '[{"name": "a", "url": "http://a/v1/chat/completions"}, {"name": "b", "url": "http://b/v1/chat/completions", "model": "annan-modell"}]'
+    with caplog.at_level(logging.ERROR, logger=llm_router.__name__):
+        backends = llm_router._load_backends(config)
+    assert [b.name for b in backends] == ["default"]  # Olika modeller skulle dela cache-nycklar
+    assert "annan-modell" in caplog.text
+    same_model = f'[{{"url": "http://a/v1/chat/completions", "model": "{llm_router.DEFAULT_MODEL}"}}]'
+    assert [b.name for b in llm_router._load_backends(same_model)] == ["backend-0"]
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    QueueFullError,
+    QueueOverloadedError,
+)
+
+
+def _scheduler(**overrides):
+    options = {"max_concurrency": 1, "max_queue": 4, "max_batch_queue": 2, "max_queue_wait": 1000.0}
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+def test_interactive_requests_jump_ahead_of_batch():
+    async def scenario():
+        scheduler = _scheduler()
+        running = scheduler.enter(PRIORITY_BATCH)  # Får platsen direkt
+        batch = scheduler.enter(PRIORITY_BATCH)
+        interactive = scheduler.enter(PRIORITY_INTERACTIVE)
+        assert scheduler.position(interactive) == 0 and scheduler.position(batch) == 1
+        scheduler.release(running)
+        assert interactive.granted.done() and not batch.granted.done()
+        scheduler.release(interactive)
+        assert batch.granted.done()
+
+    asyncio.run(scenario())
+
+
+def test_batch_queue_limit_reserves_room_for_interactive():
+    async def scenario():
+        scheduler = _scheduler()
+        scheduler.enter(PRIORITY_BATCH)
+        scheduler.enter(PRIORITY_BATCH)
+        scheduler.enter(PRIORITY_BATCH)
+        with pytest.raises(QueueFullError) as info:
+            scheduler.enter(PRIORITY_BATCH)  # Batchens två köplatser är slut
+        assert info.value.retry_after >= 1
+        scheduler.enter(PRIORITY_INTERACTIVE)  # Interaktiva får fortfarande plats
+        assert scheduler.stats()["rejected"]["queue_full"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_long_estimated_wait_is_rejected_up_front():
+    async def scenario():
+        scheduler = _scheduler(max_queue_wait=30.0)
+        scheduler.avg_duration = 20.0
+        scheduler.enter()
+        scheduler.enter()  # Väntar en generering (20 s)
+        with pytest.raises(QueueOverloadedError) as info:
+            scheduler.enter()  # Skulle vänta 40 s
+        assert info.value.retry_after == 40
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = _scheduler()
+        running = scheduler.enter()
+        waiter = asyncio.ensure_future(scheduler.wait(scheduler.enter()))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.stats()["queued"][PRIORITY_INTERACTIVE] == 0
+        scheduler.release(running)
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(scenario())
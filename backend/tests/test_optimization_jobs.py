@@ -0,0 +1,74 @@
+import asyncio
+
+from app.services import cv_sections, llm_scheduler, lm_studio_client, optimization_jobs
+
+
+async def _wait_for_job(job_id):  # Väntar tills bakgrunds-tasken är klar
+    task = optimization_jobs._tasks.get(job_id)
+    if task is not None:
+        await asyncio.gather(task, return_exceptions=True)
+    return await optimization_jobs.get(job_id)
+
+
+def test_job_dispatches_on_mode_and_language(monkeypatch):
+    calls = []
+
+    async def languages(cv_text, job_text, language, priority):
+        calls.append(("languages", language))
+        return "=== ENGLISH CV ===\nCV"
+
+    async def sections(cv_text, job_text, priority):
+        calls.append(("sections", None))
+        return {"optimized_cv": "sektioner"}
+
+    monkeypatch.setattr(lm_studio_client, "optimize_cv_languages", languages)
+    monkeypatch.setattr(cv_sections, "optimize_sections", sections)
+
+    async def scenario():
+        english = await optimization_jobs.submit("CV", "Jobb", "batch", "full", "en")
+        split = await optimization_jobs.submit("CV", "Jobb", "batch", "sections", "both")
+        return await _wait_for_job(english["id"]), await _wait_for_job(split["id"])
+
+    english, split = asyncio.run(scenario())
+    assert calls == [("languages", "en"), ("sections", None)]  # Samma val som /optimize
+    assert (english["mode"], english["language"], english["result"]) == ("full", "en", "=== ENGLISH CV ===\nCV")
+    assert (split["mode"], split["status"], split["result"]) == ("sections", optimization_jobs.STATUS_DONE, "sektioner")
+
+
+def test_admission_retries_are_bounded(monkeypatch):
+    attempts = 0
+
+    async def always_full(cv_text, job_text, priority):
+        nonlocal attempts
+        attempts += 1
+        raise llm_scheduler.QueueFullError("Kön är full", retry_after=0)
+
+    monkeypatch.setattr(lm_studio_client, "optimize_cv", always_full)
+    monkeypatch.setattr(optimization_jobs, "JOB_MAX_ADMISSION_ATTEMPTS", 3)
+
+    async def scenario():
+        job = await optimization_jobs.submit("CV", "Jobb full kö", "batch")
+        return await _wait_for_job(job["id"])
+
+    job = asyncio.run(scenario())
+    assert attempts == 3
+    assert job["status"] == optimization_jobs.STATUS_FAILED  # Ger upp i stället för att loopa för evigt
+    assert "3 försök" in job["error"]
+
+
+def test_cancel_stops_waiting_job(monkeypatch):
+    async def never_finishes(cv_text, job_text, priority):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(lm_studio_client, "optimize_cv", never_finishes)
+
+    async def scenario():
+        job = await optimization_jobs.submit("CV", "Jobb som avbryts", "batch")
+        await asyncio.sleep(0.05)  # Jobbet hinner starta
+        cancelled = await optimization_jobs.cancel(job["id"])
+        return cancelled, await _wait_for_job(job["id"]), await optimization_jobs.cancel("okänt-id")
+
+    cancelled, final, unknown = asyncio.run(scenario())
+    assert cancelled["status"] == optimization_jobs.STATUS_CANCELLED
+    assert final["status"] == optimization_jobs.STATUS_CANCELLED
+    assert unknown is None
@@ -0,0 +1,26 @@
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from app.services import pdf_exporter
+
+
+def _width(line):
+    return stringWidth(line, pdf_exporter.FONT_NAME, pdf_exporter.FONT_SIZE)
+
+
+def test_lines_fit_the_width_and_keep_all_words():
+    text = "Backendutvecklare med lång erfarenhet av Python, FastAPI och PostgreSQL i molnmiljöer. " * 3
+    lines = pdf_exporter._wrap_text(text, 150)
+    assert len(lines) > 1
+    assert all(_width(line) <= 150 for line in lines)
+    assert " ".join(lines).split() == text.split()
+
+
+def test_blank_lines_are_kept_for_spacing():
+    assert pdf_exporter._wrap_text("Profil\n\nErfarenhet", 500) == ["Profil", "", "Erfarenhet"]
+
+
+def test_words_wider_than_a_line_are_split():
+    url = "https://example.com/" + "a" * 200
+    lines = pdf_exporter._wrap_text(url, 100)
+    assert "".join(lines) == url
+    assert all(_width(line) <= 100 for line in lines)
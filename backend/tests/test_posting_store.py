@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import posting_store
+
+POSTINGS = [
+    "Python-utvecklare\nPython, Django och PostgreSQL i molnet.",
+    "Javautvecklare\nJava, Spring och Kubernetes.",
+    "Dataingenjör\nPython, Spark och Airflow.",
+    "Frontendutvecklare\nReact, TypeScript och CSS.",
+]
+CV = "Python Django PostgreSQL Spark"
+
+
+@pytest.fixture
+def added(tmp_path, monkeypatch):  # Egen databas och tomt minnesindex per test, fylld med POSTINGS
+    monkeypatch.setattr(posting_store, "POSTINGS_DB_FILE", tmp_path / "postings.sqlite3")
+    monkeypatch.setattr(posting_store, "_memory", None)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(posting_store.time, "time", lambda: float(next(clock)))
+
+    async def fill():
+        return [await posting_store.add_posting(text) for text in POSTINGS]
+
+    return asyncio.run(fill())
+
+
+def test_same_text_is_stored_once(added):
+    again = asyncio.run(posting_store.add_posting(POSTINGS[0] + "\n"))
+    assert again == {**added[0], "created": False}
+    assert asyncio.run(posting_store.list_postings())["total"] == len(POSTINGS)
+
+
+def test_search_ranks_by_matching_terms(added):
+    result = asyncio.run(posting_store.search(CV))
+    assert result["total"] == 2  # Java- och frontendannonsen delar inga termer med CV:t
+    assert [item["title"] for item in result["items"]] == ["Python-utvecklare", "Dataingenjör"]
+    assert result["items"][0]["matched_terms"] == 3
+
+
+def test_search_pages_through_results(added):
+    first = asyncio.run(posting_store.search(CV, limit=1, offset=0))
+    second = asyncio.run(posting_store.search(CV, limit=1, offset=1))
+    beyond = asyncio.run(posting_store.search(CV, limit=1, offset=5))
+    assert [first["items"][0]["title"], second["items"][0]["title"]] == ["Python-utvecklare", "Dataingenjör"]
+    assert beyond == {"total": 2, "items": []}
+
+
+def test_search_filters_on_added_date(added):
+    cutoff = added[2]["added_at"]  # Dataingenjören lades till sist av de två träffarna
+    newer = asyncio.run(posting_store.search(CV, added_after=cutoff))
+    older = asyncio.run(posting_store.search(CV, added_before=cutoff))
+    assert [item["title"] for item in newer["items"]] == ["Dataingenjör"]
+    assert [item["title"] for item in older["items"]] == ["Python-utvecklare"]
+
+
+def test_warm_up_loads_index_and_later_additions_are_searchable(added, monkeypatch):
+    before = asyncio.run(posting_store.search(CV))
+    monkeypatch.setattr(posting_store, "_memory", None)  # Som efter en omstart
+    assert asyncio.run(posting_store.warm_up()) == len(POSTINGS)
+    assert asyncio.run(posting_store.search(CV)) == before  # Samma resultat från indexet på disk
+    asyncio.run(posting_store.add_posting("Backendutvecklare\nPython och Django."))
+    titles = [item["title"] for item in asyncio.run(posting_store.search(CV))["items"]]
+    assert "Backendutvecklare" in titles
+
+
+def test_shutdown_cancels_unfinished_warm_up(monkeypatch):
+    async def slow_warm_up():
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(posting_store, "warm_up", slow_warm_up)
+    with TestClient(app):
+        task = app.state.posting_index_warm_up
+    assert task.cancelled()
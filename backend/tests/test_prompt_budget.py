@@ -0,0 +1,67 @@
+from app.services import prompt_budget
+
+POSTING = "\n".join([
+    "Om oss: vi är ett växande bolag i Göteborg.",
+    "Krav: erfarenhet av Python och PostgreSQL.",
+    "Krav: erfarenhet av Python och PostgreSQL.",
+    "Logga in för att spara annonsen.",
+    "Vi har ett trevligt kontor.",
+    "Meriterande: Kubernetes, Docker och CI/CD.",
+])
+
+
+def test_duplicates_are_dropped_and_boilerplate_kept_when_it_fits():
+    compressed = prompt_budget.compress_job_posting(POSTING, 10_000)
+    lines = compressed.text.splitlines()
+    assert lines.count("Krav: erfarenhet av Python och PostgreSQL.") == 1
+    assert "Logga in för att spara annonsen." in lines  # Ryms, så inget rensas bort
+    assert compressed.sentences_before == 6 and compressed.sentences_after == 5
+
+
+def test_boilerplate_is_dropped_when_over_budget():
+    budget = prompt_budget.estimate_tokens(POSTING) // 2
+    compressed = prompt_budget.compress_job_posting(POSTING, budget)
+    assert "Logga in" not in compressed.text
+
+
+def test_words_containing_boilerplate_terms_are_not_boilerplate():
+    for line in (
+        "- Erfarenhet av SharePoint",
+        "- Vana att jobba i sprintar",
+        "- Shared memory och printf-debugging",
+        "- Design in Figma",
+        "- Catalog integration",
+    ):
+        assert not prompt_budget._is_boilerplate(line), line
+    assert prompt_budget._is_boilerplate("Dela annonsen")
+    assert prompt_budget._is_boilerplate("Share")
+    assert prompt_budget._is_boilerplate("© 2024 Acme AB")
+
+
+def test_requirement_bullets_survive_compression():
+    posting = "\n".join([
+        "Backend developer",
+        "Vi söker en utvecklare.",
+        "- Erfarenhet av SharePoint",
+        "- Vana att jobba i sprintar",
+        "- Shared memory och printf-debugging",
+    ])
+    for budget in (10_000, prompt_budget.estimate_tokens(posting) - 1):
+        text = prompt_budget.compress_job_posting(posting, budget).text
+        assert "SharePoint" in text and "sprintar" in text, budget
+
+
+def test_tight_budget_keeps_requirements_in_original_order():
+    budget = prompt_budget.estimate_tokens("Krav: erfarenhet av Python och PostgreSQL.\nMeriterande: Kubernetes, Docker och CI/CD.")
+    compressed = prompt_budget.compress_job_posting(POSTING, budget)
+    assert compressed.text.splitlines() == [
+        "Krav: erfarenhet av Python och PostgreSQL.",
+        "Meriterande: Kubernetes, Docker och CI/CD.",
+    ]
+    assert compressed.tokens_after <= budget < compressed.tokens_before
+
+
+def test_job_budget_stays_within_limits():
+    assert prompt_budget.job_token_budget("") == prompt_budget.JOB_MAX_TOKENS
+    huge_prefix = "ord " * prompt_budget.CONTEXT_TOKENS
+    assert prompt_budget.job_token_budget(huge_prefix) == prompt_budget.JOB_MIN_TOKENS
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app.services import result_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache, "CACHE_DB_FILE", tmp_path / "cache.sqlite3")
+    return result_cache
+
+
+def test_keys_ignore_whitespace_differences():
+    first = result_cache.make_key("v1", result_cache.normalize_text_for_key("Python  dev\n\n- Django "))
+    second = result_cache.make_key("v1", result_cache.normalize_text_for_key("  Python dev\n- Django"))
+    assert first == second
+
+
+def test_expired_entries_are_misses(cache, monkeypatch):
+    asyncio.run(cache.store("k", "värde"))
+    assert asyncio.run(cache.lookup("k")) == "värde"
+    monkeypatch.setattr(cache, "CACHE_TTL_SECONDS", -1)
+    assert asyncio.run(cache.lookup("k")) is None
+
+
+def test_least_recently_used_entry_is_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_ENTRIES", 2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(cache.time, "time", lambda: float(next(clock)))
+
+    async def scenario():
+        await cache.store("a", "A")
+        await cache.store("b", "B")
+        assert await cache.lookup("a") == "A"  # a används senare än b
+        await cache.store("c", "C")
+        return [await cache.lookup(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == ["A", None, "C"]
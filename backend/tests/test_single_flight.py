@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import FlightAbandoned, SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()  # Håller arbetet pågående tills alla anslutit
+            return "svar"
+
+        waiters = [asyncio.ensure_future(flights.run("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.stats() == {"in_flight": 1, "waiters": 3, "coalesced": 2}
+        release.set()
+        assert await asyncio.gather(*waiters) == ["svar"] * 3
+        assert calls == 1
+        assert flights.stats() == {"in_flight": 0, "waiters": 0, "coalesced": 2}  # Allt städat
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        first = asyncio.ensure_future(flights.run("k", work))
+        second = asyncio.ensure_future(flights.run("k", work))
+        await asyncio.sleep(0)
+        first.cancel()  # Klienten kopplar ner
+        await asyncio.sleep(0)
+        assert flights.stats()["waiters"] == 1  # Bara den kvarvarande räknas
+        release.set()
+        assert await second == 42  # Arbetet fortsatte
+        assert first.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_all_waiters_and_next_call_retries():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            raise RuntimeError("fel")
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await flights.run("k", fail)
+        assert await flights.run("k", ok) == "ok"  # Felet cachas inte
+
+    asyncio.run(scenario())
+
+
+def test_waiters_join_led_flight():
+    async def scenario():
+        flights = SingleFlight()
+        future = flights.lead("k")
+        assert flights.in_flight("k")
+        waiter = asyncio.ensure_future(flights.run("k", lambda: pytest.fail("ska inte köras")))
+        await asyncio.sleep(0)
+        future.set_result("från ledaren")
+        assert await waiter == "från ledaren"
+        assert not flights.in_flight("k")
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_flight_restarts_waiters_with_own_factory():
+    async def scenario():
+        flights = SingleFlight()
+        future = flights.lead("k")
+
+        async def fallback():
+            return "eget anrop"
+
+        waiter = asyncio.ensure_future(flights.run("k", fallback))
+        await asyncio.sleep(0)
+        flights.abandon("k", future)  # T.ex. strömmande klient kopplade ner
+        assert await waiter == "eget anrop"
+        assert flights.stats()["waiters"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_run_right_after_abandon_starts_new_work():
+    async def scenario():
+        flight = SingleFlight()
+        led = flight.lead("k")
+        flight.abandon("k", led)  # _finish har inte hunnit köras
+        assert not flight.in_flight("k")
+
+        async def work():
+            return "ny"
+
+        return await asyncio.wait_for(flight.run("k", work), 1.0)
+
+    assert asyncio.run(scenario()) == "ny"
+
+
+def test_run_does_not_spin_on_done_abandoned_future():
+    async def scenario():
+        flight = SingleFlight()
+        stale = asyncio.get_running_loop().create_future()
+        stale.set_exception(FlightAbandoned("k"))
+        flight._inflight["k"] = stale  # Klar men ännu registrerad
+
+        async def work():
+            return "ny"
+
+        return await asyncio.wait_for(flight.run("k", work), 1.0)
+
+    assert asyncio.run(scenario()) == "ny"
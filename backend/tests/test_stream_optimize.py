@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import http_client, lm_studio_client, result_cache
+
+
+def _sse_body(parts, done=True):  # SSE-svar i OpenAI-format
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': part}}]})}" for part in parts]
+    if done:  # Slutmarkör
+        lines.append("data: [DONE]")
+    return "\n\n".join(lines) + "\n\n"
+
+
+@pytest.fixture
+def llm_stream(monkeypatch):  # Ersätter LM Studio med ett fast SSE-svar
+    calls = []
+
+    def install(parts, done=True):
+        def handler(request):
+            calls.append(request)  # Räknar uppströmsanrop
+            return httpx.Response(200, text=_sse_body(parts, done), headers={"content-type": "text/event-stream"})
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        http_client._host_slots.clear()  # Semaforer hör till testets event loop
+        return calls
+
+    return install
+
+
+def _collect(cv_text, job_text):  # Kör strömmen till slut och returnerar händelserna
+    async def run():
+        return [event async for event in lm_studio_client.stream_optimize_cv(cv_text, job_text)]
+    return asyncio.run(run())
+
+
+def test_complete_stream_is_cached(llm_stream):
+    llm_stream(["PROFIL:\n", "- Python"])
+    events = _collect("CV komplett ström", "Jobb komplett ström")
+    assert [e["type"] for e in events] == ["token", "token", "done"]
+    key = lm_studio_client.optimize_cache_key("CV komplett ström", "Jobb komplett ström")
+    assert asyncio.run(result_cache.lookup(key)) == "PROFIL:\n- Python"  # Hela svaret sparas
+
+
+def test_empty_stream_is_not_cached(llm_stream):
+    llm_stream([])  # [DONE] innan någon text
+    with pytest.raises(lm_studio_client.IncompleteStreamError):
+        _collect("CV tom ström", "Jobb tom ström")
+    key = lm_studio_client.optimize_cache_key("CV tom ström", "Jobb tom ström")
+    assert asyncio.run(result_cache.lookup(key)) is None  # Tomt svar får inte förgifta cachen
+
+
+def test_stream_without_done_is_not_cached(llm_stream):
+    llm_stream(["PROFIL:\n", "- halv"], done=False)  # Anslutningen stängs mitt i svaret
+    with pytest.raises(lm_studio_client.IncompleteStreamError):
+        _collect("CV avbruten ström", "Jobb avbruten ström")
+    key = lm_studio_client.optimize_cache_key("CV avbruten ström", "Jobb avbruten ström")
+    assert asyncio.run(result_cache.lookup(key)) is None
+
+
+def test_concurrent_identical_streams_generate_once(llm_stream):
+    calls = llm_stream(["PROFIL:\n", "- Delad"])
+
+    async def run():
+        async def collect():
+            return [event async for event in lm_studio_client.stream_optimize_cv("CV delad ström", "Jobb delad ström")]
+        return await asyncio.gather(collect(), collect())
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1  # En generering för båda strömmarna
+    assert first[-1]["shared"] is False
+    assert second[-1]["shared"] is True
+    assert "".join(e["content"] for e in first if e["type"] == "token") == second[0]["content"]  # Samma text
+
+
+def test_optimize_joins_running_stream(llm_stream):
+    calls = llm_stream(["PROFIL:\n", "- Ström först"])
+
+    async def run():
+        async def stream():
+            return [event async for event in lm_studio_client.stream_optimize_cv("CV ström och optimize", "Jobb ström och optimize")]
+        return await asyncio.gather(stream(), lm_studio_client.optimize_cv("CV ström och optimize", "Jobb ström och optimize"))
+
+    events, text = asyncio.run(run())
+    assert len(calls) == 1  # /optimize väntade på strömmen
+    assert text == "PROFIL:\n- Ström först"
+    assert "content" not in events[-1]  # Hela texten skickas inte två gånger till klienten
+
+
+def _post_stream(cv_text, job_text):  # Anropar /optimize-stream genom hela appen
+    return TestClient(app).post("/api/cv/optimize-stream", json={"cv_text": cv_text, "job_text": job_text})
+
+
+def test_stream_route_maps_upstream_4xx_to_http_error(monkeypatch):
+    def handler(request):
+        return httpx.Response(400, text="fel modell")
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    http_client._host_slots.clear()
+    response = _post_stream("CV route 4xx", "Jobb route 4xx")
+    assert response.status_code == 502
+    assert response.json()["detail"].startswith("LM Studio svarade inte korrekt")
+
+
+def test_stream_route_maps_incomplete_stream_to_http_error(llm_stream):
+    llm_stream([])  # [DONE] utan text
+    response = _post_stream("CV route tom", "Jobb route tom")
+    assert response.status_code == 502
+
+
+def test_stream_route_streams_events(llm_stream):
+    llm_stream(["PROFIL:\n", "- Python"])
+    response = _post_stream("CV route ok", "Jobb route ok")
+    assert response.status_code == 200
+    assert "event: done" in response.text
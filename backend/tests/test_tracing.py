@@ -0,0 +1,52 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import tracing
+
+KEYWORDS = {"job_text": "Krav: Python och Django.", "cv_text": "Python-utvecklare med Django."}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_SERVER_TIMING", True)
+    return TestClient(app)
+
+
+def _request_count(client, route, status):  # Läser räknaren för en route ur /metrics
+    pattern = r'cv_optimizer_http_requests_total\{method="[A-Z]+",route="%s",status="%s"\} (\S+)' % (re.escape(route), status)
+    match = re.search(pattern, client.get("/metrics").text)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_traced_request_gets_server_timing_per_stage(client):
+    response = client.post("/api/cv/keywords", json=KEYWORDS)
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert re.search(r"(^|, )keywords;dur=\d+\.\d", timing)
+    assert re.search(r"total;dur=\d+\.\d$", timing)
+
+
+def test_metrics_use_route_template_not_raw_path(client):
+    before = _request_count(client, "/api/cv/jobs/{job_id}", 404)
+    assert client.get("/api/cv/jobs/finns-inte-123").status_code == 404
+    assert _request_count(client, "/api/cv/jobs/{job_id}", 404) == before + 1
+    assert "finns-inte-123" not in client.get("/metrics").text
+
+
+def test_sampled_out_request_is_counted_without_server_timing(client, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    before = _request_count(client, "/api/cv/keywords", 200)
+    response = client.post("/api/cv/keywords", json=KEYWORDS)
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert _request_count(client, "/api/cv/keywords", 200) == before + 1
+
+
+def test_stage_outside_a_traced_request_is_not_recorded():
+    with tracing.span("utan_spårning"):
+        pass
+    assert "utan_spårning" not in tracing.render_metrics()